@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# bench_catalog.py -- time and queries to load the movie catalog
+#
+# Usage: python bench_catalog.py [movies] [repeat]
+#
+# Fills a temporary SQLite DB with `movies` generated movies (default 10000)
+# and loads them, with the rating and genres the page shows, `repeat` times
+# (default 3) in two ways:
+#   lazy:  session.query(Movie).all(), as build_page.py did; every movie's
+#          rating and genres are loaded on first access
+#   eager: catalog.load_movies()
+# Prints the number of SQL statements and the best time of each.
+
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from catalog import create_sample_catalog, load_movies
+from models import Base, Movie
+
+
+def render_fields(movies):
+    """Reads the attributes create_movie_tiles_content() uses."""
+    for movie in movies:
+        movie.mpaa_rating.rating
+        [genre.genre for genre in movie.genres[:3]]
+
+
+def best_of(repeat, session, statements, load):
+    """Returns (statements run, best time in seconds) of load()."""
+    best = None
+    for _ in range(repeat):
+        # a fresh identity map, so nothing is already loaded
+        session.close()
+        del statements[:]
+        start = time.time()
+        render_fields(load())
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(statements), best
+
+
+if __name__ == '__main__':
+    n_movies = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    fd, filename = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        engine = create_engine('sqlite:///' + filename)
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        create_sample_catalog(session, n_movies)
+
+        statements = []
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        print "%8s %-6s %10s %10s" % ('movies', 'load', 'queries', 'time (s)')
+        for label, load in [('lazy', session.query(Movie).all),
+                            ('eager', lambda: load_movies(session))]:
+            queries, seconds = best_of(repeat, session, statements, load)
+            print "%8d %-6s %10d %10.3f" % (n_movies, label, queries, seconds)
+        session.close()
+    finally:
+        os.remove(filename)
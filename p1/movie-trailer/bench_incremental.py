@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# bench_incremental.py -- time of incremental builds of the page and site
+#
+# Usage: python bench_incremental.py [movies] [page_size]
+#
+# Fills a temporary SQLite DB with `movies` generated movies (default 50000)
+# and times three incremental builds (see incremental.py) of the single page
+# and of the paginated site with `page_size` movies per page (default 50):
+#   cold:    the first build, which renders every tile and page
+#   no-op:   a second build with nothing changed
+#   changed: a build after changing the title of one movie
+# Prints the time of each and the number of tiles and pages written.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import incremental
+from catalog import create_sample_catalog
+from models import Base, Movie
+
+
+def timed(build):
+    """Returns (seconds, result) of calling build()."""
+    start = time.time()
+    result = build()
+    return time.time() - start, result
+
+
+if __name__ == '__main__':
+    n_movies = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        engine = create_engine(
+            'sqlite:///' + os.path.join(work_dir, 'movies.db'))
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        create_sample_catalog(session, n_movies)
+
+        builds = [
+            ('page', lambda: incremental.build_page(
+                session, os.path.join(work_dir, 'fresh_tomatoes.html'),
+                os.path.join(work_dir, 'page_cache'))),
+            ('site', lambda: incremental.build_site(
+                session, os.path.join(work_dir, 'site'), page_size,
+                cache_dir=os.path.join(work_dir, 'site_cache'))),
+        ]
+        print "%d movies" % n_movies
+        print "%-5s %-8s %10s %8s %8s" % ('build', 'run', 'time (s)',
+                                          'tiles', 'pages')
+        for label, build in builds:
+            for run in ['cold', 'no-op', 'changed']:
+                if run == 'changed':
+                    movie = session.query(Movie).get(n_movies // 2)
+                    movie.title += " (%s)" % label
+                    session.commit()
+                # start from an empty identity map, as build_page.py does
+                session.close()
+                seconds, stats = timed(build)
+                print "%-5s %-8s %10.3f %8d %8d" % (
+                    label, run, seconds, stats['tiles'], stats['pages'])
+    finally:
+        shutil.rmtree(work_dir)
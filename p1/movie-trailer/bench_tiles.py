@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# bench_tiles.py -- movie tiles rendered per second
+#
+# Usage: python bench_tiles.py [movies] [repeat]
+#
+# Fills an in-memory SQLite DB with `movies` generated movies (default 10000),
+# loads them with catalog.load_movies() and renders the tile of every movie
+# `repeat` times (default 5) in two ways:
+#   before: the YouTube ID parsed from the trailer url with two re.search()
+#           calls and the tile template filled in by str.format(**fields),
+#           as create_movie_tile_content() did
+#   after:  create_movie_tile_content(), with the YouTube ID stored on the
+#           movie and the tile template compiled once
+# Prints the best number of tiles per second of each.
+
+import re
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from catalog import create_sample_catalog, load_movies
+from fresh_tomatoes import create_movie_tile_content, movie_tile_content
+from models import Base
+
+
+def tile_before(movie):
+    """Renders the tile of movie as create_movie_tile_content() did."""
+    youtube_id_match = re.search(
+        r'(?<=v=)[^&#]+', movie.trailer_youtube_url)
+    youtube_id_match = youtube_id_match or re.search(
+        r'(?<=be/)[^&#]+', movie.trailer_youtube_url)
+    trailer_youtube_id = (youtube_id_match.group(0) if youtube_id_match
+                          else None)
+    g1 = movie.genres[0].genre
+    g2 = movie.genres[1].genre
+    g3 = movie.genres[2].genre if len(movie.genres) > 2 else '...'
+    return movie_tile_content.format(**dict(
+        movie_title=movie.title,
+        poster_image_url=movie.poster_image_url,
+        trailer_youtube_id=trailer_youtube_id,
+        storyline=movie.storyline,
+        mpaa_rating=movie.mpaa_rating.rating,
+        duration=movie.duration,
+        release_date=movie.release_date,
+        imdb_id=movie.imdb_id,
+        rotten_id=movie.rotten_id,
+        g1=g1,
+        g2=g2,
+        g3=g3,
+    ))
+
+
+def tiles_per_second(repeat, movies, render):
+    """Returns the best number of tiles per second of render()."""
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for movie in movies:
+            render(movie)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(movies) / best
+
+
+if __name__ == '__main__':
+    n_movies = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    create_sample_catalog(session, n_movies)
+    session.close()
+    movies = load_movies(session)
+
+    if any(tile_before(movie) != create_movie_tile_content(movie)
+           for movie in movies):
+        sys.exit("The tiles differ.")
+
+    print "%d movies, best of %d" % (n_movies, repeat)
+    print "%-8s %12s" % ('render', 'tiles/s')
+    for label, render in [('before', tile_before),
+                          ('after', create_movie_tile_content)]:
+        print "%-8s %12.0f" % (label,
+                               tiles_per_second(repeat, movies, render))
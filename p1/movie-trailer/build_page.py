@@ -1,22 +1,73 @@
 """
 This script reads the movies in the database into a list and passes the list to
 'fresh_tomatoes.py' to generate the html page.
+
+With --site it writes a paginated site instead (see 'static_site.py'): pages
+of --page-size movies, and pages per genre and per MPAA rating, rendered by
+--processes worker processes into --output-dir.
+
+With --incremental only the tiles of movies which changed since the last
+build are rendered, and only the pages they are on are written again (see
+'incremental.py'); the tiles are cached in --cache-dir.
 """
 
+import argparse
+import os
+import webbrowser
+
+import incremental
+from catalog import load_movies
 from fresh_tomatoes import open_movies_page
+from static_site import build_site
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from models import Base, Movie, movie_genres
+from models import Base, Movie, create_database, movie_genres
 
-engine = create_engine('sqlite:///movies.db')
+engine = create_database()
 Base.metadata.bind = engine
 DBSession = sessionmaker(bind=engine)
 session = DBSession()
 
-q = session.query(Movie)
-movies = q.all()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Generate the movie trailer page.")
+    parser.add_argument('--site', action='store_true',
+                        help="write a paginated site instead of one page")
+    parser.add_argument('--page-size', type=int, default=50,
+                        help="movies per page of the site (default: 50)")
+    parser.add_argument('--output-dir', default='site',
+                        help="directory of the site (default: site)")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes rendering the site "
+                             "(default: one per core)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only render what changed since the last build")
+    parser.add_argument('--cache-dir', default='.build_cache',
+                        help="directory of the cached tiles of incremental "
+                             "builds (default: .build_cache)")
+    args = parser.parse_args()
+
+    if args.incremental:
+        if args.site:
+            incremental.build_site(session, args.output_dir, args.page_size,
+                                   args.processes, args.cache_dir)
+            url = os.path.join(args.output_dir, 'index.html')
+        else:
+            incremental.build_page(session, cache_dir=args.cache_dir)
+            url = 'fresh_tomatoes.html'
+        webbrowser.open('file://' + os.path.abspath(url), new=2)
+    else:
+        # movies with their ratings and genres, in two queries
+        movies = load_movies(session)
 
-# generate html page
-open_movies_page(movies)
+        if args.site:
+            # generate the site and open its first page
+            build_site(movies, args.output_dir, args.page_size,
+                       args.processes)
+            url = os.path.abspath(os.path.join(args.output_dir,
+                                               'index.html'))
+            webbrowser.open('file://' + url, new=2)
+        else:
+            # generate html page
+            open_movies_page(movies)
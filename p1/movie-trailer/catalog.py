@@ -0,0 +1,75 @@
+"""
+Functions to load the movie catalog from the DB for the page generator.
+"""
+
+import datetime
+import random
+
+from sqlalchemy.orm import joinedload, subqueryload
+
+from models import Genre, Movie, MPAARatings
+
+
+# Most ids in one IN (...) list; SQLite allows 999 parameters per statement
+ID_BATCH = 500
+
+
+def load_movies(session, ids=None):
+    """
+    Return every movie (or the movies with the given `ids`) with its MPAA
+    rating and genres already loaded, ordered by id.
+
+    The page needs `movie.mpaa_rating` and `movie.genres` of every movie;
+    loaded lazily that is one SELECT per movie for each of them.  Here the
+    ratings are joined to the movies query and the genres of all movies are
+    read with one more query, so the whole catalog takes two queries however
+    many movies there are (two per `ID_BATCH` ids if `ids` is given).
+    """
+    query = (session.query(Movie)
+             .options(joinedload(Movie.mpaa_rating),
+                      subqueryload(Movie.genres))
+             .order_by(Movie.id))
+    if ids is None:
+        return query.all()
+    ids = sorted(ids)
+    movies = []
+    for i in range(0, len(ids), ID_BATCH):
+        movies.extend(
+            query.filter(Movie.id.in_(ids[i:i + ID_BATCH])).all())
+    return movies
+
+
+def create_sample_catalog(session, n_movies, seed=0):
+    """
+    Add `n_movies` generated movies, with 2 or 3 genres each, to the DB.
+
+    Used by the tests and benchmarks to fill an empty DB; genres and ratings
+    are added if the DB has none.
+    """
+    rng = random.Random(seed)
+    genres = session.query(Genre).all()
+    if not genres:
+        genres = [Genre(genre='Genre %d' % i) for i in range(20)]
+        session.add_all(genres)
+    ratings = session.query(MPAARatings).all()
+    if not ratings:
+        ratings = [MPAARatings(rating=r)
+                   for r in ["G", "PG", "PG-13", "R", "NC-17"]]
+        session.add_all(ratings)
+    session.flush()
+
+    for i in range(n_movies):
+        movie = Movie(
+            title="Movie %d" % i,
+            poster_image_url="https://example.com/posters/%d.jpg" % i,
+            trailer_youtube_url="https://www.youtube.com/watch?v=id%07d" % i,
+            storyline="The storyline of movie %d." % i,
+            mpaa_rating_id=rng.choice(ratings).id,
+            duration=rng.randint(80, 180),
+            release_date=datetime.date(2000, 1, 1) +
+            datetime.timedelta(days=rng.randint(0, 6000)),
+            imdb_id="tt%07d" % i,
+            rotten_id="movie_%d" % i)
+        movie.genres.extend(rng.sample(genres, rng.randint(2, 3)))
+        session.add(movie)
+    session.commit()
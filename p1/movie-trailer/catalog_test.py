@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Test cases for catalog.py
+#
+# Runs against an in-memory SQLite DB; movies.db is not touched.
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from catalog import create_sample_catalog, load_movies
+from models import Base, Movie
+
+
+def make_session(n_movies):
+    """Returns a session on a new in-memory DB with n_movies movies, and a
+    list to which every SQL statement it runs is appended."""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    session = sessionmaker(bind=engine)()
+    create_sample_catalog(session, n_movies)
+    # start from an empty identity map, as build_page.py does
+    session.close()
+    del statements[:]
+    return session, statements
+
+
+def touch(movies):
+    """Reads every attribute the page renders."""
+    return [(movie.title, movie.mpaa_rating.rating,
+             [genre.genre for genre in movie.genres]) for movie in movies]
+
+
+def testQueryCount():
+    session, statements = make_session(100)
+    movies = load_movies(session)
+    touch(movies)
+    if len(movies) != 100:
+        raise ValueError("load_movies() should return every movie.")
+    if len(statements) != 2:
+        raise ValueError(
+            "Loading the catalog should take 2 queries, not %d." %
+            len(statements))
+    print "1. The catalog loads in 2 queries."
+
+
+def testSameContent():
+    session, statements = make_session(50)
+    lazy = touch(session.query(Movie).order_by(Movie.id).all())
+    if len(statements) <= 2:
+        raise ValueError("Lazy loading should take a query per movie.")
+    session.close()
+    if touch(load_movies(session)) != lazy:
+        raise ValueError(
+            "Eager loading should return the same ratings and genres as "
+            "lazy loading.")
+    print "2. Eager and lazy loading return the same catalog."
+
+
+if __name__ == '__main__':
+    testQueryCount()
+    testSameContent()
+    print "Success!  All tests pass!"
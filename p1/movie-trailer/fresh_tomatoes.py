@@ -1,6 +1,6 @@
 import webbrowser
 import os
-import re
+from string import Formatter
 
 
 # Styles and scripting for the page
@@ -185,52 +185,157 @@ movie_tile_content = '''
 '''
 
 
+# The layout of a page of a paginated site (see static_site.py): the same
+# page with links to the genre and rating pages in the title bar, and links
+# to the other pages of the listing below the tiles
+site_page_content = '''
+  <body>
+    <!-- Trailer Video Modal -->
+    <div class="modal" id="trailer">
+      <div class="modal-dialog">
+        <div class="modal-content">
+          <a href="#" class="hanging-close" data-dismiss="modal" aria-hidden="true">
+            <img src="https://lh5.ggpht.com/v4-628SilF0HtHuHdu5EzxD7WRqOrrTIDi_MhEG6_qkNtUK5Wg7KPkofp_VJoF7RS2LhxwEFCO1ICHZlc-o_=s0#w=24&h=24"/>
+          </a>
+          <div class="scale-media" id="trailer-video-container">
+          </div>
+        </div>
+      </div>
+    </div>
+
+    <!-- Main Page Content -->
+    <div class="container">
+      <div class="navbar navbar-inverse navbar-fixed-top" role="navigation">
+        <div class="container">
+          <div class="navbar-header">
+            <a class="navbar-brand" href="index.html">Fresh Tomatoes Movie Trailers</a>
+          </div>
+          <ul class="nav navbar-nav">
+            <li class="dropdown">
+              <a href="#" class="dropdown-toggle" data-toggle="dropdown">Genres <b class="caret"></b></a>
+              <ul class="dropdown-menu">{genre_links}
+              </ul>
+            </li>
+            <li class="dropdown">
+              <a href="#" class="dropdown-toggle" data-toggle="dropdown">Ratings <b class="caret"></b></a>
+              <ul class="dropdown-menu">{rating_links}
+              </ul>
+            </li>
+          </ul>
+        </div>
+      </div>
+    </div>
+    <div class="container">
+      <h1>{page_title}</h1>
+      {movie_tiles}
+    </div>
+    <div class="container">
+      <ul class="pagination">{pagination}
+      </ul>
+    </div>
+  </body>
+</html>
+'''
+
+
+# A link in a dropdown menu or the pagination of a site page
+site_link_content = '''
+                <li class="{css_class}"><a href="{href}">{label}</a></li>'''
+
+
+# The fields of the movie tile template, in the order movie_tile_fields()
+# returns their values
+movie_tile_field_names = (
+    'movie_title', 'poster_image_url', 'trailer_youtube_id', 'storyline',
+    'mpaa_rating', 'duration', 'release_date', 'imdb_id', 'rotten_id',
+    'g1', 'g2', 'g3')
+
+
+def movie_tile_fields(movie):
+    g1 = movie.genres[0].genre
+    g2 = movie.genres[1].genre
+    # set thrid genre to '...' if movie lacks 3rd genre
+    g3 = movie.genres[2].genre if len(movie.genres) > 2 else '...'
+
+    # The values of the tile template's fields for the movie, in the order
+    # of movie_tile_field_names
+    return (movie.title, movie.poster_image_url, movie.trailer_youtube_id,
+            movie.storyline, movie.mpaa_rating.rating, movie.duration,
+            movie.release_date, movie.imdb_id, movie.rotten_id, g1, g2, g3)
+
+
+def compile_template(template, names):
+    """
+    Return a function which renders `template`, a str.format() template of
+    named fields, from the values of its fields given in the order of
+    `names`.
+
+    The template is turned once into one with numbered fields and the
+    function is its bound `format` method, so no dict of keyword arguments
+    is built and looked up on every call.
+    """
+    index = dict((name, i) for i, name in enumerate(names))
+    parts = []
+    for literal, name, spec, conversion in Formatter().parse(template):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if name is not None:
+            if name not in index:
+                raise ValueError("Unknown template field: %r" % name)
+            parts.append('{%d%s%s}' % (index[name],
+                                       '!' + conversion if conversion else '',
+                                       ':' + spec if spec else ''))
+    return ''.join(parts).format
+
+
+# The movie tile template, compiled once
+render_movie_tile = compile_template(movie_tile_content,
+                                     movie_tile_field_names)
+
+
+def create_movie_tile_content(movie):
+    # The tile for the movie with its content filled in
+    return render_movie_tile(*movie_tile_fields(movie))
+
+
 def create_movie_tiles_content(movies):
     # The HTML content for this section of the page
-    content = ''
+    return ''.join(create_movie_tile_content(movie) for movie in movies)
+
+
+# The main page layout before and after the movie tiles
+main_page_start, main_page_end = main_page_content.split('{movie_tiles}')
+
+
+def iter_movies_page(movies):
+    """
+    Yield the page for `movies` piece by piece: the page head and layout,
+    then one movie tile at a time.
+
+    Only one tile is held in memory at a time, however many movies there
+    are.  The generator can be written to a file (see `write_movies_page`)
+    or returned as the body of a WSGI response.
+    """
+    yield main_page_head
+    yield main_page_start
     for movie in movies:
-        # Extract the youtube ID from the url
-        youtube_id_match = re.search(
-            r'(?<=v=)[^&#]+', movie.trailer_youtube_url)
-        youtube_id_match = youtube_id_match or re.search(
-            r'(?<=be/)[^&#]+', movie.trailer_youtube_url)
-        trailer_youtube_id = (youtube_id_match.group(0) if youtube_id_match
-                              else None)
-
-        g1 = movie.genres[0].genre
-        g2 = movie.genres[1].genre
-        # set thrid genre to '...' if movie lacks 3rd genre
-        g3 = movie.genres[2].genre if len(movie.genres) > 2 else '...'
-
-        # Append the tile for the movie with its content filled in
-        content += movie_tile_content.format(
-            movie_title=movie.title,
-            poster_image_url=movie.poster_image_url,
-            trailer_youtube_id=trailer_youtube_id,
-            storyline=movie.storyline,
-            mpaa_rating=movie.mpaa_rating.rating,
-            duration=movie.duration,
-            release_date=movie.release_date,
-            imdb_id=movie.imdb_id,
-            rotten_id=movie.rotten_id,
-            g1=g1,
-            g2=g2,
-            g3=g3,
-        )
-    return content
+        yield create_movie_tile_content(movie)
+    yield main_page_end
 
 
-def open_movies_page(movies):
-    # Create or overwrite the output file
-    output_file = open('fresh_tomatoes.html', 'w')
+def write_movies_page(movies, output_file):
+    """
+    Write the page for `movies` to `output_file`, any object with a `write`
+    method, one tile at a time.
+    """
+    for fragment in iter_movies_page(movies):
+        output_file.write(fragment)
 
-    # Replace the movie tiles placeholder generated content
-    rendered_content = main_page_content.format(
-        movie_tiles=create_movie_tiles_content(movies))
 
-    # Output the file
-    output_file.write(main_page_head + rendered_content)
-    output_file.close()
+def open_movies_page(movies):
+    # Create or overwrite the output file, rendering the page into it tile
+    # by tile
+    with open('fresh_tomatoes.html', 'w') as output_file:
+        write_movies_page(movies, output_file)
 
     # open the output file in the browser (in a new tab, if possible)
     url = os.path.abspath(output_file.name)
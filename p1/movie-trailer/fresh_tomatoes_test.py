@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+# Test cases for fresh_tomatoes.py
+#
+# Runs against an in-memory SQLite DB; movies.db is not touched.
+
+import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from catalog import create_sample_catalog, load_movies
+from fresh_tomatoes import compile_template, \
+                           create_movie_tiles_content, \
+                           iter_movies_page, \
+                           main_page_content, \
+                           main_page_head, \
+                           movie_tile_content, \
+                           movie_tile_field_names, \
+                           write_movies_page
+from models import Base, Movie, add_trailer_youtube_ids
+
+
+class Recorder(object):
+    """A file-like object which keeps every write."""
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+def sample_movies(n_movies):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    create_sample_catalog(session, n_movies)
+    return load_movies(session)
+
+
+def testStreamedPage():
+    movies = sample_movies(20)
+    page = main_page_head + main_page_content.format(
+        movie_tiles=create_movie_tiles_content(movies))
+    if ''.join(iter_movies_page(movies)) != page:
+        raise ValueError(
+            "The streamed page should equal the page formatted at once.")
+    print "1. The streamed page equals the page formatted at once."
+
+
+def testIncrementalWrites():
+    movies = sample_movies(20)
+    out = Recorder()
+    write_movies_page(movies, out)
+    if len(out.writes) != len(movies) + 3:
+        raise ValueError("The page should be written one tile at a time.")
+    if max(len(data) for data in out.writes) > len(main_page_head):
+        raise ValueError("No write should hold more than one tile.")
+    print "2. The page is written one tile at a time."
+
+
+def testCompiledTemplate():
+    values = ("A {Title} 100%", "poster.jpg", "abc", "Story.", "PG-13", 95,
+              datetime.date(2001, 2, 3), "tt1", "a_title", "Drama", "War",
+              "...")
+    render = compile_template(movie_tile_content, movie_tile_field_names)
+    expected = movie_tile_content.format(
+        **dict(zip(movie_tile_field_names, values)))
+    if render(*values) != expected:
+        raise ValueError(
+            "A compiled template should render like str.format().")
+    try:
+        compile_template(movie_tile_content, movie_tile_field_names[1:])
+    except ValueError:
+        pass
+    else:
+        raise ValueError("A template field without a value should fail.")
+    print "3. Compiled templates render like str.format()."
+
+
+def testTrailerYouTubeId():
+    movie = Movie("Title", "poster.jpg",
+                  "https://www.youtube.com/watch?v=EXeTwQWrcwY&t=10",
+                  "Story.", 1, 95, datetime.date(2001, 2, 3))
+    if movie.trailer_youtube_id != "EXeTwQWrcwY":
+        raise ValueError("The YouTube ID should be read from the url.")
+    movie.trailer_youtube_url = "https://youtu.be/Rm_qeIyGFxQ"
+    if movie.trailer_youtube_id != "Rm_qeIyGFxQ":
+        raise ValueError("The YouTube ID should follow the url.")
+    movie.trailer_youtube_url = "https://example.com/trailer.mp4"
+    if movie.trailer_youtube_id is not None:
+        raise ValueError("A url without a YouTube ID should have none.")
+    print "4. The YouTube ID of a trailer is kept in step with its url."
+
+
+def testTrailerYouTubeIdMigration():
+    engine = create_engine('sqlite://')
+    # the movies table as it was before trailer_youtube_id
+    engine.execute(
+        "CREATE TABLE movies (id INTEGER PRIMARY KEY, "
+        "title VARCHAR(255) NOT NULL, poster_image_url VARCHAR(255) NOT NULL, "
+        "trailer_youtube_url VARCHAR(255) NOT NULL, storyline TEXT NOT NULL, "
+        "mpaa_rating_id INTEGER, duration INTEGER NOT NULL, "
+        "release_date DATE NOT NULL, imdb_id VARCHAR(80), "
+        "rotten_id VARCHAR(80))")
+    engine.execute(
+        "INSERT INTO movies VALUES (1, 'Old', 'poster.jpg', "
+        "'https://www.youtube.com/watch?v=abc123&t=10', 'Story', NULL, 90, "
+        "'2015-01-01', '', '')")
+    Base.metadata.create_all(engine)
+    add_trailer_youtube_ids(engine)
+    add_trailer_youtube_ids(engine)
+    movie = sessionmaker(bind=engine)().query(Movie).one()
+    if movie.trailer_youtube_id != 'abc123':
+        raise ValueError(
+            "An existing movies table should get its trailers' YouTube IDs.")
+    print "5. An existing movies table gets its trailers' YouTube IDs."
+
+
+if __name__ == '__main__':
+    testStreamedPage()
+    testIncrementalWrites()
+    testCompiledTemplate()
+    testTrailerYouTubeId()
+    testTrailerYouTubeIdMigration()
+    print "Success!  All tests pass!"
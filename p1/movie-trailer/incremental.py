@@ -0,0 +1,245 @@
+"""
+Incremental builds of the movie page and of the paginated site.
+
+A build keeps a manifest and the rendered tile of every movie in a cache
+directory.  The manifest holds a content hash of every movie, covering all
+`Movie` columns, its genre names and its rating, and a hash of every page
+written, covering everything on it.  The next build reads the same data
+with three plain queries; if a hash of all of it matches the last build
+there is nothing to do, otherwise it renders only the tiles of new or
+changed movies and rewrites only the pages whose hash changed.  The other
+pages are left alone.
+"""
+
+import hashlib
+import json
+import os
+
+from catalog import load_movies
+from fresh_tomatoes import create_movie_tile_content, \
+                           main_page_end, \
+                           main_page_head, \
+                           main_page_start, \
+                           movie_tile_content, \
+                           site_link_content, \
+                           site_page_content
+from static_site import create_site_links, \
+                        plan_listings, \
+                        plan_pages, \
+                        write_pages
+
+# Name of the manifest in the cache directory
+MANIFEST = 'manifest.json'
+
+# Hash of the templates; a build with other templates starts from scratch
+TEMPLATES_DIGEST = hashlib.sha1(''.join([
+    main_page_head, main_page_start, main_page_end, movie_tile_content,
+    site_page_content, site_link_content]).encode('utf-8')).hexdigest()
+
+
+# Every movie with its rating, the genre names and the genres of each movie
+# by genre id
+MOVIES_QUERY = """
+SELECT m.*, r.rating
+FROM movies AS m LEFT JOIN mpaa_ratings AS r ON r.id = m.mpaa_rating_id
+ORDER BY m.id
+"""
+GENRES_QUERY = "SELECT id, genre FROM genres"
+MOVIE_GENRES_QUERY = \
+    "SELECT movie_id, genre_id FROM movie_genres ORDER BY movie_id, genre_id"
+
+
+def digest(values):
+    """Return the SHA-1 hex digest of a list of values."""
+    return hashlib.sha1(
+        u'\x1f'.join(u'%s' % value for value in values)
+        .encode('utf-8')).hexdigest()
+
+
+def read_catalog(session):
+    """
+    Return a tuple per movie, in id order: its columns, its rating and a
+    tuple of its genre names.
+
+    The rows are read with three plain queries straight from the DB driver,
+    and no `Movie` objects are created, so that a build in which nothing
+    changed costs little more than reading the catalog.
+    """
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(GENRES_QUERY)
+        genres = dict(cursor.fetchall())
+        cursor.execute(MOVIE_GENRES_QUERY)
+        names = {}
+        for movie_id, genre_id in cursor.fetchall():
+            names.setdefault(movie_id, []).append(genres[genre_id])
+        cursor.execute(MOVIES_QUERY)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [tuple(row) + (tuple(names.get(row[0], ())),) for row in rows]
+
+
+def catalog_digest(rows):
+    """Return the hash of all of the catalog, to tell at once whether any
+    movie changed since the last build."""
+    return hashlib.sha1(repr(rows).encode('utf-8')).hexdigest()
+
+
+def movie_digests(rows):
+    """Return an (id, content hash, genre names, rating) tuple per row of
+    read_catalog()."""
+    sha1 = hashlib.sha1
+    return [(row[0], sha1(repr(row).encode('utf-8')).hexdigest(),
+             list(row[-1]), row[-2]) for row in rows]
+
+
+def load_manifest(cache_dir):
+    """Return the manifest of the last build, or an empty one."""
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        manifest = None
+    if manifest is None or manifest.get('templates') != TEMPLATES_DIGEST:
+        manifest = {'templates': TEMPLATES_DIGEST, 'catalog': None,
+                    'movies': {}, 'pages': {}, 'builds': {}}
+    return manifest
+
+
+def save_manifest(cache_dir, manifest):
+    """Replace the manifest, so that it is never left half written."""
+    path = os.path.join(cache_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.rename(path + '.tmp', path)
+
+
+def update_tiles(session, entries, manifest, tile_dir):
+    """
+    Render the tiles of the new and changed movies of `entries`, and those
+    missing from `tile_dir`, into `tile_dir`, delete those of removed movies
+    and update the manifest.
+
+    Returns:
+      The number of tiles rendered.
+    """
+    if not os.path.isdir(tile_dir):
+        os.makedirs(tile_dir)
+    hashes = manifest['movies']
+    existing = set(os.listdir(tile_dir))
+    changed = [movie_id for movie_id, content, _, _ in entries
+               if hashes.get(str(movie_id)) != content or
+               '%d.html' % movie_id not in existing]
+    for movie in load_movies(session, changed):
+        with open(os.path.join(tile_dir, '%d.html' % movie.id), 'w') as f:
+            f.write(create_movie_tile_content(movie))
+    current = set(str(movie_id) for movie_id, _, _, _ in entries)
+    for movie_id in set(hashes) - current:
+        path = os.path.join(tile_dir, '%s.html' % movie_id)
+        if os.path.exists(path):
+            os.remove(path)
+    manifest['movies'] = dict(
+        (str(movie_id), content) for movie_id, content, _, _ in entries)
+    return len(changed)
+
+
+def build_page(session, filename='fresh_tomatoes.html',
+               cache_dir='.build_cache'):
+    """
+    Write the single page of every movie to `filename`, unless nothing on
+    it changed since the last build.
+
+    Returns:
+      A dict with the number of 'tiles' rendered and 'pages' written.
+    """
+    tile_dir = os.path.join(cache_dir, 'tiles')
+    manifest = load_manifest(cache_dir)
+    rows = read_catalog(session)
+    key = catalog_digest(rows)
+    tiles = pages = 0
+    write = manifest['pages'].get(filename) != key or \
+        not os.path.exists(filename)
+    if manifest['catalog'] != key or write:
+        tiles = update_tiles(session, movie_digests(rows), manifest,
+                             tile_dir)
+        manifest['catalog'] = key
+    if write:
+        with open(filename, 'w') as output_file:
+            output_file.write(main_page_head)
+            output_file.write(main_page_start)
+            for row in rows:
+                with open(os.path.join(tile_dir, '%d.html' % row[0])) as f:
+                    output_file.write(f.read())
+            output_file.write(main_page_end)
+        manifest['pages'][filename] = key
+        pages = 1
+    if tiles or pages:
+        save_manifest(cache_dir, manifest)
+    return {'tiles': tiles, 'pages': pages}
+
+
+def build_site(session, output_dir='site', page_size=50, processes=None,
+               cache_dir='.build_cache'):
+    """
+    Write the pages of the paginated site (see static_site.build_site())
+    whose content changed since the last build, and delete the pages which
+    are no longer part of it.
+
+    If no movie changed and the site was last built with the same page
+    size, only checks that its pages are still there instead of planning
+    the site again.
+
+    Returns:
+      A dict with the number of 'tiles' rendered, 'pages' written and
+      pages 'removed'.
+    """
+    if page_size < 1:
+        raise ValueError("Invalid page size: %s" % page_size)
+    output_dir = os.path.normpath(output_dir)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    tile_dir = os.path.join(cache_dir, 'tiles')
+    manifest = load_manifest(cache_dir)
+    rows = read_catalog(session)
+    key = catalog_digest(rows)
+    site_key = digest([page_size, key])
+    pages = manifest['pages']
+    if manifest['catalog'] == key and \
+            manifest['builds'].get(output_dir) == site_key:
+        existing = set(os.listdir(output_dir))
+        if all(os.path.basename(path) in existing for path in pages
+               if os.path.dirname(path) == output_dir):
+            return {'tiles': 0, 'pages': 0, 'removed': 0}
+
+    entries = movie_digests(rows)
+    tiles = update_tiles(session, entries, manifest, tile_dir)
+    manifest['catalog'] = key
+    listings = plan_listings(
+        (movie_id, names, rating) for movie_id, _, names, rating in entries)
+    genre_links, rating_links = create_site_links(listings)
+    hashes = manifest['movies']
+    planned = set()
+    changed = []
+    for job in plan_pages(listings, page_size):
+        filename, title, pagination, movie_ids = job
+        path = os.path.join(output_dir, filename)
+        page_key = digest([genre_links, rating_links, title, pagination] +
+                          [hashes[str(movie_id)] for movie_id in movie_ids])
+        planned.add(path)
+        if pages.get(path) != page_key or not os.path.exists(path):
+            changed.append(job)
+            pages[path] = page_key
+    write_pages(changed, (output_dir, genre_links, rating_links, tile_dir),
+                processes)
+
+    # pages of this site written by an earlier build, no longer planned
+    removed = [path for path in pages
+               if os.path.dirname(path) == output_dir and path not in planned]
+    for path in removed:
+        if os.path.exists(path):
+            os.remove(path)
+        del pages[path]
+    manifest['builds'][output_dir] = site_key
+    save_manifest(cache_dir, manifest)
+    return {'tiles': tiles, 'pages': len(changed), 'removed': len(removed)}
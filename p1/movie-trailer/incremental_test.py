@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Test cases for incremental.py
+#
+# Runs against an in-memory SQLite DB and writes to a temporary directory;
+# movies.db is not touched.
+
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import incremental
+import static_site
+from catalog import create_sample_catalog, load_movies
+from fresh_tomatoes import write_movies_page
+from models import Base, Movie
+
+
+def sample_session(n_movies):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    create_sample_catalog(session, n_movies)
+    return session
+
+
+def read_pages(output_dir):
+    """Returns a dict of the contents of the pages in output_dir."""
+    pages = {}
+    for filename in os.listdir(output_dir):
+        with open(os.path.join(output_dir, filename)) as f:
+            pages[filename] = f.read()
+    return pages
+
+
+def testIncrementalSite():
+    session = sample_session(40)
+    work_dir = tempfile.mkdtemp()
+    site_dir = os.path.join(work_dir, 'site')
+    full_dir = os.path.join(work_dir, 'full')
+    cache_dir = os.path.join(work_dir, 'cache')
+    try:
+        stats = incremental.build_site(session, site_dir, page_size=10,
+                                       processes=1, cache_dir=cache_dir)
+        if stats['tiles'] != 40:
+            raise ValueError("A first build should render every tile.")
+        stats = incremental.build_site(session, site_dir, page_size=10,
+                                       processes=1, cache_dir=cache_dir)
+        if stats['tiles'] or stats['pages']:
+            raise ValueError("A build without changes should write nothing.")
+
+        movie = session.query(Movie).get(25)
+        movie.title = "A New Title"
+        session.commit()
+        stats = incremental.build_site(session, site_dir, page_size=10,
+                                       processes=1, cache_dir=cache_dir)
+        if stats['tiles'] != 1:
+            raise ValueError("Only the changed movie should be rendered.")
+        # the movie's page of all movies, of each genre and of its rating
+        if stats['pages'] != len(movie.genres) + 2:
+            raise ValueError(
+                "Only the pages of the changed movie should be written.")
+
+        static_site.build_site(load_movies(session), full_dir, page_size=10,
+                               processes=1)
+        if read_pages(site_dir) != read_pages(full_dir):
+            raise ValueError(
+                "An incremental build should equal a full build.")
+    finally:
+        shutil.rmtree(work_dir)
+    print "1. Incremental site builds only write the pages that changed."
+
+
+def testIncrementalPage():
+    session = sample_session(20)
+    work_dir = tempfile.mkdtemp()
+    filename = os.path.join(work_dir, 'fresh_tomatoes.html')
+    cache_dir = os.path.join(work_dir, 'cache')
+    try:
+        incremental.build_page(session, filename, cache_dir)
+        if incremental.build_page(session, filename, cache_dir)['pages']:
+            raise ValueError("A build without changes should write nothing.")
+        movie = session.query(Movie).get(3)
+        movie.genres.pop()
+        session.commit()
+        stats = incremental.build_page(session, filename, cache_dir)
+        if stats != {'tiles': 1, 'pages': 1}:
+            raise ValueError(
+                "Changing a movie's genres should render it again.")
+        page = StringIO()
+        write_movies_page(load_movies(session), page)
+        with open(filename) as f:
+            if f.read() != page.getvalue():
+                raise ValueError(
+                    "An incremental build should equal a full build.")
+
+        shutil.rmtree(os.path.join(cache_dir, 'tiles'))
+        os.remove(filename)
+        stats = incremental.build_page(session, filename, cache_dir)
+        if stats != {'tiles': 20, 'pages': 1}:
+            raise ValueError("Missing tiles should be rendered again.")
+        with open(filename) as f:
+            if f.read() != page.getvalue():
+                raise ValueError(
+                    "Rendering missing tiles should give the same page.")
+    finally:
+        shutil.rmtree(work_dir)
+    print "2. Incremental page builds render only the changed tiles."
+
+
+if __name__ == '__main__':
+    testIncrementalSite()
+    testIncrementalPage()
+    print "Success!  All tests pass!"
@@ -2,13 +2,27 @@
 Model classes which define DB tables for the project.
 """
 
+import re
+
 from sqlalchemy import Column, Date, ForeignKey, Integer, String, Table, Text
+from sqlalchemy import bindparam, inspect, select
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy import create_engine
 
 Base = declarative_base()
 
+# The video ID in a youtube.com/watch?v=<id> or a youtu.be/<id> url
+YOUTUBE_WATCH_ID = re.compile(r'(?<=v=)[^&#]+')
+YOUTUBE_SHORT_ID = re.compile(r'(?<=be/)[^&#]+')
+
+
+def youtube_id(url):
+    """Return the YouTube video ID of a trailer url, or None."""
+    match = YOUTUBE_WATCH_ID.search(url) or YOUTUBE_SHORT_ID.search(url)
+    return match.group(0) if match else None
+
+
 movie_genres = Table(
     'movie_genres', Base.metadata,
     Column('movie_id', Integer, ForeignKey('movies.id')),
@@ -24,6 +38,8 @@ class Movie(Base):
     title = Column(String(255), nullable=False)
     poster_image_url = Column(String(255), nullable=False)
     trailer_youtube_url = Column(String(255), nullable=False)
+    # extracted from trailer_youtube_url whenever it is set
+    trailer_youtube_id = Column(String(80))
     storyline = Column(Text, nullable=False)
     mpaa_rating_id = Column(Integer, ForeignKey('mpaa_ratings.id'))
     duration = Column(Integer, nullable=False)
@@ -49,6 +65,13 @@ class Movie(Base):
         self.imdb_id = imdb_id
         self.rotten_id = rotten_id
 
+    @validates('trailer_youtube_url')
+    def set_trailer_youtube_id(self, key, url):
+        """Keep the trailer's YouTube ID, which the page links to, in step
+        with its url, so pages need not parse the url on every build."""
+        self.trailer_youtube_id = youtube_id(url)
+        return url
+
     def __repr__(self):
         return "<Movie: %r>" % self.title
 
@@ -85,5 +108,42 @@ class MPAARatings(Base):
     def __repr__(self):
         return "<Rating: %r>" % self.rating
 
-engine = create_engine('sqlite:///movies.db')
-Base.metadata.create_all(engine)
+
+def add_trailer_youtube_ids(engine):
+    """
+    Add the trailer_youtube_id column to a movies table created before it
+    existed, filled in from each movie's trailer url.  Does nothing if the
+    column is already there.
+    """
+    columns = [column['name'] for column in
+               inspect(engine).get_columns(Movie.__tablename__)]
+    if 'trailer_youtube_id' in columns:
+        return
+    movies = Movie.__table__
+    with engine.begin() as conn:
+        conn.execute("ALTER TABLE movies "
+                     "ADD COLUMN trailer_youtube_id VARCHAR(80)")
+        rows = conn.execute(
+            select([movies.c.id, movies.c.trailer_youtube_url])).fetchall()
+        if rows:
+            conn.execute(
+                movies.update()
+                .where(movies.c.id == bindparam('movie_id'))
+                .values(trailer_youtube_id=bindparam('youtube_id')),
+                [{'movie_id': movie_id, 'youtube_id': youtube_id(url)}
+                 for movie_id, url in rows])
+
+
+# The database populate_movies.py fills and build_page.py reads
+DATABASE_URL = 'sqlite:///movies.db'
+
+
+def create_database(url=DATABASE_URL):
+    """
+    Return an engine for the database at url, creating the tables or adding
+    the columns it lacks.  Importing this module touches no database.
+    """
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    add_trailer_youtube_ids(engine)
+    return engine
@@ -2,13 +2,13 @@
 Populate `movies.db` with favorite movies.
 """
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from models import Base, Movie, Genre, MPAARatings, movie_genres
+from models import Base, Movie, Genre, MPAARatings, movie_genres, \
+                   create_database
 import datetime
 
-engine = create_engine('sqlite:///movies.db')
+engine = create_database()
 Base.metadata.bind = engine
 DBSession = sessionmaker(bind=engine)
 session = DBSession()
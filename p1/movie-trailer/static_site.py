@@ -0,0 +1,227 @@
+"""
+Functions to build the movie catalog as a static site of paginated pages.
+
+Instead of one page with every movie, `build_site` writes pages of
+`page_size` movies each: the pages of all movies (`index.html`,
+`index_2.html`, ...) and the same for each genre (`genre-action.html`, ...)
+and MPAA rating (`rating-pg-13.html`, ...).  The pages are rendered and
+written by a pool of worker processes.
+"""
+
+import multiprocessing
+import os
+import re
+
+from fresh_tomatoes import main_page_head, \
+                           movie_tile_fields, \
+                           render_movie_tile, \
+                           site_link_content, \
+                           site_page_content
+
+# Pages linked before and after the current one in the pagination
+PAGINATION_WINDOW = 4
+
+# The site page layout before and after the movie tiles
+site_page_start, site_page_end = site_page_content.split('{movie_tiles}')
+
+# Set in each worker process by init_worker()
+_output_dir = None
+_genre_links = None
+_rating_links = None
+_tile_dir = None
+
+
+def slug(name):
+    """Return name in lower case with runs of other characters than letters
+    and digits replaced by '-', for use in file names."""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def page_file(base, number):
+    """Return the file name of page `number` (from 1) of a listing.  Slugs
+    never contain '_', so 'rating-pg_13.html' cannot be confused with the
+    first page of another rating."""
+    if number == 1:
+        return base + '.html'
+    return '%s_%d.html' % (base, number)
+
+
+def create_links(links, active=None):
+    """Return the HTML of a list of (href, label) links; the link to
+    `active` is highlighted."""
+    return ''.join(
+        site_link_content.format(
+            href=href, label=label,
+            css_class='active' if href == active else '')
+        for href, label in links)
+
+
+def create_pagination(base, number, n_pages):
+    """Return the HTML of the links to the pages of a listing around page
+    `number`, with links to the previous and next page."""
+    first = max(1, number - PAGINATION_WINDOW)
+    last = min(n_pages, number + PAGINATION_WINDOW)
+    content = site_link_content.format(
+        href=page_file(base, number - 1) if number > 1 else '#',
+        label='&laquo;', css_class='' if number > 1 else 'disabled')
+    content += create_links(
+        [(page_file(base, k), k) for k in range(first, last + 1)],
+        active=page_file(base, number))
+    content += site_link_content.format(
+        href=page_file(base, number + 1) if number < n_pages else '#',
+        label='&raquo;', css_class='' if number < n_pages else 'disabled')
+    return content
+
+
+def movie_entries(movies):
+    """
+    Return the (tile, genre names, rating) entries of `movies` for
+    plan_listings(), where each tile is the values of the movie's tile
+    template fields.
+    """
+    return [(movie_tile_fields(movie),
+             [genre.genre for genre in movie.genres],
+             movie.mpaa_rating.rating) for movie in movies]
+
+
+def plan_listings(entries):
+    """
+    Return the listings of the site as (base file name, title, tiles)
+    tuples: all movies, then each genre and each rating in alphabetical
+    order.
+
+    Args:
+      entries: a (tile, genre names, rating) tuple per movie, in catalog
+        order.  The tiles are whatever render_page() takes: the tile
+        template fields of each movie, or the keys of cached tiles.
+    """
+    tiles = []
+    genres = {}
+    ratings = {}
+    for tile, genre_names, rating in entries:
+        tiles.append(tile)
+        for genre in genre_names:
+            genres.setdefault(genre, []).append(tile)
+        ratings.setdefault(rating, []).append(tile)
+
+    listings = [('index', 'All Movies', tiles)]
+    for name in sorted(genres):
+        listings.append(('genre-' + slug(name), name, genres[name]))
+    for name in sorted(ratings):
+        listings.append(('rating-' + slug(name), 'Rated ' + name,
+                         ratings[name]))
+    return listings
+
+
+def create_site_links(listings):
+    """Return the HTML of the (genre, rating) links of the title bar."""
+    genre_links = create_links(
+        [(page_file(base, 1), title) for base, title, _ in listings
+         if base.startswith('genre-')])
+    rating_links = create_links(
+        [(page_file(base, 1), title) for base, title, _ in listings
+         if base.startswith('rating-')])
+    return genre_links, rating_links
+
+
+def plan_pages(listings, page_size):
+    """
+    Return one (file name, title, pagination, tiles) job per page of the
+    listings, for render_page().
+    """
+    jobs = []
+    for base, title, tiles in listings:
+        n_pages = max(1, (len(tiles) + page_size - 1) // page_size)
+        for number in range(1, n_pages + 1):
+            page_title = title
+            if n_pages > 1:
+                page_title += ' (page %d of %d)' % (number, n_pages)
+            jobs.append((
+                page_file(base, number), page_title,
+                create_pagination(base, number, n_pages),
+                tiles[(number - 1) * page_size:number * page_size]))
+    return jobs
+
+
+def init_worker(output_dir, genre_links, rating_links, tile_dir=None):
+    """Store what every page of the site shares, once per worker."""
+    global _output_dir, _genre_links, _rating_links, _tile_dir
+    _output_dir = output_dir
+    _genre_links = genre_links
+    _rating_links = rating_links
+    _tile_dir = tile_dir
+
+
+def render_page(job):
+    """
+    Write the page of a job from plan_pages() and return its file name.
+
+    The tiles of the job are rendered from their template fields or, if the
+    worker has a tile directory, copied from the `<key>.html` files there.
+    """
+    filename, title, pagination, tiles = job
+    with open(os.path.join(_output_dir, filename), 'w') as output_file:
+        output_file.write(main_page_head)
+        output_file.write(site_page_start.format(
+            genre_links=_genre_links, rating_links=_rating_links,
+            page_title=title))
+        for tile in tiles:
+            if _tile_dir is None:
+                output_file.write(render_movie_tile(*tile))
+            else:
+                with open(os.path.join(_tile_dir, '%s.html' % tile)) as f:
+                    output_file.write(f.read())
+        output_file.write(site_page_end.format(pagination=pagination))
+    return filename
+
+
+def write_pages(jobs, shared, processes=None):
+    """
+    Write the pages of jobs from plan_pages() with a pool of `processes`
+    worker processes (default: one per core; with 1, in this process).
+
+    Args:
+      jobs: the pages to write.
+      shared: the arguments of init_worker().
+      processes: the number of worker processes.
+
+    Returns:
+      The file names of the pages written, sorted.
+    """
+    if processes == 1 or not jobs:
+        init_worker(*shared)
+        return sorted(render_page(job) for job in jobs)
+    pool = multiprocessing.Pool(processes, init_worker, shared)
+    try:
+        filenames = pool.map(render_page, jobs, chunksize=max(
+            1, len(jobs) // (4 * (processes or
+                                  multiprocessing.cpu_count()))))
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(filenames)
+
+
+def build_site(movies, output_dir='site', page_size=50, processes=None):
+    """
+    Write the paginated site of `movies` to `output_dir`.
+
+    Args:
+      movies: the movies, e.g. from catalog.load_movies().
+      output_dir: the directory of the pages; created if needed.
+      page_size: the number of movies per page.
+      processes: the number of worker processes (default: one per core);
+        with 1 the pages are written by this process.
+
+    Returns:
+      The file names of the pages written, sorted.
+    """
+    if page_size < 1:
+        raise ValueError("Invalid page size: %s" % page_size)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    listings = plan_listings(movie_entries(movies))
+    genre_links, rating_links = create_site_links(listings)
+    return write_pages(plan_pages(listings, page_size),
+                       (output_dir, genre_links, rating_links), processes)
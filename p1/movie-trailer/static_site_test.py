@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# Test cases for static_site.py
+#
+# Runs against an in-memory SQLite DB and writes to a temporary directory;
+# movies.db is not touched.
+
+import os
+import re
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from catalog import create_sample_catalog, load_movies
+from models import Base
+from static_site import build_site, movie_entries, plan_listings, \
+                        plan_pages, slug
+
+
+def sample_movies(n_movies):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    create_sample_catalog(session, n_movies)
+    return load_movies(session)
+
+
+def titles(output_dir, filename):
+    """Returns the movie titles on a page, in order."""
+    with open(os.path.join(output_dir, filename)) as f:
+        return re.findall(r'<h2>(.*?)</h2>', f.read())
+
+
+def testPages():
+    movies = sample_movies(45)
+    output_dir = tempfile.mkdtemp()
+    try:
+        filenames = build_site(movies, output_dir, page_size=10, processes=2)
+        index = ['index.html'] + ['index_%d.html' % k for k in range(2, 6)]
+        if not set(index) <= set(filenames) or 'index_6.html' in filenames:
+            raise ValueError("45 movies should fill 5 pages of 10.")
+        listed = []
+        for filename in index:
+            listed.extend(titles(output_dir, filename))
+        if listed != [movie.title for movie in movies]:
+            raise ValueError(
+                "The pages should list every movie once, in order.")
+        for movie in movies:
+            for genre in movie.genres:
+                base = 'genre-' + slug(genre.genre)
+                pages = [f for f in filenames
+                         if f == base + '.html' or f.startswith(base + '_')]
+                if not any(movie.title in titles(output_dir, f)
+                           for f in pages):
+                    raise ValueError(
+                        "A movie should be listed on its genres' pages.")
+            rating = 'rating-' + slug(movie.mpaa_rating.rating) + '.html'
+            if rating not in filenames:
+                raise ValueError("Every rating should have a page.")
+        if sorted(os.listdir(output_dir)) != filenames:
+            raise ValueError("build_site() should return the pages written.")
+    finally:
+        shutil.rmtree(output_dir)
+    print "1. The site lists every movie by page, genre and rating."
+
+
+def testSameInProcess():
+    movies = sample_movies(30)
+    pages = []
+    for processes in (1, 3):
+        output_dir = tempfile.mkdtemp()
+        try:
+            filenames = build_site(movies, output_dir, page_size=7,
+                                   processes=processes)
+            contents = {}
+            for filename in filenames:
+                with open(os.path.join(output_dir, filename)) as f:
+                    contents[filename] = f.read()
+            pages.append(contents)
+        finally:
+            shutil.rmtree(output_dir)
+    if pages[0] != pages[1]:
+        raise ValueError(
+            "The site should not depend on the number of processes.")
+    print "2. The site is the same with one or more processes."
+
+
+def testUniquePageNames():
+    movies = sample_movies(100)
+    # one movie per page, so that 'PG' has a page 13 next to 'PG-13'
+    listings = plan_listings(movie_entries(movies))
+    filenames = [job[0] for job in plan_pages(listings, 1)]
+    if len(set(filenames)) != len(filenames):
+        raise ValueError("Every page should have its own file name.")
+    print "3. Every page of the site has its own file name."
+
+
+if __name__ == '__main__':
+    testPages()
+    testSameInProcess()
+    testUniquePageNames()
+    print "Success!  All tests pass!"
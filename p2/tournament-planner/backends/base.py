@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+
+class Backend(object):
+    """
+    Storage interface behind the functions of `tournament.py`.
+
+    A backend stores tournaments, players and match results.  Pairing and
+    every other piece of tournament logic lives in `tournament.py` and
+    `pairing.py` and only sees the rows a backend returns, so it runs
+    unchanged against any backend.  Rows have the same shapes as the
+    corresponding `tournament.py` functions return.
+    """
+
+    def create_tournament(self, name):
+        """Adds a tournament and returns its id."""
+        raise NotImplementedError
+
+    def archive_tournament(self, tournament):
+        """Takes a tournament's matches out of the live match store."""
+        raise NotImplementedError
+
+    def delete_matches(self, tournament):
+        """Removes all the matches of a tournament."""
+        raise NotImplementedError
+
+    def delete_players(self, tournament):
+        """Removes all the players of a tournament."""
+        raise NotImplementedError
+
+    def count_players(self, tournament):
+        """Returns the number of players registered in a tournament."""
+        raise NotImplementedError
+
+    def register_player(self, name, tournament):
+        """Adds a player to a tournament."""
+        raise NotImplementedError
+
+    def register_players(self, names, tournament):
+        """Adds a list of players to a tournament at once."""
+        raise NotImplementedError
+
+    def player_standings(self, tournament):
+        """Returns (id, name, wins, matches, draws, points, buchholz, omw)
+        rows.
+
+        Rows are sorted by points, buchholz and omw, highest first, then by
+        id; see pairing.tiebreak_standings() for the tiebreakers.
+        """
+        raise NotImplementedError
+
+    def verify_standings(self, tournament):
+        """Returns the ids of players whose stored standings are wrong."""
+        raise NotImplementedError
+
+    def report_match(self, winner, loser, draw, tournament):
+        """Records the result of one match; draw is a boolean."""
+        raise NotImplementedError
+
+    def report_matches(self, winners, losers, draws, tournament):
+        """Records the results of many matches; all of them or none.
+
+        winners, losers and draws are parallel lists, one entry per match.
+        """
+        raise NotImplementedError
+
+    def get_matches(self, tournament):
+        """Returns (winner, loser) rows sorted by winner, descending."""
+        raise NotImplementedError
+
+    def swiss_pairings(self, tournament):
+        """Pairs the next round where the data lives, like pair_perfect().
+
+        Returns (id1, name1, id2, name2) rows; raises ValueError if no
+        pairing without rematches exists.
+        """
+        raise NotImplementedError
+
+    def export_snapshot(self, tournament):
+        """Returns the players and live matches of a tournament as two
+        streams in PostgreSQL's binary COPY format (see util.snapshot).
+
+        The players stream holds (id, name) rows in id order, the matches
+        stream (winner, loser, draw) rows.
+        """
+        raise NotImplementedError
+
+    def import_snapshot(self, players, matches, tournament):
+        """Replaces the players and matches of a tournament with those of
+        the streams export_snapshot() returned; all of them or none.
+
+        The players get new ids, in the order of their old ones.
+        """
+        raise NotImplementedError
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+from array import array
+
+from backends.base import Backend
+from pairing import DRAW_POINTS, \
+                    WIN_POINTS, \
+                    pair_perfect, \
+                    tiebreak_standings
+from util.snapshot import decode_copy, encode_copy
+
+
+class _Tournament(object):
+    """
+    The players and matches of one tournament, stored column-wise.
+
+    Player columns are indexed by the player's slot (its position in the
+    registration order); `slots` maps player ids to slots.  Match columns
+    hold one entry per match; `drawn` is 1 for a draw, 0 otherwise.
+    """
+    __slots__ = ('name', 'archived', 'ids', 'names', 'wins', 'played',
+                 'draws', 'points', 'slots', 'winners', 'losers', 'drawn',
+                 'pairs')
+
+    def __init__(self, name):
+        self.name = name
+        self.archived = False
+        self.ids = array('l')
+        self.names = []
+        self.wins = array('l')
+        self.played = array('l')
+        self.draws = array('l')
+        self.points = array('l')
+        self.slots = {}
+        self.winners = array('l')
+        self.losers = array('l')
+        self.drawn = array('b')
+        # (greatest, least) id of every match, to prevent rematches
+        self.pairs = set()
+
+
+class MemoryBackend(Backend):
+    """
+    Stores tournaments in memory, for simulations and tests.
+
+    It follows the rules of the database schema: player ids are unique
+    across tournaments, a default tournament with id 1 exists, both players
+    of a match must be registered in its tournament, rematches (and second
+    byes, stored as winner == loser) are refused and archived tournaments
+    take no new matches.  Where the database would
+    raise an integrity error this raises ValueError and changes nothing.
+    """
+
+    def __init__(self):
+        self.tournaments = {}
+        self._next_tournament = 1
+        self._next_player = 1
+        self.create_tournament('Default')
+
+    def _get(self, tournament):
+        try:
+            return self.tournaments[tournament]
+        except KeyError:
+            raise ValueError("No tournament with id %s." % tournament)
+
+    def create_tournament(self, name):
+        tournament = self._next_tournament
+        self._next_tournament += 1
+        self.tournaments[tournament] = _Tournament(name)
+        return tournament
+
+    def archive_tournament(self, tournament):
+        self._get(tournament).archived = True
+
+    def delete_matches(self, tournament):
+        t = self._get(tournament)
+        if t.archived:
+            return
+        n = len(t.ids)
+        t.wins = array('l', [0]) * n
+        t.played = array('l', [0]) * n
+        t.draws = array('l', [0]) * n
+        t.points = array('l', [0]) * n
+        t.winners = array('l')
+        t.losers = array('l')
+        t.drawn = array('b')
+        t.pairs = set()
+
+    def delete_players(self, tournament):
+        t = self._get(tournament)
+        if t.winners:
+            raise ValueError(
+                "Players of tournament %s still have matches." % tournament)
+        t.ids = array('l')
+        t.names = []
+        t.wins = array('l')
+        t.played = array('l')
+        t.draws = array('l')
+        t.points = array('l')
+        t.slots = {}
+
+    def count_players(self, tournament):
+        return len(self._get(tournament).ids)
+
+    def register_player(self, name, tournament):
+        self.register_players([name], tournament)
+
+    def register_players(self, names, tournament):
+        t = self._get(tournament)
+        for name in names:
+            player = self._next_player
+            self._next_player += 1
+            t.slots[player] = len(t.ids)
+            t.ids.append(player)
+            t.names.append(name)
+            t.wins.append(0)
+            t.played.append(0)
+            t.draws.append(0)
+            t.points.append(0)
+
+    def player_standings(self, tournament):
+        t = self._get(tournament)
+        # an archived tournament keeps its tiebreakers, as player_stats does
+        return tiebreak_standings(
+            zip(t.ids, t.names, t.wins, t.played, t.draws, t.points),
+            zip(t.winners, t.losers))
+
+    def verify_standings(self, tournament):
+        t = self._get(tournament)
+        n = len(t.ids)
+        wins = [0] * n
+        played = [0] * n
+        draws = [0] * n
+        if not t.archived:
+            for winner, loser, draw in zip(t.winners, t.losers, t.drawn):
+                played[t.slots[winner]] += 1
+                if loser != winner:
+                    played[t.slots[loser]] += 1
+                if draw:
+                    draws[t.slots[winner]] += 1
+                    draws[t.slots[loser]] += 1
+                else:
+                    wins[t.slots[winner]] += 1
+        return sorted(
+            t.ids[k] for k in range(n)
+            if (wins[k], played[k], draws[k],
+                WIN_POINTS * wins[k] + DRAW_POINTS * draws[k]) !=
+            (t.wins[k], t.played[k], t.draws[k], t.points[k]))
+
+    def report_match(self, winner, loser, draw, tournament):
+        self.report_matches([winner], [loser], [draw], tournament)
+
+    def report_matches(self, winners, losers, draws, tournament):
+        t = self._get(tournament)
+        if t.archived:
+            raise ValueError("Tournament %s is archived." % tournament)
+        # check every match before recording any of them
+        new_pairs = set()
+        for winner, loser, draw in zip(winners, losers, draws):
+            if winner not in t.slots or loser not in t.slots:
+                raise ValueError(
+                    "Players %s and %s are not both registered in "
+                    "tournament %s." % (winner, loser, tournament))
+            if draw and winner == loser:
+                raise ValueError("A bye cannot be a draw.")
+            pair = (max(winner, loser), min(winner, loser))
+            if pair in t.pairs or pair in new_pairs:
+                if winner == loser:
+                    raise ValueError(
+                        "Player %s has already had a bye." % winner)
+                raise ValueError(
+                    "Players %s and %s have already played." % pair)
+            new_pairs.add(pair)
+        for winner, loser, draw in zip(winners, losers, draws):
+            w, l = t.slots[winner], t.slots[loser]
+            t.winners.append(winner)
+            t.losers.append(loser)
+            t.drawn.append(1 if draw else 0)
+            t.played[w] += 1
+            if l != w:
+                t.played[l] += 1
+            if draw:
+                t.draws[w] += 1
+                t.draws[l] += 1
+                t.points[w] += DRAW_POINTS
+                t.points[l] += DRAW_POINTS
+            else:
+                t.wins[w] += 1
+                t.points[w] += WIN_POINTS
+        t.pairs.update(new_pairs)
+
+    def get_matches(self, tournament):
+        t = self._get(tournament)
+        if t.archived:
+            return []
+        matches = list(zip(t.winners, t.losers))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches
+
+    def swiss_pairings(self, tournament):
+        return pair_perfect(self.player_standings(tournament),
+                            self.get_matches(tournament))
+
+    def export_snapshot(self, tournament):
+        t = self._get(tournament)
+        players = encode_copy(sorted(zip(t.ids, t.names)), 'it')
+        if t.archived:
+            matches = encode_copy([], 'iib')
+        else:
+            matches = encode_copy(zip(t.winners, t.losers, t.drawn), 'iib')
+        return players, matches
+
+    def import_snapshot(self, players, matches, tournament):
+        t = self._get(tournament)
+        if t.archived:
+            raise ValueError("Tournament %s is archived." % tournament)
+        players = decode_copy(players, 'it')
+        matches = decode_copy(matches, 'iib')
+        # check the snapshot before changing anything
+        ids = dict((old_id, k) for k, (old_id, _) in enumerate(players))
+        pairs = set()
+        for winner, loser, draw in matches:
+            pair = (max(winner, loser), min(winner, loser))
+            if winner not in ids or loser not in ids or pair in pairs or \
+                    (draw and winner == loser):
+                raise ValueError(
+                    "Invalid match %s in snapshot." % ((winner, loser, draw),))
+            pairs.add(pair)
+        self.delete_matches(tournament)
+        self.delete_players(tournament)
+        first = self._next_player
+        self.register_players([name for _, name in players], tournament)
+        self.report_matches([first + ids[winner] for winner, _, _ in matches],
+                            [first + ids[loser] for _, loser, _ in matches],
+                            [draw for _, _, draw in matches], tournament)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+import io
+import threading
+import weakref
+
+import psycopg2
+
+from backends.base import Backend
+
+# The statements of the most frequent calls, by name: their parameter types
+# and text.  Each is PREPAREd once per connection, the first time it runs on
+# it, and then only EXECUTEd, so PostgreSQL parses it once and can reuse its
+# plan for the life of the connection.
+STATEMENTS = {
+    'register_player': (
+        "(text, int)",
+        "INSERT INTO players (name, tournament) VALUES ($1, $2)"),
+    'report_match': (
+        "(int, int, int, boolean)",
+        "INSERT INTO matches (tournament, winner, loser, draw) "
+        "VALUES ($1, $2, $3, $4)"),
+    'player_standings': (
+        "(int)",
+        "SELECT s.id, p.name, s.wins, s.matches, s.draws, s.points, "
+        "       s.buchholz, s.omw "
+        "FROM player_stats AS s JOIN players AS p ON p.id = s.id "
+        "WHERE s.tournament = $1 "
+        "ORDER BY s.points DESC, s.buchholz DESC, s.omw DESC, s.id"),
+    'get_matches': (
+        "(int)",
+        "SELECT winner, loser FROM matches WHERE tournament = $1 "
+        "ORDER BY winner DESC"),
+}
+
+
+class PostgresBackend(Backend):
+    """
+    Stores tournaments in the PostgreSQL database defined in `tournament.sql`.
+
+    Every method runs in its own transaction on a connection checked out with
+    `connect`, a callable returning a context manager that yields a psycopg2
+    connection (`tournament.connect`).  Database errors such as
+    `psycopg2.IntegrityError` for a rematch are passed on to the caller.
+
+    The statements in `STATEMENTS` run as prepared statements; the names
+    prepared on each connection are remembered until it is closed.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+        # connection -> set of the statement names prepared on it
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _execute(self, c, name, params):
+        """Runs the prepared statement name on cursor c, preparing it first
+        if its connection has not yet.
+
+        Prepared statements belong to the session, not the transaction, so
+        they survive a rollback.
+        """
+        conn = c.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+        if name not in prepared:
+            types, query = STATEMENTS[name]
+            c.execute("PREPARE %s %s AS %s;" % (name, types, query))
+            prepared.add(name)
+        c.execute("EXECUTE %s (%s);" % (name, ", ".join(["%s"] * len(params))),
+                  params)
+
+    def create_tournament(self, name):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO tournaments (name) VALUES (%s) RETURNING id;",
+                (name,))
+            result = c.fetchone()
+        return result[0]
+
+    def archive_tournament(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "UPDATE tournaments SET archived = true WHERE id = %s;",
+                (tournament,))
+            c.execute(
+                "ALTER TABLE matches DETACH PARTITION matches_%s;",
+                (int(tournament),))
+
+    def delete_matches(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "DELETE FROM matches WHERE tournament = %s;", (tournament,))
+
+    def delete_players(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "DELETE FROM players WHERE tournament = %s;", (tournament,))
+
+    def count_players(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "SELECT COUNT(*) FROM players WHERE tournament = %s;",
+                (tournament,))
+            result = c.fetchone()
+        return result[0]
+
+    def register_player(self, name, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            self._execute(c, 'register_player', (name, tournament))
+
+    def register_players(self, names, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO players (name, tournament) "
+                "SELECT unnest(%s::text[]), %s;",
+                (names, tournament))
+
+    def player_standings(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            self._execute(c, 'player_standings', (tournament,))
+            results = c.fetchall()
+        return results
+
+    def verify_standings(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "SELECT v.id FROM v_playerStandings AS v "
+                "LEFT JOIN player_stats AS s ON s.id = v.id "
+                "LEFT JOIN tiebreak_standings(%s) AS t ON t.id = v.id "
+                "WHERE v.tournament = %s "
+                "  AND (s.id IS NULL OR s.wins <> v.wins "
+                "       OR s.matches <> v.matches OR s.draws <> v.draws "
+                "       OR s.points <> v.points "
+                "       OR s.buchholz <> t.buchholz OR s.omw <> t.omw) "
+                "ORDER BY v.id;",
+                (tournament, tournament))
+            results = c.fetchall()
+        return [row[0] for row in results]
+
+    def report_match(self, winner, loser, draw, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            self._execute(c, 'report_match',
+                          (tournament, winner, loser, draw))
+
+    def report_matches(self, winners, losers, draws, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO matches (tournament, winner, loser, draw) "
+                "SELECT %s, unnest(%s::int[]), unnest(%s::int[]), "
+                "       unnest(%s::boolean[]);",
+                (tournament, winners, losers, draws))
+
+    def get_matches(self, tournament):
+        with self.connect() as conn:
+            c = conn.cursor()
+            self._execute(c, 'get_matches', (tournament,))
+            results = c.fetchall()
+        return results
+
+    def swiss_pairings(self, tournament):
+        try:
+            with self.connect() as conn:
+                c = conn.cursor()
+                c.execute("SELECT * FROM swiss_pairings(%s);", (tournament,))
+                results = c.fetchall()
+        except psycopg2.Error as e:
+            # RAISE EXCEPTION in swiss_pairings() means no valid pairing
+            if e.pgcode == 'P0001':
+                raise ValueError(e.diag.message_primary)
+            raise
+        return results
+
+    def export_snapshot(self, tournament):
+        players = io.BytesIO()
+        matches = io.BytesIO()
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.copy_expert(
+                "COPY (SELECT id, name FROM players WHERE tournament = %d "
+                "      ORDER BY id) TO STDOUT (FORMAT binary);" %
+                int(tournament), players)
+            c.copy_expert(
+                "COPY (SELECT winner, loser, draw FROM matches "
+                "      WHERE tournament = %d) TO STDOUT (FORMAT binary);" %
+                int(tournament), matches)
+        return players.getvalue(), matches.getvalue()
+
+    def import_snapshot(self, players, matches, tournament):
+        tournament = int(tournament)
+        with self.connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT archived FROM tournaments WHERE id = %s "
+                      "FOR UPDATE;", (tournament,))
+            row = c.fetchone()
+            if row is None:
+                raise ValueError("No tournament with id %s." % tournament)
+            if row[0]:
+                raise ValueError("Tournament %s is archived." % tournament)
+            c.execute("DELETE FROM matches WHERE tournament = %s;",
+                      (tournament,))
+            c.execute("DELETE FROM players WHERE tournament = %s;",
+                      (tournament,))
+            c.execute("CREATE TEMP TABLE snapshot_players "
+                      "(id int, name text) ON COMMIT DROP;")
+            c.execute("CREATE TEMP TABLE snapshot_matches "
+                      "(winner int, loser int, draw boolean) ON COMMIT DROP;")
+            c.copy_expert("COPY snapshot_players FROM STDIN (FORMAT binary);",
+                          io.BytesIO(players))
+            c.copy_expert("COPY snapshot_matches FROM STDIN (FORMAT binary);",
+                          io.BytesIO(matches))
+            # new ids, in the order of the old ones
+            c.execute(
+                "CREATE TEMP TABLE snapshot_ids ON COMMIT DROP AS "
+                "SELECT id, nextval(pg_get_serial_sequence('players', 'id')) "
+                "       AS new_id "
+                "FROM (SELECT id FROM snapshot_players ORDER BY id) AS p;")
+            c.execute(
+                "INSERT INTO players (id, name, tournament) "
+                "SELECT i.new_id, p.name, %s FROM snapshot_players AS p "
+                "JOIN snapshot_ids AS i ON i.id = p.id ORDER BY i.new_id;",
+                (tournament,))
+            # the triggers of matches would update player_stats once per
+            # match and then recompute the tiebreakers; for this transaction
+            # they are told to do nothing, and the stats are computed in one
+            # pass instead
+            c.execute("SET LOCAL tournament.bulk_load = on;")
+            c.execute(
+                "INSERT INTO matches (tournament, winner, loser, draw) "
+                "SELECT %s, w.new_id, l.new_id, m.draw "
+                "FROM snapshot_matches AS m "
+                "JOIN snapshot_ids AS w ON w.id = m.winner "
+                "JOIN snapshot_ids AS l ON l.id = m.loser;",
+                (tournament,))
+            inserted = c.rowcount
+            c.execute("SET LOCAL tournament.bulk_load = off;")
+            c.execute("SELECT count(*) FROM snapshot_matches;")
+            if c.fetchone()[0] != inserted:
+                raise ValueError(
+                    "Snapshot has matches of players who are not in it.")
+            c.execute(
+                "UPDATE player_stats AS s "
+                "SET wins = r.wins, matches = r.matches, draws = r.draws, "
+                "    points = 3 * r.wins + r.draws "
+                "FROM (SELECT player, count(*) FILTER (WHERE win) AS wins, "
+                "             count(*) AS matches, "
+                "             count(*) FILTER (WHERE draw) AS draws "
+                "      FROM (SELECT winner AS player, NOT draw AS win, draw "
+                "            FROM matches WHERE tournament = %s "
+                "            UNION ALL "
+                "            SELECT loser, false, draw "
+                "            FROM matches "
+                "            WHERE tournament = %s AND loser <> winner) AS m "
+                "      GROUP BY player) AS r "
+                "WHERE s.id = r.player;",
+                (tournament, tournament))
+            c.execute(
+                "SELECT refresh_tiebreaks(%s, array_agg(id)) "
+                "FROM player_stats WHERE tournament = %s;",
+                (tournament, tournament))
+            # the planner's statistics still describe the tables before the
+            # bulk load; refresh them so the first reads get good plans
+            c.execute("ANALYZE players, player_stats, matches_%s;",
+                      (tournament,))
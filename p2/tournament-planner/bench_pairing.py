@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# bench_pairing.py -- scaling benchmark for the pairing engine
+#
+# Usage: python bench_pairing.py [rounds] [legacy_limit]
+#
+# Builds synthetic standings and match histories for 1k, 10k and 100k players
+# and times pair_players() and pair_perfect() against the original
+# list-scanning swissPairings() loop.  The original loop is quadratic, so it
+# is only run for fields of up to `legacy_limit` players (default 10000);
+# where it runs, its pairings are checked to be identical to pair_players().
+# No database is needed.
+
+import logging
+import random
+import sys
+import time
+
+from pairing import pair_perfect, pair_players
+from util.logger import logger
+
+SIZES = [1000, 10000, 100000]
+
+
+def legacy_pairings(ps, prev_matches):
+    """The pairing loop of swissPairings() before the pairing engine."""
+    ps = list(ps)
+    pairs = []
+    while len(ps):
+        p1 = ps.pop(0)
+        p1_id = p1[0]
+        p1_name = p1[1]
+        p1_wins = p1[2]
+        same_rank = [row for row in ps if row[2] == p1_wins]
+        same_rank.reverse()
+        for p2 in same_rank:
+            p2_id = p2[0]
+            p2_name = p2[1]
+            if p1_id != p2_id and not(
+                (p1_id, p2_id) in prev_matches or
+                (p2_id, p1_id) in prev_matches):
+                pairs.append((p1_id, p1_name, p2_id, p2_name))
+                ps.remove(p2)
+                break
+            else:
+                logger.warn('skipped: %s', (p1_id, p2_id))
+    return pairs
+
+
+def standings_for(n_players, wins, played):
+    """Returns (id, name, wins, matches) rows sorted by wins, like the view."""
+    rows = [(i, 'Player %s' % i, wins[i], played[i])
+            for i in xrange(1, n_players + 1)]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+
+def simulate(n_players, n_rounds, seed=0):
+    """Plays `n_rounds` random rounds and returns (standings, matches)."""
+    rng = random.Random(seed)
+    wins = dict((i, 0) for i in xrange(1, n_players + 1))
+    played = dict(wins)
+    matches = []
+    for _ in xrange(n_rounds):
+        standings = standings_for(n_players, wins, played)
+        for id1, _, id2, _ in pair_players(standings, matches):
+            winner, loser = (id1, id2) if rng.random() < 0.5 else (id2, id1)
+            matches.append((winner, loser))
+            wins[winner] += 1
+            played[winner] += 1
+            played[loser] += 1
+    return standings_for(n_players, wins, played), matches
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+if __name__ == '__main__':
+    n_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    legacy_limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    # keep the rematch warnings out of the timings
+    logger.setLevel(logging.ERROR)
+
+    print "%8s %8s %12s %12s %12s" % ('players', 'matches', 'engine (s)',
+                                      'perfect (s)', 'legacy (s)')
+    for n_players in SIZES:
+        standings, matches = simulate(n_players, n_rounds)
+        pairs, engine_time = timed(pair_players, standings, matches)
+        _, perfect_time = timed(pair_perfect, standings, matches)
+        if n_players <= legacy_limit:
+            old_pairs, legacy_time = timed(legacy_pairings, standings, matches)
+            if old_pairs != pairs:
+                raise ValueError(
+                    "Pairing engine disagrees with the original pairings "
+                    "for %s players." % n_players)
+            legacy = '%12.4f' % legacy_time
+        else:
+            legacy = '%12s' % 'skipped'
+        print "%8d %8d %12.4f %12.4f %s" % (n_players, len(matches),
+                                            engine_time, perfect_time, legacy)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+# bench_pool.py -- compare match reporting through the connection pool with
+# opening a new connection for every call.
+#
+# Usage: python bench_pool.py [matches] [threads]
+#
+# WARNING: this wipes the players and matches tables of the tournament DB.
+
+import sys
+import threading
+import time
+
+import psycopg2
+
+from tournament import DEFAULT_TOURNAMENT, \
+                       DSN, \
+                       configurePool, \
+                       deleteMatches, \
+                       deletePlayers, \
+                       playerStandings, \
+                       registerPlayers, \
+                       reportMatch
+
+
+def reportMatchUnpooled(winner, loser):
+    """reportMatch() as it was before pooling: one connection per call."""
+    conn = psycopg2.connect(DSN)
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO matches (tournament, winner, loser) "
+        "VALUES (%s, %s, %s);",
+        (DEFAULT_TOURNAMENT, winner, loser))
+    conn.commit()
+    conn.close()
+
+
+def setup(n_matches):
+    """Register two players per match and return the pairs to report."""
+    deleteMatches()
+    deletePlayers()
+    registerPlayers('Player %s' % i for i in xrange(n_matches * 2))
+    ids = [row[0] for row in playerStandings()]
+    return zip(ids[0::2], ids[1::2])
+
+
+def run(report, pairs, n_threads):
+    """Report all pairs with `report` over `n_threads` threads.
+
+    Returns the number of reports per second.
+    """
+    chunks = [pairs[i::n_threads] for i in xrange(n_threads)]
+
+    def worker(chunk):
+        for winner, loser in chunk:
+            report(winner, loser)
+
+    threads = [threading.Thread(target=worker, args=(chunk,))
+               for chunk in chunks]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    return len(pairs) / elapsed
+
+
+if __name__ == '__main__':
+    n_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    configurePool(minconn=1, maxconn=max(n_threads, 1))
+
+    pairs = setup(n_matches)
+    unpooled = run(reportMatchUnpooled, pairs, n_threads)
+
+    deleteMatches()
+    pooled = run(reportMatch, pairs, n_threads)
+
+    deleteMatches()
+    deletePlayers()
+
+    print "%d matches, %d thread(s)" % (n_matches, n_threads)
+    print "connect per call: %10.1f reports/s" % unpooled
+    print "pooled:           %10.1f reports/s" % pooled
+    print "speedup:          %10.2fx" % (pooled / unpooled)
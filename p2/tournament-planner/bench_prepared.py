@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+# bench_prepared.py -- plan time saved by the prepared standings statement
+#
+# Usage: python bench_prepared.py [rounds] [repeat]
+#
+# Fills the tournament DB with 100, 1k and 10k players in turn, plays
+# `rounds` random rounds (default 5) and reads the standings `repeat` times
+# (default 50) on one connection, both as the plain SELECT and as the
+# prepared statement playerStandings() runs (backends.postgres.STATEMENTS).
+# Prints the mean planning and execution time reported by EXPLAIN ANALYZE,
+# and the mean round trip of running the query and fetching its rows.
+#
+# PostgreSQL plans the first executions of a prepared statement for their
+# parameters and then switches to a cached generic plan if it is no worse,
+# so the prepared planning time drops after a few calls.
+#
+# WARNING: this wipes the players and matches tables of the tournament DB.
+
+import json
+import sys
+import time
+
+from backends.postgres import STATEMENTS
+from tournament import DEFAULT_TOURNAMENT, \
+                       connect, \
+                       deleteMatches, \
+                       deletePlayers
+from util.bench import populate
+
+SIZES = [100, 1000, 10000]
+
+PLAIN_QUERY = (
+    "SELECT s.id, p.name, s.wins, s.matches, s.draws, s.points, "
+    "       s.buchholz, s.omw "
+    "FROM player_stats AS s JOIN players AS p ON p.id = s.id "
+    "WHERE s.tournament = %s "
+    "ORDER BY s.points DESC, s.buchholz DESC, s.omw DESC, s.id;")
+
+EXECUTE_QUERY = "EXECUTE bench_standings (%s);"
+
+
+def explain_times(c, query):
+    """Returns the (planning, execution) time in ms EXPLAIN ANALYZE reports
+    for query."""
+    c.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query,
+              (DEFAULT_TOURNAMENT,))
+    plan = c.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return plan[0]['Planning Time'], plan[0]['Execution Time']
+
+
+def measure(c, query, repeat):
+    """Returns the mean planning, execution and round trip times in ms of
+    running query repeat times."""
+    planning = execution = round_trip = 0.0
+    for _ in xrange(repeat):
+        p, e = explain_times(c, query)
+        planning += p
+        execution += e
+        start = time.time()
+        c.execute(query, (DEFAULT_TOURNAMENT,))
+        c.fetchall()
+        round_trip += 1000 * (time.time() - start)
+    return planning / repeat, execution / repeat, round_trip / repeat
+
+
+if __name__ == '__main__':
+    n_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    types, query = STATEMENTS['player_standings']
+    print "%8s %-9s %14s %14s %16s" % ('players', 'statement', 'plan (ms)',
+                                       'execute (ms)', 'round trip (ms)')
+    for n_players in SIZES:
+        populate(n_players, n_rounds)
+        with connect() as conn:
+            c = conn.cursor()
+            c.execute("PREPARE bench_standings %s AS %s;" % (types, query))
+            for label, q in [('plain', PLAIN_QUERY),
+                             ('prepared', EXECUTE_QUERY)]:
+                print "%8d %-9s %14.3f %14.3f %16.3f" % (
+                    (n_players, label) + measure(c, q, repeat))
+            c.execute("DEALLOCATE bench_standings;")
+
+    deleteMatches()
+    deletePlayers()
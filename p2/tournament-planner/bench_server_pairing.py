@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# bench_server_pairing.py -- compare pairing in Python with pairing inside
+# PostgreSQL as the match history grows
+#
+# Usage: python bench_server_pairing.py [players] [rounds] [repeat]
+#
+# Registers `players` players (default 1000) and plays `rounds` random rounds
+# (default 10).  Before each round both swissPairings(perfect=True), which
+# fetches the standings and all matches into Python, and
+# serverSwissPairings(), which runs the swiss_pairings() SQL function, are
+# timed (best of `repeat`, default 3) and checked to return the same pairs.
+# The standings cache is emptied before every client call, so that both sides
+# read the standings from the database.
+#
+# WARNING: this wipes the players and matches tables of the tournament DB.
+
+import random
+import sys
+
+from tournament import deleteMatches, \
+                       deletePlayers, \
+                       registerPlayers, \
+                       reportMatches, \
+                       serverSwissPairings, \
+                       standings_cache, \
+                       swissPairings
+from util.bench import best_of
+
+
+def client_pairings():
+    """Returns swissPairings(perfect=True) without a standings cache hit."""
+    standings_cache.invalidate()
+    return swissPairings(perfect=True)
+
+if __name__ == '__main__':
+    n_players = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    deleteMatches()
+    deletePlayers()
+    registerPlayers('Player %s' % i for i in xrange(n_players))
+
+    print "%6s %8s %12s %12s" % ('round', 'matches', 'client (ms)',
+                                 'server (ms)')
+    n_matches = 0
+    for game_round in xrange(n_rounds):
+        client, client_time = best_of(repeat, client_pairings)
+        server, server_time = best_of(repeat, serverSwissPairings)
+        if client != server:
+            raise ValueError(
+                "Server-side pairings differ from client-side pairings in "
+                "round %s." % game_round)
+        print "%6d %8d %12.2f %12.2f" % (game_round, n_matches,
+                                         1000 * client_time,
+                                         1000 * server_time)
+        results = []
+        for id1, _, id2, _ in server:
+            results.append((id1, id2) if random.random() < 0.5 else (id2, id1))
+        reportMatches(results)
+        n_matches += len(results)
+
+    deleteMatches()
+    deletePlayers()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+# bench_snapshot.py -- save and restore time of tournament snapshots
+#
+# Usage: python bench_snapshot.py [players] [rounds] [--memory]
+#
+# Registers `players` players (default 100000), plays `rounds` rounds
+# (default 5), then times saveSnapshot() and loadSnapshot() into a new
+# tournament against rebuilding the same state with registerPlayers() and
+# reportMatches(), and checks that the restored standings equal the
+# original ones.  The first playerStandings() read of the restored
+# tournament is timed too, since it runs on whatever statistics the load left
+# behind.  With --memory it runs against the in-memory backend.
+#
+# WARNING: without --memory this wipes the players and matches tables of the
+# tournament DB.
+
+import os
+import sys
+import tempfile
+import time
+
+from backends.memory import MemoryBackend
+from tournament import DEFAULT_TOURNAMENT, \
+                       createTournament, \
+                       deleteMatches, \
+                       deletePlayers, \
+                       getMatches, \
+                       loadSnapshot, \
+                       playerStandings, \
+                       registerPlayers, \
+                       reportMatches, \
+                       saveSnapshot, \
+                       setBackend
+from util.bench import populate
+
+
+def rebuild(tournament):
+    """Registers the default tournament's players in tournament and reports
+    its matches there, the way a fixture is built without snapshots."""
+    standings = sorted(playerStandings())
+    registerPlayers([name for _, name, _, _ in standings], tournament)
+    new_ids = dict(zip([row[0] for row in standings],
+                       sorted(row[0] for row in playerStandings(tournament))))
+    reportMatches([(new_ids[winner], new_ids[loser])
+                   for winner, loser in getMatches()], tournament)
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--memory']
+    n_players = int(args[0]) if len(args) > 0 else 100000
+    n_rounds = int(args[1]) if len(args) > 1 else 5
+    if '--memory' in sys.argv[1:]:
+        setBackend(MemoryBackend())
+
+    populate(n_players, n_rounds, perfect=False)
+    fd, filename = tempfile.mkstemp(suffix='.snapshot')
+    os.close(fd)
+    try:
+        start = time.time()
+        saveSnapshot(filename)
+        save_time = time.time() - start
+        size = os.path.getsize(filename)
+
+        restored = createTournament("Restored")
+        start = time.time()
+        loadSnapshot(filename, restored)
+        load_time = time.time() - start
+    finally:
+        os.remove(filename)
+
+    start = time.time()
+    restored_standings = playerStandings(restored)
+    first_read_time = time.time() - start
+
+    if [row[1:] for row in restored_standings] != \
+            [row[1:] for row in playerStandings()]:
+        raise ValueError("Restored standings differ from the original.")
+
+    rebuilt = createTournament("Rebuilt")
+    start = time.time()
+    rebuild(rebuilt)
+    rebuild_time = time.time() - start
+
+    print "%d players, %d matches, snapshot of %.1f MB" % (
+        n_players, len(getMatches()), size / 1e6)
+    print "%-10s %10s" % ('operation', 'time (s)')
+    print "%-10s %10.2f" % ('save', save_time)
+    print "%-10s %10.2f" % ('restore', load_time)
+    print "%-10s %10.2f" % ('first read', first_read_time)
+    print "%-10s %10.2f" % ('rebuild', rebuild_time)
+
+    for tournament in (restored, rebuilt, DEFAULT_TOURNAMENT):
+        deleteMatches(tournament)
+        deletePlayers(tournament)
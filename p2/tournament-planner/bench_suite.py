@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#
+# bench_suite.py -- load test of the tournament API
+#
+# Registers `--players` players one by one, then plays `--rounds` rounds,
+# reporting every match with its own reportMatch() call.  Records the
+# latency of every registerPlayer() and reportMatch() call and, before each
+# round, of `--repeat` playerStandings() and swissPairings() calls, and
+# prints the throughput and the p50/p99 latencies of each operation.  With
+# `--json` (or `--output FILE`) the results are written as JSON, tagged with
+# the current git commit, so that runs can be compared across commits.
+# `--profile` also prints the time spent in each phase of every database
+# operation (see tournament.enableQueryProfiling()).
+#
+# Usage: python bench_suite.py --players 1000 --rounds 10 --memory --json
+#        python bench_suite.py --help
+#
+# WARNING: without --memory this wipes the players and matches tables of the
+# tournament DB.
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import time
+
+import tournament
+from backends.memory import MemoryBackend
+from simulate import percentile
+from tournament import deleteMatches, \
+                       deletePlayers, \
+                       enableQueryProfiling, \
+                       metricsSnapshot, \
+                       playerStandings, \
+                       registerPlayer, \
+                       reportMatch, \
+                       setBackend, \
+                       standings_cache, \
+                       swissPairings
+from util.logger import logger
+
+
+def git_commit():
+    """Returns the abbreviated hash of the checked out commit, or None."""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull,
+                cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(samples, func, *args, **kwargs):
+    """Calls func, appends its duration in seconds to samples and returns
+    its result."""
+    start = time.time()
+    result = func(*args, **kwargs)
+    samples.append(time.time() - start)
+    return result
+
+
+def summarize(samples):
+    """Returns the count, throughput and latency percentiles of samples."""
+    total = sum(samples)
+    ordered = sorted(samples)
+    return {
+        'count': len(samples),
+        'total_s': total,
+        'ops_per_s': len(samples) / total if total else 0.0,
+        'mean_ms': 1000 * total / len(samples) if samples else 0.0,
+        'p50_ms': 1000 * percentile(ordered, 50),
+        'p99_ms': 1000 * percentile(ordered, 99),
+    }
+
+
+def run(n_players, n_rounds, repeat, perfect, seed):
+    """Runs the load test and returns the samples of every operation."""
+    rng = random.Random(seed)
+    samples = {'registerPlayer': [],
+               'reportMatch': [],
+               'playerStandings': [],
+               'playerStandings (cached)': [],
+               'swissPairings': []}
+
+    deleteMatches()
+    deletePlayers()
+    for i in xrange(n_players):
+        timed(samples['registerPlayer'], registerPlayer, 'Player %s' % i)
+
+    for _ in xrange(n_rounds):
+        for _ in xrange(max(repeat, 1)):
+            # time the queries, not the standings cache
+            standings_cache.invalidate()
+            timed(samples['playerStandings'], playerStandings)
+            timed(samples['playerStandings (cached)'], playerStandings)
+            standings_cache.invalidate()
+            pairs = timed(samples['swissPairings'], swissPairings,
+                          perfect=perfect)
+        for id1, _, id2, _ in pairs:
+            if id2 is not None and rng.random() < 0.5:
+                id1, id2 = id2, id1
+            timed(samples['reportMatch'], reportMatch, id1, id2)
+
+    deleteMatches()
+    deletePlayers()
+    return samples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Load-test the tournament API.")
+    parser.add_argument('--players', type=int, default=1000,
+                        help="players to register (default: 1000)")
+    parser.add_argument('--rounds', type=int, default=10,
+                        help="rounds to play (default: 10)")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="standings and pairing calls timed per round "
+                             "(default: 5)")
+    parser.add_argument('--perfect', action='store_true',
+                        help="use perfect pairings (swissPairings(perfect))")
+    parser.add_argument('--memory', action='store_true',
+                        help="run against the in-memory backend instead of "
+                             "the tournament database")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed for the match results")
+    parser.add_argument('--profile', action='store_true',
+                        help="print the time spent connecting, executing, "
+                             "fetching and committing per database operation")
+    parser.add_argument('--json', action='store_true',
+                        help="print the results as JSON")
+    parser.add_argument('--output', metavar='FILE',
+                        help="also write the JSON results to FILE")
+    args = parser.parse_args()
+
+    # keep logging out of the timings
+    logger.setLevel(logging.ERROR)
+    if args.memory:
+        setBackend(MemoryBackend())
+    if args.profile:
+        # no slow query log: it would add EXPLAINs to the timings
+        enableQueryProfiling(threshold=float('inf'))
+
+    samples = run(args.players, args.rounds, args.repeat, args.perfect,
+                  args.seed)
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'backend': type(tournament.backend).__name__,
+        'players': args.players,
+        'rounds': args.rounds,
+        'repeat': args.repeat,
+        'perfect': args.perfect,
+        'operations': dict((name, summarize(values))
+                           for name, values in samples.items()),
+        'metrics': metricsSnapshot(),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.json:
+        print json.dumps(results, indent=2, sort_keys=True)
+    else:
+        print "%(backend)s, %(players)d players, %(rounds)d rounds " \
+              "(commit %(commit)s)" % results
+        print "%-26s %8s %12s %10s %10s" % ('operation', 'count', 'ops/s',
+                                            'p50 (ms)', 'p99 (ms)')
+        for name in sorted(results['operations']):
+            op = results['operations'][name]
+            print "%-26s %8d %12.1f %10.3f %10.3f" % (
+                name, op['count'], op['ops_per_s'], op['p50_ms'],
+                op['p99_ms'])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# bench_tiebreakers.py -- cost of the Buchholz/OMW tiebreak standings
+#
+# Usage: python bench_tiebreakers.py [rounds] [naive_limit] [repeat]
+#
+# Fills the tournament DB with 1k, 10k and 100k players in turn, plays
+# `rounds` random rounds (default 5) and times (best of `repeat`, default 3)
+# four ways of reading the standings:
+#   view:     the v_playerStandings view, ordered by points only
+#   stored:   the tiebreakers kept in player_stats by triggers, read in
+#             player_stats_points_idx order, as playerStandings() does
+#   one pass: the tiebreak_standings() SQL function
+#   naive:    the same tiebreakers as correlated subqueries, one per player
+# The stored rows are checked to equal the one-pass rows.  The naive query
+# runs once per opponent lookup and player, so it is only run for fields of
+# up to `naive_limit` players (default 10000); where it runs, its rows are
+# checked to equal the one-pass rows too.
+#
+# WARNING: this wipes the players and matches tables of the tournament DB.
+
+import sys
+
+from tournament import DEFAULT_TOURNAMENT, \
+                       connect, \
+                       deleteMatches, \
+                       deletePlayers
+from util.bench import best_of, populate
+
+SIZES = [1000, 10000, 100000]
+
+VIEW_QUERY = "SELECT * FROM v_playerStandings WHERE tournament = %s;"
+
+STORED_QUERY = (
+    "SELECT s.id, p.name, s.wins, s.matches, s.draws, s.points, "
+    "       s.buchholz, s.omw "
+    "FROM player_stats AS s JOIN players AS p ON p.id = s.id "
+    "WHERE s.tournament = %s "
+    "ORDER BY s.points DESC, s.buchholz DESC, s.omw DESC, s.id;")
+
+ONE_PASS_QUERY = ("SELECT * FROM tiebreak_standings(%s) "
+                  "ORDER BY points DESC, buchholz DESC, omw DESC, id;")
+
+# opponents of the outer query's player s
+_OPPONENTS = ("FROM matches AS m JOIN player_stats AS o ON o.id = "
+              "  CASE WHEN m.winner = s.id THEN m.loser ELSE m.winner END "
+              "WHERE m.tournament = s.tournament AND m.winner <> m.loser "
+              "  AND (m.winner = s.id OR m.loser = s.id)")
+
+NAIVE_QUERY = (
+    "SELECT p.id, p.name, s.wins, s.matches, s.draws, s.points, "
+    "       (SELECT coalesce(sum(o.points), 0) " + _OPPONENTS + ") "
+    "           AS buchholz, "
+    "       (SELECT coalesce(round(avg(o.points::numeric / "
+    "                                  (3 * o.matches)), 4), "
+    "                        0)::float8 " + _OPPONENTS + ") AS omw "
+    "FROM player_stats AS s JOIN players AS p ON p.id = s.id "
+    "WHERE s.tournament = %s "
+    "ORDER BY s.points DESC, buchholz DESC, omw DESC, s.id;")
+
+
+def query_best_of(repeat, query):
+    """Returns (rows, best time in seconds) of running query repeat times on
+    one connection."""
+    with connect() as conn:
+        c = conn.cursor()
+
+        def run():
+            c.execute(query, (DEFAULT_TOURNAMENT,))
+            return c.fetchall()
+
+        return best_of(repeat, run)
+
+
+if __name__ == '__main__':
+    n_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    naive_limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    print "%8s %8s %12s %12s %14s %12s" % (
+        'players', 'matches', 'view (ms)', 'stored (ms)', 'one pass (ms)',
+        'naive (ms)')
+    for n_players in SIZES:
+        populate(n_players, n_rounds, analyze=True)
+        _, view_time = query_best_of(repeat, VIEW_QUERY)
+        rows, one_pass_time = query_best_of(repeat, ONE_PASS_QUERY)
+        stored_rows, stored_time = query_best_of(repeat, STORED_QUERY)
+        if stored_rows != rows:
+            raise ValueError(
+                "Stored tiebreakers disagree with tiebreak_standings() "
+                "for %s players." % n_players)
+        if n_players <= naive_limit:
+            naive_rows, naive_time = query_best_of(repeat, NAIVE_QUERY)
+            if naive_rows != rows:
+                raise ValueError(
+                    "Naive tiebreakers disagree with tiebreak_standings() "
+                    "for %s players." % n_players)
+            naive = '%12.2f' % (1000 * naive_time)
+        else:
+            naive = '%12s' % 'skipped'
+        print "%8d %8d %12.2f %12.2f %14.2f %s" % (
+            n_players, n_rounds * (n_players // 2),
+            1000 * view_time, 1000 * stored_time, 1000 * one_pass_time,
+            naive)
+
+    deleteMatches()
+    deletePlayers()
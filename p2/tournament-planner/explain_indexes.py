@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# explain_indexes.py -- show which query plans the tournament indexes change
+#
+# Usage: python explain_indexes.py [players] [rounds]
+#
+# Fills the tournament DB with `players` players (default 10000) and plays
+# `rounds` random rounds (default 5).  Then every query below is run through
+# EXPLAIN ANALYZE twice: once as is, and once inside a transaction that drops
+# the indexes and is rolled back afterwards.  Both plans are printed and
+# queries whose plan changes are flagged.
+#
+# WARNING: this wipes the players and matches tables of the tournament DB.
+
+import sys
+
+from tournament import DEFAULT_TOURNAMENT, \
+                       connect, \
+                       deleteMatches, \
+                       deletePlayers, \
+                       playerStandings
+from util.bench import populate
+
+# Indexes to compare the plans with and without
+INDEXES = ['matches_loser_idx', 'player_stats_points_idx']
+
+# (description, query); %(tournament)s is replaced by the default tournament
+# and %(player)s by a mid-table player id
+QUERIES = [
+    ("matches lost by a player",
+     "SELECT * FROM matches WHERE tournament = %(tournament)s "
+     "AND loser = %(player)s"),
+    ("matches played by a player",
+     "SELECT * FROM matches WHERE tournament = %(tournament)s "
+     "AND (winner = %(player)s OR loser = %(player)s)"),
+    ("opponents of a player",
+     "SELECT loser FROM matches WHERE tournament = %(tournament)s "
+     "AND winner = %(player)s "
+     "UNION ALL SELECT winner FROM matches WHERE tournament = %(tournament)s "
+     "AND loser = %(player)s"),
+    ("ordered standings (player_stats, as playerStandings() reads them)",
+     "SELECT s.id, p.name, s.wins, s.matches, s.draws, s.points, "
+     "s.buchholz, s.omw FROM player_stats AS s "
+     "JOIN players AS p ON p.id = s.id "
+     "WHERE s.tournament = %(tournament)s "
+     "ORDER BY s.points DESC, s.buchholz DESC, s.omw DESC, s.id"),
+    ("top 10 of the standings (player_stats)",
+     "SELECT id, points, buchholz, omw FROM player_stats "
+     "WHERE tournament = %(tournament)s "
+     "ORDER BY points DESC, buchholz DESC, omw DESC, id LIMIT 10"),
+    ("ordered standings (v_playerStandings)",
+     "SELECT * FROM v_playerStandings WHERE tournament = %(tournament)s"),
+]
+
+
+def explain(c, query):
+    c.execute("EXPLAIN ANALYZE " + query)
+    return [row[0] for row in c.fetchall()]
+
+
+def plan_shape(plan):
+    """Returns the plan nodes without costs and timings."""
+    return [line.split('(cost=')[0].rstrip()
+            for line in plan if '(cost=' in line]
+
+
+if __name__ == '__main__':
+    n_players = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    populate(n_players, n_rounds, analyze=True)
+    standings = playerStandings()
+    params = {'tournament': DEFAULT_TOURNAMENT,
+              'player': standings[len(standings) // 2][0]}
+
+    with connect() as conn:
+        c = conn.cursor()
+        for description, query in QUERIES:
+            query = query % params
+            with_indexes = explain(c, query)
+
+            c.execute("SAVEPOINT no_indexes;")
+            for index in INDEXES:
+                c.execute("DROP INDEX %s;" % index)
+            without_indexes = explain(c, query)
+            c.execute("ROLLBACK TO SAVEPOINT no_indexes;")
+
+            changed = plan_shape(with_indexes) != plan_shape(without_indexes)
+            print "=" * 78
+            print "%s%s" % (description, " [PLAN CHANGED]" if changed else "")
+            print query
+            print "-- with indexes:"
+            print "\n".join(with_indexes)
+            print "-- without indexes:"
+            print "\n".join(without_indexes)
+
+    deleteMatches()
+    deletePlayers()
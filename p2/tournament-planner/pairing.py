@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+#
+# pairing.py -- pairing engine for the Swiss-system tournament
+#
+
+import logging
+
+from util.logger import logger
+from util.metrics import metrics
+
+# Pairing standings row of the bye, which pairs like one more player ranked
+# last; its id is None
+BYE = (None, None)
+
+# Points for a win (or a bye) and for a draw, as in the player_stats trigger
+WIN_POINTS = 3
+DRAW_POINTS = 1
+
+
+def opponents_map(matches):
+    """Returns a dict mapping each player id to the set of ids it has played.
+
+    A bye (a match with winner == loser) is entered as a match against the
+    bye's id, None, so opponents[None] holds the players who had a bye.
+
+    Args:
+      matches: an iterable of (winner, loser) tuples as returned by
+        getMatches().
+    """
+    opponents = {}
+    for winner, loser in matches:
+        if winner == loser:
+            loser = None
+        opponents.setdefault(winner, set()).add(loser)
+        opponents.setdefault(loser, set()).add(winner)
+    return opponents
+
+
+def score_buckets(standings):
+    """Groups standings rows by score (row[2]), keeping the standings order.
+
+    Returns a list of lists of rows, one per distinct score, in the order in
+    which each score first appears in the standings.
+    """
+    buckets = []
+    index = {}
+    for row in standings:
+        score = row[2]
+        if score not in index:
+            index[score] = len(buckets)
+            buckets.append([])
+        buckets[index[score]].append(row)
+    return buckets
+
+
+def tiebreak_standings(standings, matches):
+    """Adds the Buchholz and OMW tiebreakers to standings and sorts them.
+
+    Both tiebreakers rate the opponents a player has met: Buchholz is the sum
+    of their points, OMW (opponents' match-win rate) the average of their
+    points / (WIN_POINTS * matches), rounded to 4 decimals like the
+    tiebreak_standings() SQL function.  They are accumulated in a single pass
+    over the matches; byes count towards neither.
+
+    Args:
+      standings: (id, name, wins, matches, draws, points) tuples, in any
+        order.
+      matches: an iterable of (winner, loser) tuples, as returned by
+        getMatches().
+
+    Returns:
+      A list of (id, name, wins, matches, draws, points, buchholz, omw)
+      tuples sorted by points, buchholz and omw, highest first, then by id.
+    """
+    record = dict((row[0], (row[5], row[3])) for row in standings)
+    buchholz = dict.fromkeys(record, 0)
+    rates = dict.fromkeys(record, 0.0)
+    met = dict.fromkeys(record, 0)
+    for winner, loser in matches:
+        if winner == loser:
+            continue
+        met[winner] += 1
+        met[loser] += 1
+        w_points, w_played = record[winner]
+        l_points, l_played = record[loser]
+        buchholz[winner] += l_points
+        buchholz[loser] += w_points
+        rates[winner] += float(l_points) / (WIN_POINTS * l_played)
+        rates[loser] += float(w_points) / (WIN_POINTS * w_played)
+    rows = []
+    for row in standings:
+        pid = row[0]
+        omw = round(rates[pid] / met[pid], 4) if met[pid] else 0.0
+        rows.append(tuple(row[:6]) + (buchholz[pid], omw))
+    rows.sort(key=lambda row: (-row[5], -row[6], -row[7], row[0]))
+    return rows
+
+
+def pair_bucket(bucket, opponents, stats=None):
+    """Pairs the players of a single score bucket.
+
+    The first unpaired player is paired with the last unpaired player of the
+    bucket it has not played yet.  A player for whom no such opponent is left
+    stays unpaired.  Remaining players are kept in a doubly linked list, so
+    every step costs O(1) plus one step per previous opponent skipped.
+
+    A BYE row, if any, must come first, so that it is paired with the last
+    player of the bucket who has not had a bye; that pair is returned as
+    (id, name, None, None).
+
+    If `stats` is a dict, the number of skipped rematches is added to its
+    'skipped' entry; it is also added to the 'pairing.skipped' counter.
+    Each skip is logged at DEBUG level.
+
+    Returns a list of (id1, name1, id2, name2) tuples.
+    """
+    n = len(bucket)
+    # nxt/prv link the unpaired players in a circular list; index n is a
+    # sentinel, so nxt[n] is the first unpaired player and prv[n] the last.
+    nxt = list(range(1, n + 1)) + [0]
+    prv = [n] + list(range(0, n))
+
+    def unlink(i):
+        nxt[prv[i]] = nxt[i]
+        prv[nxt[i]] = prv[i]
+
+    pairs = []
+    skipped = 0
+    no_opponents = frozenset()
+    # checked once, so the loop does not even build the message arguments
+    # unless debug logging is on
+    debug = logger.isEnabledFor(logging.DEBUG)
+    while nxt[n] != n:
+        i = nxt[n]
+        unlink(i)
+        p1_id, p1_name = bucket[i][0], bucket[i][1]
+        played = opponents.get(p1_id, no_opponents)
+        # walk from the back of the bucket towards the front
+        j = prv[n]
+        while j != n:
+            p2_id = bucket[j][0]
+            if p2_id != p1_id and p2_id not in played:
+                if p1_id is None:
+                    pairs.append((p2_id, bucket[j][1], None, None))
+                else:
+                    pairs.append((p1_id, p1_name, p2_id, bucket[j][1]))
+                unlink(j)
+                break
+            if debug:
+                logger.debug('skipped: %s', (p1_id, p2_id))
+            skipped += 1
+            j = prv[j]
+    if skipped:
+        metrics.incr('pairing.skipped', skipped)
+    if stats is not None:
+        stats['skipped'] = stats.get('skipped', 0) + skipped
+    return pairs
+
+
+def pair_players(standings, matches, stats=None):
+    """Pairs players with the same score, avoiding rematches.
+
+    Produces the same pairings as the original list-scanning implementation
+    of swissPairings(), in O(players + matches) time plus one step for each
+    rematch that has to be skipped.  With an odd number of players the bye
+    is paired first in the lowest bucket, in the same pass.
+
+    Args:
+      standings: a list of (id, name, score, ...) tuples sorted by score,
+        such as (id, name, wins, matches) rows from playerStandings().
+      matches: an iterable of (winner, loser) tuples, as returned by
+        getMatches().
+      stats: an optional dict; the number of skipped rematches is added to
+        its 'skipped' entry.
+
+    Returns:
+      A list of (id1, name1, id2, name2) tuples.
+    """
+    opponents = opponents_map(matches)
+    buckets = score_buckets(standings)
+    if len(standings) % 2:
+        buckets[-1].insert(0, BYE)
+    pairs = []
+    for bucket in buckets:
+        pairs.extend(pair_bucket(bucket, opponents, stats))
+    return pairs
+
+
+def _augment(root, mate, nxt, allowed):
+    """Extends a matching by one pair with Edmonds' blossom algorithm.
+
+    Searches for an augmenting path from `root`, an unmatched player, among
+    the players linked in `nxt` (a circular list whose sentinel is its last
+    index), and flips the path in `mate` if there is one.
+
+    Args:
+      root: the index of an unmatched player.
+      mate: mate[k] is the index of the player k is matched with, or -1.
+      nxt: the circular list of the players taking part.
+      allowed: allowed(a, b) tells whether a and b may be paired.
+
+    Returns:
+      True if the matching was extended, False if no augmenting path exists.
+    """
+    n = len(mate)
+    sentinel = len(nxt) - 1
+    base = list(range(n))
+    parent = [-1] * n
+    used = [False] * n
+    used[root] = True
+    queue = [root]
+
+    def lca(a, b):
+        seen = set()
+        while True:
+            a = base[a]
+            seen.add(a)
+            if mate[a] == -1:
+                break
+            a = parent[mate[a]]
+        while True:
+            b = base[b]
+            if b in seen:
+                return b
+            b = parent[mate[b]]
+
+    def mark_path(v, b, child, blossom):
+        while base[v] != b:
+            blossom.add(base[v])
+            blossom.add(base[mate[v]])
+            parent[v] = child
+            child = mate[v]
+            v = parent[mate[v]]
+
+    head = 0
+    while head < len(queue):
+        v = queue[head]
+        head += 1
+        u = nxt[sentinel]
+        while u != sentinel:
+            if base[v] == base[u] or mate[v] == u or not allowed(v, u):
+                pass
+            elif u == root or (mate[u] != -1 and parent[mate[u]] != -1):
+                # an odd cycle: contract it into a blossom around cur
+                cur = lca(v, u)
+                blossom = set()
+                mark_path(v, cur, u, blossom)
+                mark_path(u, cur, v, blossom)
+                k = nxt[sentinel]
+                while k != sentinel:
+                    if base[k] in blossom:
+                        base[k] = cur
+                        if not used[k]:
+                            used[k] = True
+                            queue.append(k)
+                    k = nxt[k]
+            elif parent[u] == -1:
+                parent[u] = v
+                if mate[u] == -1:
+                    # flip the path from u back to root
+                    while u != -1:
+                        pv = parent[u]
+                        ppv = mate[pv]
+                        mate[u] = pv
+                        mate[pv] = u
+                        u = ppv
+                    return True
+                used[mate[u]] = True
+                queue.append(mate[u])
+            u = nxt[u]
+    return False
+
+
+def _count_backtracks(stats, backtracks):
+    if backtracks:
+        metrics.incr('pairing.backtracks', backtracks)
+    if stats is not None:
+        stats['backtracks'] = stats.get('backtracks', 0) + backtracks
+
+
+def pair_perfect(standings, matches, stats=None):
+    """Pairs every player without rematches, in score order.
+
+    Players are taken from the top of the standings down.  Each one is
+    paired with the nearest unpaired player below it (i.e. the smallest
+    difference in score) that it has not played yet, and after which the
+    players left can still all be paired.  So every player gets the closest
+    opponent possible given the pairings of the players above it, as a
+    backtracking search in that order would find, but without backtracking.
+
+    With an odd number of players a BYE row is added below the last player,
+    so the bye goes to the lowest-ranked player who has not had one, in the
+    same search.
+
+    First every player is paired with the nearest remaining player it has
+    not played.  With the usual Swiss setup of fewer rounds than half the
+    players this pairs everyone, and those pairs are returned.  Otherwise
+    Edmonds' blossom algorithm extends them to a pairing of every player, or
+    shows at once that none exists.  The players are then paired again from
+    the top down, and each opponent nearer than the one that pairing gives
+    is only taken if a single augmenting path re-pairs the rest of the round
+    without it; each opponent turned down counts as a backtrack.  This takes
+    polynomial time, O(players ** 4) at worst, even when no pairing exists.
+
+    Unpaired players are kept in a doubly linked list, so taking a player
+    out or putting it back is O(1).
+
+    Args:
+      standings: a list of (id, name, score, ...) tuples sorted by score,
+        such as (id, name, wins, matches) rows from playerStandings().
+      matches: an iterable of (winner, loser) tuples, as returned by
+        getMatches().
+      stats: an optional dict; the number of opponents turned down because
+        the rest of the round could not be paired after them is added to its
+        'backtracks' entry.  It is also added to the 'pairing.backtracks'
+        counter, and a failed search to 'pairing.failures'.
+
+    Returns:
+      A list of (id1, name1, id2, name2) tuples covering every player; the
+      bye, if any, is (id, name, None, None).
+
+    Raises:
+      ValueError: if no pairing without rematches or repeated byes exists.
+    """
+    if len(standings) % 2:
+        standings = list(standings) + [BYE]
+    n = len(standings)
+    opponents = opponents_map(matches)
+    no_opponents = frozenset()
+    ids = [row[0] for row in standings]
+    played = [opponents.get(pid, no_opponents) for pid in ids]
+
+    def allowed(a, b):
+        return a != b and ids[b] not in played[a]
+
+    # circular list of unpaired players with a sentinel at index n
+    nxt = list(range(1, n + 1)) + [0]
+    prv = [n] + list(range(0, n))
+
+    def unlink(k):
+        nxt[prv[k]] = nxt[k]
+        prv[nxt[k]] = prv[k]
+
+    def relink(k):
+        nxt[prv[k]] = k
+        prv[nxt[k]] = k
+
+    # pair each player with the nearest remaining player it has not played
+    mate = [-1] * n
+    pairs = []
+    while nxt[n] != n:
+        i = nxt[n]
+        unlink(i)
+        j = nxt[n]
+        while j != n and ids[j] in played[i]:
+            j = nxt[j]
+        if j != n:
+            unlink(j)
+            mate[i] = j
+            mate[j] = i
+            pairs.append((i, j))
+
+    backtracks = 0
+    if len(pairs) * 2 < n:
+        nxt = list(range(1, n + 1)) + [0]
+        prv = [n] + list(range(0, n))
+        for k in range(n):
+            if mate[k] == -1 and not _augment(k, mate, nxt, allowed):
+                _count_backtracks(stats, backtracks)
+                metrics.incr('pairing.failures')
+                raise ValueError("No pairing without rematches exists.")
+
+        # mate now pairs every player; take the nearest opponent of each
+        # player from the top down for which the rest can be re-paired
+        pairs = []
+        while nxt[n] != n:
+            i = nxt[n]
+            unlink(i)
+            j = nxt[n]
+            while j != mate[i]:
+                if ids[j] not in played[i]:
+                    a, b = mate[i], mate[j]
+                    unlink(j)
+                    mate[a] = mate[b] = -1
+                    if _augment(a, mate, nxt, allowed):
+                        mate[i], mate[j] = j, i
+                        break
+                    mate[a], mate[b] = i, j
+                    relink(j)
+                    backtracks += 1
+                j = nxt[j]
+            else:
+                unlink(j)
+            pairs.append((i, j))
+
+    _count_backtracks(stats, backtracks)
+    return [(standings[i][0], standings[i][1],
+             standings[j][0], standings[j][1]) for i, j in pairs]
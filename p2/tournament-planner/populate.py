@@ -5,9 +5,10 @@ import psycopg2
 import random
 import sys
 from tournament import connect, \
+                       createTournament, \
                        playerStandings, \
-                       registerPlayer, \
-                       reportMatch, \
+                       registerPlayers, \
+                       reportMatches, \
                        swissPairings
 from util.logger import logger
 
@@ -32,47 +33,593 @@ def create_db():
 
 def create_tables():
     """
-    Create players and matches tables.
+    Create tournaments, players, matches and player_stats tables.
+
+    The matches table is partitioned by tournament; each tournament's
+    partition is created by the t_tournament_added trigger.
     """
-    conn = connect()
-    c = conn.cursor()
+    with connect() as conn:
+        c = conn.cursor()
 
-    # Create players table
-    c.execute(
-        """
-        CREATE TABLE players (
-            name text NOT NULL,
-            id serial PRIMARY KEY
-        );
-        """)
-
-    # Create matches table
-    c.execute(
-        """
-        CREATE TABLE matches (
-            winner int REFERENCES players (id),
-            loser int REFERENCES players (id),
-            PRIMARY KEY (winner, loser)
-        );
-        """)
-    conn.commit()
-    conn.close()
+        # Create tournaments table
+        c.execute(
+            """
+            CREATE TABLE tournaments (
+                id serial PRIMARY KEY,
+                name text NOT NULL,
+                archived boolean NOT NULL DEFAULT false
+            );
+            """)
+
+        # Create players table
+        c.execute(
+            """
+            CREATE TABLE players (
+                name text NOT NULL,
+                id serial PRIMARY KEY,
+                tournament int NOT NULL REFERENCES tournaments (id),
+                UNIQUE (tournament, id)
+            );
+            """)
+
+        # Create matches table
+        c.execute(
+            """
+            CREATE TABLE matches (
+                tournament int NOT NULL,
+                winner int NOT NULL,
+                loser int NOT NULL,
+                draw boolean NOT NULL DEFAULT false,
+                PRIMARY KEY (tournament, winner, loser),
+                CHECK (NOT (draw AND winner = loser)),
+                FOREIGN KEY (tournament, winner)
+                    REFERENCES players (tournament, id),
+                FOREIGN KEY (tournament, loser)
+                    REFERENCES players (tournament, id)
+            ) PARTITION BY LIST (tournament);
+            """)
+
+        # Create player_stats table
+        c.execute(
+            """
+            CREATE TABLE player_stats (
+                id int PRIMARY KEY REFERENCES players (id) ON DELETE CASCADE,
+                tournament int NOT NULL,
+                wins int NOT NULL DEFAULT 0,
+                matches int NOT NULL DEFAULT 0,
+                draws int NOT NULL DEFAULT 0,
+                points int NOT NULL DEFAULT 0,
+                buchholz bigint NOT NULL DEFAULT 0,
+                omw float8 NOT NULL DEFAULT 0
+            );
+            """)
 
 def create_indices():
     """
     Create indices for tables.
     """
-    conn = connect()
-    c = conn.cursor()
+    with connect() as conn:
+        c = conn.cursor()
 
-    # To prevent rematch btw players
-    c.execute(
-        """
-        CREATE UNIQUE INDEX matches_uniq_idx ON matches
-           (greatest(winner, loser), least(winner, loser));
-        """)
-    conn.commit()
-    conn.close()
+        # To prevent rematch btw players of a tournament, and a second bye
+        c.execute(
+            """
+            CREATE UNIQUE INDEX matches_uniq_idx ON matches
+               (tournament, greatest(winner, loser), least(winner, loser));
+            """)
+
+        # To look up the matches a player lost; lookups by winner use the
+        # primary key
+        c.execute(
+            """
+            CREATE INDEX matches_loser_idx ON matches (tournament, loser);
+            """)
+
+        # The standings order of playerStandings() and swiss_pairings(),
+        # read straight from the index
+        c.execute(
+            """
+            CREATE INDEX player_stats_points_idx ON player_stats
+                (tournament, points DESC, buchholz DESC, omw DESC, id);
+            """)
+
+def create_triggers():
+    """
+    Create the triggers for the following:
+
+    t_tournament_added: creates the matches partition of every new tournament
+    t_player_added: adds an empty player_stats row for every new player
+    t_match_changed: applies every change to matches to both players' stats
+    t_tiebreaks_*: recompute the tiebreakers of the players whose matches or
+        opponents' points changed, once per statement
+    t_standings_changed: notifies the standings_changed channel
+    """
+    with connect() as conn:
+        c = conn.cursor()
+
+        # Create t_tournament_added trigger
+        c.execute(
+            """
+            CREATE FUNCTION f_tournament_added() RETURNS trigger AS $$
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF matches FOR VALUES IN (%s)',
+                    'matches_' || NEW.id, NEW.id);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER t_tournament_added AFTER INSERT ON tournaments
+                FOR EACH ROW EXECUTE PROCEDURE f_tournament_added();
+            """)
+
+        # Create t_player_added trigger
+        c.execute(
+            """
+            CREATE FUNCTION f_player_added() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO player_stats (id, tournament)
+                    VALUES (NEW.id, NEW.tournament);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER t_player_added AFTER INSERT ON players
+                FOR EACH ROW EXECUTE PROCEDURE f_player_added();
+            """)
+
+        # Create t_match_changed trigger (a no-op while tournament.bulk_load
+        # is on)
+        c.execute(
+            """
+            CREATE FUNCTION f_match_changed() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('tournament.bulk_load', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    IF OLD.draw THEN
+                        UPDATE player_stats SET draws = draws - 1, matches = matches - 1,
+                                                points = points - 1
+                            WHERE id IN (OLD.winner, OLD.loser);
+                    ELSE
+                        UPDATE player_stats SET wins = wins - 1, matches = matches - 1,
+                                                points = points - 3
+                            WHERE id = OLD.winner;
+                        UPDATE player_stats SET matches = matches - 1
+                            WHERE id = OLD.loser AND OLD.loser <> OLD.winner;
+                    END IF;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    IF NEW.draw THEN
+                        UPDATE player_stats SET draws = draws + 1, matches = matches + 1,
+                                                points = points + 1
+                            WHERE id IN (NEW.winner, NEW.loser);
+                    ELSE
+                        UPDATE player_stats SET wins = wins + 1, matches = matches + 1,
+                                                points = points + 3
+                            WHERE id = NEW.winner;
+                        UPDATE player_stats SET matches = matches + 1
+                            WHERE id = NEW.loser AND NEW.loser <> NEW.winner;
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER t_match_changed
+                AFTER INSERT OR UPDATE OR DELETE ON matches
+                FOR EACH ROW EXECUTE PROCEDURE f_match_changed();
+            """)
+
+        # Create the t_tiebreaks_* triggers; a trigger may only have
+        # transition tables for a single event
+        c.execute(
+            """
+            CREATE FUNCTION f_tiebreaks_changed() RETURNS trigger AS $$
+            DECLARE
+                tid int;
+                ids int[];
+            BEGIN
+                IF current_setting('tournament.bulk_load', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                FOR tid IN SELECT DISTINCT tournament FROM changed LOOP
+                    SELECT array_agg(DISTINCT p.id) INTO ids
+                        FROM (SELECT winner AS id FROM changed
+                              WHERE tournament = tid
+                              UNION ALL
+                              SELECT loser FROM changed
+                              WHERE tournament = tid) AS p;
+                    SELECT array_agg(DISTINCT o.id) INTO ids
+                        FROM (SELECT p.id FROM unnest(ids) AS p (id)
+                              UNION ALL
+                              SELECT m.loser FROM unnest(ids) AS p (id)
+                              JOIN matches AS m
+                                  ON m.tournament = tid AND m.winner = p.id
+                              UNION ALL
+                              SELECT m.winner FROM unnest(ids) AS p (id)
+                              JOIN matches AS m
+                                  ON m.tournament = tid AND m.loser = p.id) AS o;
+                    PERFORM refresh_tiebreaks(tid, ids);
+                END LOOP;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER t_tiebreaks_inserted AFTER INSERT ON matches
+                REFERENCING NEW TABLE AS changed
+                FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+            CREATE TRIGGER t_tiebreaks_deleted AFTER DELETE ON matches
+                REFERENCING OLD TABLE AS changed
+                FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+            CREATE TRIGGER t_tiebreaks_updated_old AFTER UPDATE ON matches
+                REFERENCING OLD TABLE AS changed
+                FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+            CREATE TRIGGER t_tiebreaks_updated_new AFTER UPDATE ON matches
+                REFERENCING NEW TABLE AS changed
+                FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+            """)
+
+        # Create t_standings_changed trigger
+        c.execute(
+            """
+            CREATE FUNCTION f_standings_changed() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('standings_changed', OLD.tournament::text);
+                ELSE
+                    PERFORM pg_notify('standings_changed', NEW.tournament::text);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER t_standings_changed
+                AFTER INSERT OR UPDATE OR DELETE ON player_stats
+                FOR EACH ROW EXECUTE PROCEDURE f_standings_changed();
+            """)
+
+def create_functions():
+    """
+    Create the functions for the following:
+
+    tiebreak_standings(tournament): standings with Buchholz and OMW
+    refresh_tiebreaks(tournament, ids): stores the tiebreakers of players
+    augment_pairing(root, mate, ...): extends a pairing by one pair
+    swiss_pairings(tournament): pairs the next round inside the database
+    """
+    with connect() as conn:
+        c = conn.cursor()
+
+        # Create tiebreak_standings function
+        c.execute(
+            """
+            CREATE FUNCTION tiebreak_standings(tid int)
+                RETURNS TABLE (id int, name text, wins int, matches int, draws int,
+                               points int, buchholz bigint, omw float8) AS $$
+                SELECT p.id, p.name, s.wins, s.matches, s.draws, s.points,
+                       coalesce(sum(o.points), 0) AS buchholz,
+                       coalesce(round(avg(o.points::numeric / (3 * o.matches)), 4),
+                                0)::float8 AS omw
+                FROM player_stats AS s
+                JOIN players AS p ON p.id = s.id
+                LEFT JOIN (SELECT winner AS player, loser AS opponent
+                           FROM matches WHERE tournament = tid AND winner <> loser
+                           UNION ALL
+                           SELECT loser, winner
+                           FROM matches WHERE tournament = tid AND winner <> loser) AS m
+                    ON m.player = s.id
+                LEFT JOIN player_stats AS o ON o.id = m.opponent
+                WHERE s.tournament = tid
+                GROUP BY s.id, p.id
+                ORDER BY s.points DESC, buchholz DESC, omw DESC, s.id;
+            $$ LANGUAGE sql STABLE;
+            """)
+
+        # Create refresh_tiebreaks function
+        c.execute(
+            """
+            CREATE FUNCTION refresh_tiebreaks(tid int, ids int[])
+                RETURNS void AS $$
+                UPDATE player_stats AS s
+                SET buchholz = t.buchholz, omw = t.omw
+                FROM (SELECT p.id, coalesce(sum(o.points), 0) AS buchholz,
+                             coalesce(round(avg(o.points::numeric / (3 * o.matches)), 4),
+                                      0)::float8 AS omw
+                      FROM unnest(ids) AS p (id)
+                      LEFT JOIN (SELECT q.id AS player, m.loser AS opponent
+                                 FROM unnest(ids) AS q (id)
+                                 JOIN matches AS m
+                                     ON m.tournament = tid AND m.winner = q.id
+                                 WHERE m.loser <> m.winner
+                                 UNION ALL
+                                 SELECT q.id, m.winner
+                                 FROM unnest(ids) AS q (id)
+                                 JOIN matches AS m
+                                     ON m.tournament = tid AND m.loser = q.id
+                                 WHERE m.loser <> m.winner) AS m
+                          ON m.player = p.id
+                      LEFT JOIN player_stats AS o ON o.id = m.opponent
+                      GROUP BY p.id) AS t
+                WHERE s.id = t.id
+                  AND (s.buchholz, s.omw) IS DISTINCT FROM (t.buchholz, t.omw);
+            $$ LANGUAGE sql;
+            """)
+
+        # Create augment_pairing function
+        c.execute(
+            """
+            CREATE FUNCTION augment_pairing(root int, mate int[], active boolean[],
+                                            opp_start int[], opp int[])
+                RETURNS int[] AS $$
+            DECLARE
+                n int := array_length(mate, 1);
+                base int[];
+                parent int[];
+                used boolean[];
+                seen boolean[];
+                blossom boolean[];
+                queue int[];
+                head int := 1;
+                tail int := 1;
+                v int;
+                a int;
+                b int;
+                cur int;
+                x int;
+                child int;
+                pv int;
+            BEGIN
+                base := ARRAY(SELECT generate_series(1, n));
+                parent := array_fill(0, ARRAY[n]);
+                used := array_fill(false, ARRAY[n]);
+                used[root] := true;
+                queue := ARRAY[root];
+                WHILE head <= tail LOOP
+                    v := queue[head];
+                    head := head + 1;
+                    FOR u IN 1..n LOOP
+                        CONTINUE WHEN NOT active[u] OR base[v] = base[u] OR mate[v] = u
+                            OR u = ANY (opp[opp_start[v]:opp_start[v + 1] - 1]);
+                        IF u = root OR (mate[u] <> 0 AND parent[mate[u]] <> 0) THEN
+                            -- an odd cycle: contract it into a blossom around cur
+                            seen := array_fill(false, ARRAY[n]);
+                            a := v;
+                            LOOP
+                                a := base[a];
+                                seen[a] := true;
+                                EXIT WHEN mate[a] = 0;
+                                a := parent[mate[a]];
+                            END LOOP;
+                            b := base[u];
+                            WHILE NOT seen[b] LOOP
+                                b := base[parent[mate[b]]];
+                            END LOOP;
+                            cur := b;
+                            blossom := array_fill(false, ARRAY[n]);
+                            FOR side IN 1..2 LOOP
+                                IF side = 1 THEN
+                                    x := v;
+                                    child := u;
+                                ELSE
+                                    x := u;
+                                    child := v;
+                                END IF;
+                                WHILE base[x] <> cur LOOP
+                                    blossom[base[x]] := true;
+                                    blossom[base[mate[x]]] := true;
+                                    parent[x] := child;
+                                    child := mate[x];
+                                    x := parent[mate[x]];
+                                END LOOP;
+                            END LOOP;
+                            FOR k IN 1..n LOOP
+                                IF active[k] AND blossom[base[k]] THEN
+                                    base[k] := cur;
+                                    IF NOT used[k] THEN
+                                        used[k] := true;
+                                        tail := tail + 1;
+                                        queue[tail] := k;
+                                    END IF;
+                                END IF;
+                            END LOOP;
+                        ELSIF parent[u] = 0 THEN
+                            parent[u] := v;
+                            IF mate[u] = 0 THEN
+                                -- flip the path from u back to root
+                                x := u;
+                                WHILE x <> 0 LOOP
+                                    pv := parent[x];
+                                    a := mate[pv];
+                                    mate[x] := pv;
+                                    mate[pv] := x;
+                                    x := a;
+                                END LOOP;
+                                RETURN mate;
+                            END IF;
+                            used[mate[u]] := true;
+                            tail := tail + 1;
+                            queue[tail] := mate[u];
+                        END IF;
+                    END LOOP;
+                END LOOP;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql IMMUTABLE;
+            """)
+
+        # Create swiss_pairings function
+        c.execute(
+            """
+            CREATE FUNCTION swiss_pairings(tid int)
+                RETURNS TABLE (id1 int, name1 text, id2 int, name2 text) AS $$
+            DECLARE
+                ids int[];
+                names text[];
+                n int;
+                bye int;
+                -- player k has played opp[opp_start[k]:opp_start[k + 1] - 1]
+                opp_player int[];
+                opp int[];
+                opp_start int[];
+                mate int[];
+                active boolean[];
+                augmented int[];
+                -- circular list of unpaired players 1..n with a sentinel at 0
+                nxt int[];
+                prv int[];
+                -- pairs made so far; pair_i holds the higher-ranked player
+                pair_i int[] := '{}';
+                pair_j int[] := '{}';
+                top int := 0;
+                i int;
+                j int;
+                a int;
+                b int;
+            BEGIN
+                SELECT array_agg(s.id ORDER BY s.points DESC, s.buchholz DESC,
+                                              s.omw DESC, s.id),
+                       array_agg(p.name ORDER BY s.points DESC, s.buchholz DESC,
+                                                 s.omw DESC, s.id)
+                    INTO ids, names
+                    FROM player_stats AS s JOIN players AS p ON p.id = s.id
+                    WHERE s.tournament = tid;
+                n := coalesce(array_length(ids, 1), 0);
+                -- with an odd number of players the bye pairs like one more player
+                -- ranked last, whose opponents are the players who had a bye
+                IF n % 2 = 1 THEN
+                    ids := ids || NULL::int;
+                    names := names || NULL::text;
+                    n := n + 1;
+                    bye := n;
+                END IF;
+                IF n = 0 THEN
+                    RETURN;
+                END IF;
+
+                SELECT coalesce(array_agg(e.a ORDER BY e.a, e.b), '{}'),
+                       coalesce(array_agg(e.b ORDER BY e.a, e.b), '{}')
+                    INTO opp_player, opp
+                    FROM (SELECT w.k::int AS a,
+                                 CASE WHEN m.winner = m.loser THEN bye
+                                      ELSE l.k::int END AS b
+                          FROM matches AS m
+                          JOIN unnest(ids) WITH ORDINALITY AS w (id, k)
+                              ON w.id = m.winner
+                          JOIN unnest(ids) WITH ORDINALITY AS l (id, k)
+                              ON l.id = m.loser
+                          WHERE m.tournament = tid
+                          UNION ALL
+                          SELECT CASE WHEN m.winner = m.loser THEN bye
+                                      ELSE l.k::int END,
+                                 w.k::int
+                          FROM matches AS m
+                          JOIN unnest(ids) WITH ORDINALITY AS w (id, k)
+                              ON w.id = m.winner
+                          JOIN unnest(ids) WITH ORDINALITY AS l (id, k)
+                              ON l.id = m.loser
+                          WHERE m.tournament = tid) AS e
+                    WHERE e.a IS NOT NULL AND e.b IS NOT NULL;
+                opp_start := array_fill(0, ARRAY[n + 1]);
+                opp_start[1] := 1;
+                FOREACH a IN ARRAY opp_player LOOP
+                    opp_start[a + 1] := opp_start[a + 1] + 1;
+                END LOOP;
+                FOR k IN 2..n + 1 LOOP
+                    opp_start[k] := opp_start[k] + opp_start[k - 1];
+                END LOOP;
+
+                nxt := array_fill(0, ARRAY[n + 1], ARRAY[0]);
+                prv := array_fill(0, ARRAY[n + 1], ARRAY[0]);
+                FOR k IN 0..n LOOP
+                    nxt[k] := (k + 1) % (n + 1);
+                    prv[k] := (k + n) % (n + 1);
+                END LOOP;
+
+                -- pair each player with the nearest remaining player it has not played
+                mate := array_fill(0, ARRAY[n]);
+                WHILE nxt[0] <> 0 LOOP
+                    i := nxt[0];
+                    nxt[prv[i]] := nxt[i];
+                    prv[nxt[i]] := prv[i];
+                    j := nxt[0];
+                    WHILE j <> 0 AND j = ANY (opp[opp_start[i]:opp_start[i + 1] - 1]) LOOP
+                        j := nxt[j];
+                    END LOOP;
+                    IF j <> 0 THEN
+                        nxt[prv[j]] := nxt[j];
+                        prv[nxt[j]] := prv[j];
+                        mate[i] := j;
+                        mate[j] := i;
+                        top := top + 1;
+                        pair_i[top] := i;
+                        pair_j[top] := j;
+                    END IF;
+                END LOOP;
+
+                IF 2 * top < n THEN
+                    FOR k IN 0..n LOOP
+                        nxt[k] := (k + 1) % (n + 1);
+                        prv[k] := (k + n) % (n + 1);
+                    END LOOP;
+                    active := array_fill(true, ARRAY[n]);
+                    FOR k IN 1..n LOOP
+                        CONTINUE WHEN mate[k] <> 0;
+                        augmented := augment_pairing(k, mate, active, opp_start, opp);
+                        IF augmented IS NULL THEN
+                            RAISE EXCEPTION 'No pairing without rematches exists.';
+                        END IF;
+                        mate := augmented;
+                    END LOOP;
+
+                    -- mate now pairs every player; take the nearest opponent of each
+                    -- player from the top down for which the rest can be re-paired
+                    top := 0;
+                    WHILE nxt[0] <> 0 LOOP
+                        i := nxt[0];
+                        nxt[prv[i]] := nxt[i];
+                        prv[nxt[i]] := prv[i];
+                        active[i] := false;
+                        j := nxt[0];
+                        WHILE j <> mate[i] LOOP
+                            IF NOT j = ANY (opp[opp_start[i]:opp_start[i + 1] - 1]) THEN
+                                a := mate[i];
+                                b := mate[j];
+                                active[j] := false;
+                                mate[a] := 0;
+                                mate[b] := 0;
+                                augmented := augment_pairing(a, mate, active, opp_start,
+                                                             opp);
+                                IF augmented IS NOT NULL THEN
+                                    mate := augmented;
+                                    mate[i] := j;
+                                    mate[j] := i;
+                                    EXIT;
+                                END IF;
+                                active[j] := true;
+                                mate[a] := i;
+                                mate[b] := j;
+                            END IF;
+                            j := nxt[j];
+                        END LOOP;
+                        nxt[prv[j]] := nxt[j];
+                        prv[nxt[j]] := prv[j];
+                        active[j] := false;
+                        top := top + 1;
+                        pair_i[top] := i;
+                        pair_j[top] := j;
+                    END LOOP;
+                END IF;
+
+                RETURN QUERY
+                    SELECT ids[pair_i[k]], names[pair_i[k]],
+                           ids[pair_j[k]], names[pair_j[k]]
+                    FROM generate_series(1, top) AS k
+                    ORDER BY k;
+            END;
+            $$ LANGUAGE plpgsql;
+            """)
 
 def create_views():
     """
@@ -80,48 +627,65 @@ def create_views():
 
     v_numMatches: The number of matches each player has played
     v_numWins: The number of wins for each player
+    v_numDraws: The number of draws for each player
     v_playerStandings
     """
-    conn = connect()
-    c = conn.cursor()
+    with connect() as conn:
+        c = conn.cursor()
+
+        # Create v_numMatches view
+        c.execute(
+            """
+            CREATE VIEW v_numMatches AS
+                SELECT players.tournament, players.id,
+                       COUNT(winner) AS matchesPlayed
+                FROM players LEFT JOIN matches
+                ON (matches.tournament = players.tournament AND
+                    (winner = players.id OR loser = players.id))
+                GROUP BY players.tournament, players.id
+                ORDER BY players.id;
+            """)
+
+        # Create v_numWins view
+        c.execute(
+            """
+            CREATE VIEW v_numWins AS
+                SELECT players.tournament, players.id, COUNT(winner) AS wins
+                FROM players LEFT JOIN matches
+                ON (matches.tournament = players.tournament AND
+                    players.id = matches.winner AND NOT matches.draw)
+                GROUP BY players.tournament, players.id
+                ORDER BY wins DESC;
+            """)
+
+        # Create v_numDraws view
+        c.execute(
+            """
+            CREATE VIEW v_numDraws AS
+                SELECT players.tournament, players.id, COUNT(winner) AS draws
+                FROM players LEFT JOIN matches
+                ON (matches.tournament = players.tournament AND matches.draw AND
+                    (winner = players.id OR loser = players.id))
+                GROUP BY players.tournament, players.id
+                ORDER BY draws DESC;
+            """)
+
+        # Create v_playerStandings view
+        c.execute(
+            """
+            CREATE VIEW v_playerStandings AS
+                SELECT players.id, players.name, v_numWins.wins,
+                       v_numMatches.matchesPlayed AS matches,
+                       players.tournament, v_numDraws.draws,
+                       3 * v_numWins.wins + v_numDraws.draws AS points
+                FROM players
+                LEFT JOIN v_numWins ON
+                (players.id = v_numWins.id)
+                JOIN v_numMatches ON (players.id = v_numMatches.id)
+                JOIN v_numDraws ON (players.id = v_numDraws.id)
+                ORDER BY points DESC;
+            """)
 
-    # Create v_numMatches view
-    c.execute(
-        """
-        CREATE VIEW v_numMatches AS
-            SELECT id, COUNT(winner) AS matchesPlayed
-            FROM players LEFT JOIN matches
-            ON (winner = id OR loser = id)
-            GROUP BY players.id
-            ORDER BY players.id;
-        """)
-
-    # Create v_numWins view
-    c.execute(
-        """
-        CREATE VIEW v_numWins AS
-            SELECT players.id, COUNT(winner) AS wins
-            FROM players LEFT JOIN matches
-            ON players.id = matches.winner
-            GROUP BY players.id
-            ORDER BY wins DESC;
-        """)
-
-    # Create v_playerStandings view
-    c.execute(
-        """
-        CREATE VIEW v_playerStandings AS
-            SELECT players.id, players.name, v_numWins.wins,
-                   v_numMatches.matchesPlayed AS matches
-            FROM players
-            LEFT JOIN v_numWins ON
-            (players.id = v_numWins.id)
-            JOIN v_numMatches ON (players.id = v_numMatches.id)
-            ORDER BY wins DESC;
-        """)
-
-    conn.commit()
-    conn.close()
 
 
 if __name__ == '__main__':
@@ -137,9 +701,17 @@ if __name__ == '__main__':
     logger.info('Created tables')
     create_indices()
     logger.info('Created indices')
+    create_triggers()
+    logger.info('Created triggers')
+    create_functions()
+    logger.info('Created functions')
     create_views()
     logger.info('Created views')
 
+    # create the default tournament (id 1), used when no tournament is given
+    createTournament('Default')
+    logger.info('Created default tournament')
+
     # Register players
     PLAYERS = ['Player 1', 'Player 2', 'Player 3', 'Player 4', 'Player 5', 'Player 6', 'Player 7', 'Player 8', 'Player 9', 'Player 10', 'Player 11', 'Player 12', 'Player 13', 'Player 14', 'Player 15', 'Player 16', 'Player 17', 'Player 18', 'Player 19', 'Player 20', 'Player 21', 'Player 22', 'Player 23', 'Player 24', 'Player 25', 'Player 26', 'Player 27', 'Player 28', 'Player 29', 'Player 30', 'Player 31', 'Player 32', 'Player 33', 'Player 34', 'Player 35', 'Player 36', 'Player 37', 'Player 38', 'Player 39', 'Player 40', 'Player 41', 'Player 42', 'Player 43', 'Player 44', 'Player 45', 'Player 46', 'Player 47', 'Player 48', 'Player 49', 'Player 50', 'Player 51', 'Player 52', 'Player 53', 'Player 54', 'Player 55', 'Player 56', 'Player 57', 'Player 58', 'Player 59', 'Player 60', 'Player 61', 'Player 62', 'Player 63', 'Player 64',]
 
@@ -147,38 +719,25 @@ if __name__ == '__main__':
     random.shuffle(PLAYERS)
 
     # Register all players
-    for player in PLAYERS:
-        registerPlayer(player)
+    registerPlayers(PLAYERS)
 
     logger.info('Registered all players')
     game_rounds = int(math.log(len(PLAYERS), 2))
 
-    # Allow the app to try 5 times before gracefully quiting with an error
-    # message.
-    tries = 1
+    # Every round is paired in a single pass: perfect pairings include every
+    # player and never produce a rematch, so no round has to be retried.
     for game_round in xrange(game_rounds):
         logger.info('%s Round: %s %s', '=' * 10, game_round, '=' * 10)
         try:
-            logger.info("\t'populate.py' Try: %s", tries)
-            sp = swissPairings()
-            for pair in sp:
-                winner_id = pair[0]
-                loser_id = pair[2]
-                reportMatch(winner_id, loser_id)
-        except psycopg2.IntegrityError as e:
+            sp = swissPairings(perfect=True)
+        except ValueError as e:
             logger.error(e)
-            tries += 1
-
-        if tries > 5:
-            msg = """
-            The app exceeded number of allowed tries (5). Please try again
-            later.
-            """
-            logger.info(msg)
-            print msg
+            print e
             sys.exit(1)
+        # the first player of each pair is recorded as the winner
+        reportMatches(sp)
 
-    msg = "All players matched successfully in %s attempts!" % tries
+    msg = "All players matched successfully in %s rounds!" % game_rounds
     logger.info(msg)
     print msg
     sys.exit(0)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+#
+# simulate.py -- Monte Carlo simulation of Swiss tournaments
+#
+# Plays many simulated tournaments against the in-memory backend, one trial
+# per task on a process pool, and prints aggregate statistics: how often a
+# round could not be fully paired, how many rematches the pairing had to
+# avoid, how long a round takes and how the final standings are spread.
+#
+# Usage: python simulate.py --players 64 --rounds 6 --trials 1000 --seed 1
+#        python simulate.py --help
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import time
+
+from backends.memory import MemoryBackend
+from tournament import playerStandings, \
+                       registerPlayers, \
+                       reportMatches, \
+                       setBackend, \
+                       swissPairings
+from util.logger import QueueHandler, QueueListener, listener, logger
+
+# Spread of the hidden player ratings used to decide who wins a match
+RATING_MEAN = 1500
+RATING_SD = 200
+
+
+def init_worker(log_queue):
+    """Sends the worker's log records to the parent process.
+
+    The thread writing the log (see util.logger) does not run in forked
+    worker processes, so they put their records on log_queue instead, for
+    the listener the parent runs while the pool is up.
+    """
+    logger.handlers = [QueueHandler(log_queue)]
+
+
+def win_probability(rating1, rating2):
+    """Elo expected score of a player rated rating1 against rating2."""
+    return 1.0 / (1 + 10 ** ((rating2 - rating1) / 400.0))
+
+
+def run_trial(args):
+    """Plays one tournament and returns its statistics as a dict."""
+    trial, n_players, n_rounds, seed, perfect = args
+    rng = random.Random('%s-%s' % (seed, trial))
+    setBackend(MemoryBackend())
+
+    registerPlayers('Player %s' % i for i in xrange(n_players))
+    ratings = dict((row[0], rng.gauss(RATING_MEAN, RATING_SD))
+                   for row in playerStandings())
+
+    failures = 0
+    retries = 0
+    round_times = []
+    for _ in xrange(n_rounds):
+        stats = {}
+        start = time.time()
+        try:
+            pairs = swissPairings(perfect=perfect, stats=stats)
+        except ValueError:
+            pairs = None
+        if pairs is None or len(pairs) * 2 < n_players:
+            failures += 1
+        results = []
+        for id1, _, id2, _ in pairs or []:
+            if id2 is None:
+                results.append((id1, None))
+            elif rng.random() < win_probability(ratings[id1], ratings[id2]):
+                results.append((id1, id2))
+            else:
+                results.append((id2, id1))
+        reportMatches(results)
+        round_times.append(time.time() - start)
+        retries += stats.get('backtracks' if perfect else 'skipped', 0)
+
+    wins = [row[2] for row in playerStandings()]
+    return {'failures': failures,
+            'retries': retries,
+            'round_times': round_times,
+            'wins': wins}
+
+
+def percentile(values, q):
+    """Returns the q-th percentile (0-100) of a sorted list of values."""
+    if not values:
+        return 0.0
+    k = int(math.ceil(q / 100.0 * len(values))) - 1
+    return values[max(0, min(k, len(values) - 1))]
+
+
+def summarize(results, n_players, n_rounds):
+    """Aggregates the per-trial statistics."""
+    n_trials = len(results)
+    total_rounds = n_trials * n_rounds
+    round_times = sorted(t for r in results for t in r['round_times'])
+    # average number of players finishing on each number of wins
+    distribution = {}
+    for r in results:
+        for w in r['wins']:
+            distribution[w] = distribution.get(w, 0) + 1
+    return {
+        'players': n_players,
+        'rounds': n_rounds,
+        'trials': n_trials,
+        'failed_rounds': sum(r['failures'] for r in results),
+        'failure_rate': (float(sum(r['failures'] for r in results)) /
+                         total_rounds if total_rounds else 0.0),
+        'retries_per_round': (float(sum(r['retries'] for r in results)) /
+                              total_rounds if total_rounds else 0.0),
+        'round_time_mean': (sum(round_times) / len(round_times)
+                            if round_times else 0.0),
+        'round_time_p50': percentile(round_times, 50),
+        'round_time_p99': percentile(round_times, 99),
+        'wins_distribution': dict(
+            (w, float(count) / n_trials)
+            for w, count in sorted(distribution.items())),
+    }
+
+
+def print_summary(summary, perfect):
+    print "%(trials)d trials of %(players)d players, %(rounds)d rounds" % \
+        summary
+    print "pairing mode:        %s" % ('perfect' if perfect else 'greedy')
+    print "failed rounds:       %d (%.2f%%)" % (
+        summary['failed_rounds'], 100 * summary['failure_rate'])
+    print "%-20s %.2f" % ('backtracks/round:' if perfect else
+                          'rematch skips/round:',
+                          summary['retries_per_round'])
+    print "time per round:      mean %.2f ms, p50 %.2f ms, p99 %.2f ms" % (
+        1000 * summary['round_time_mean'], 1000 * summary['round_time_p50'],
+        1000 * summary['round_time_p99'])
+    print "final standings (average players per number of wins):"
+    for w, players in sorted(summary['wins_distribution'].items()):
+        print "  %3d wins: %10.2f" % (w, players)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Simulate Swiss tournaments in memory.")
+    parser.add_argument('--players', type=int, default=64,
+                        help="players per tournament (default: 64)")
+    parser.add_argument('--rounds', type=int, default=None,
+                        help="rounds per tournament (default: log2(players))")
+    parser.add_argument('--trials', type=int, default=100,
+                        help="number of tournaments to simulate "
+                             "(default: 100)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed; equal seeds give equal results")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--perfect', action='store_true',
+                        help="use perfect pairings (swissPairings(perfect))")
+    parser.add_argument('--json', action='store_true',
+                        help="print the statistics as JSON")
+    args = parser.parse_args()
+
+    n_rounds = args.rounds
+    if n_rounds is None:
+        n_rounds = int(math.log(max(args.players, 2), 2))
+
+    tasks = [(trial, args.players, n_rounds, args.seed, args.perfect)
+             for trial in xrange(args.trials)]
+    # write the workers' log records to the handlers of this process
+    log_queue = multiprocessing.Queue(-1)
+    pool_listener = QueueListener(log_queue, *listener.handlers,
+                                  respect_handler_level=True)
+    pool_listener.start()
+    pool = multiprocessing.Pool(args.processes, init_worker, (log_queue,))
+    try:
+        results = pool.map(run_trial, tasks, chunksize=max(
+            1, len(tasks) // (4 * (args.processes or
+                                   multiprocessing.cpu_count()))))
+    finally:
+        pool.close()
+        pool.join()
+        pool_listener.stop()
+
+    summary = summarize(results, args.players, n_rounds)
+    if args.json:
+        print json.dumps(summary, indent=2, sort_keys=True)
+    else:
+        print_summary(summary, args.perfect)
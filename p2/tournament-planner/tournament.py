@@ -3,46 +3,223 @@
 # tournament.py -- implementation of a Swiss-system tournament
 #
 
-import psycopg2
-from util.logger import logger
+import atexit
+
+from backends.postgres import PostgresBackend
+from pairing import pair_perfect, pair_players
+from util.cache import NotifyListener, StandingsCache
+from util.metrics import metrics
+from util.pool import ConnectionPool
+from util.profiling import QueryProfiler
+from util.snapshot import read_snapshot, write_snapshot
+
+# Connection string for the tournament database
+DSN = "dbname=tournament"
+
+# Shared pool behind connect(); see configurePool() to resize it.
+pool = ConnectionPool(DSN, minconn=1, maxconn=10)
+
+# Profiler of the database calls, once enableQueryProfiling() is called
+_query_profiler = None
+
+# Id of the tournament created with the database; every function acts on it
+# unless it is given another tournament id.
+DEFAULT_TOURNAMENT = 1
+
+# Cache of tiebreakStandings() results.  The write functions below invalidate
+# it; writes by other processes are picked up through startStandingsListener()
+# or, at the latest, after the TTL (in seconds).
+STANDINGS_TTL = 30.0
+standings_cache = StandingsCache(ttl=STANDINGS_TTL)
+_standings_listener = None
+
+
+def configurePool(minconn=1, maxconn=10):
+    """Replace the connection pool with one of the given size.
+
+    Connections held by the previous pool are closed.
+
+    Args:
+      minconn: number of connections opened when the pool is first used.
+        More are opened as needed, up to maxconn, and kept open once
+        returned.
+      maxconn: most connections checked out at once; further checkouts wait.
+    """
+    global pool
+    old = pool
+    pool = ConnectionPool(DSN, minconn=minconn, maxconn=maxconn,
+                          profiler=old.profiler)
+    old.closeall()
 
 
 def connect():
-    """Connect to the PostgreSQL database.  Returns a database connection."""
-    return psycopg2.connect("dbname=tournament")
+    """Check out a pooled connection to the PostgreSQL database.
+
+    Use the result as a context manager.  The transaction is committed when
+    the block exits (rolled back if it raises) and the connection is returned
+    to the pool:
+
+        with connect() as conn:
+            c = conn.cursor()
+            ...
+    """
+    return pool.connection()
+
+
+def enableQueryProfiling(threshold=0.1, summary=True):
+    """Time the database calls of every operation from now on.
+
+    Profiling is off by default, and costs nothing while it is off.  Once on,
+    the time each operation (each method of backends.postgres, e.g.
+    'player_standings') spends connecting, executing, fetching and
+    committing is recorded, and statements running longer than `threshold`
+    are logged with their EXPLAIN plan.  Calling it again keeps the times
+    recorded so far and only changes the threshold.
+
+    Args:
+      threshold: seconds after which a statement is logged as slow.
+      summary: if true, a table of the recorded times is printed to stderr
+        when the process exits.
+
+    Returns:
+      The util.profiling.QueryProfiler; its summary() returns the table.
+    """
+    global _query_profiler
+    if _query_profiler is None:
+        _query_profiler = QueryProfiler(threshold)
+        if summary:
+            atexit.register(_query_profiler.dump)
+    _query_profiler.threshold = threshold
+    pool.profiler = _query_profiler
+    return _query_profiler
+
+
+def disableQueryProfiling():
+    """Stop timing database calls.
+
+    Connections checked out afterwards are no longer wrapped.  A summary
+    requested by enableQueryProfiling() is still printed at exit.
+    """
+    pool.profiler = None
+
+
+# Storage behind every function below; see setBackend() to replace it.
+backend = PostgresBackend(connect)
+
+
+def setBackend(new_backend):
+    """Replace the storage behind the tournament functions.
+
+    Every function of this module reads and writes through the backend, so
+    the same code runs against the PostgreSQL database (the default) or e.g.
+    an in-memory backends.memory.MemoryBackend for simulations and tests.
+
+    Args:
+      new_backend: a backends.base.Backend instance.
+    """
+    global backend
+    backend = new_backend
+    standings_cache.invalidate()
+
+
+def startStandingsListener():
+    """Invalidate cached standings when any process changes them.
+
+    Starts a background thread which LISTENs on the `standings_changed`
+    channel, notified by the database whenever a tournament's player_stats
+    rows change, and drops that tournament from the standings cache.  Only
+    useful with the database backend.  Calling it again does nothing.
+    """
+    global _standings_listener
+    if _standings_listener is None:
+        _standings_listener = NotifyListener(
+            DSN, 'standings_changed',
+            lambda payload: standings_cache.invalidate(int(payload)),
+            on_connect=standings_cache.invalidate)
+        _standings_listener.start()
+
+
+def stopStandingsListener():
+    """Stop the thread started by startStandingsListener()."""
+    global _standings_listener
+    if _standings_listener is not None:
+        _standings_listener.stop()
+        _standings_listener = None
+
+
+def standingsCacheStats():
+    """Returns the standings cache counters as a dict.
+
+    Returns:
+      A dict with the number of 'hits' and 'misses' of standings lookups,
+      and the number of cached tournaments ('entries').
+    """
+    return standings_cache.stats()
+
+
+def metricsSnapshot():
+    """Returns the counters and timers of the tournament module as a dict.
+
+    Counters count database transactions ('db.transactions',
+    'db.rollbacks') and pairing work ('pairing.skipped' rematches,
+    'pairing.backtracks', 'pairing.failures').  Timers record the time spent
+    waiting for a pooled connection ('db.checkout'), in transactions
+    ('db.transaction') and pairing ('swissPairings',
+    'serverSwissPairings').  See util.metrics for the text format to expose
+    them to a scraper.
+
+    Returns:
+      {'counters': {name: value},
+       'timers': {name: {'count': n, 'total_s': s, 'max_s': s}}}
+    """
+    return metrics.snapshot()
+
+
+def createTournament(name):
+    """Adds a tournament to the database.
+
+    The tournament gets its own partition of the matches table.
+
+    Args:
+      name: the tournament's name (need not be unique).
+
+    Returns:
+      The new tournament's id.
+    """
+    return backend.create_tournament(name)
+
+
+def archiveTournament(tournament):
+    """Archives a finished tournament by detaching its matches partition.
+
+    The tournament's matches are kept in the detached `matches_<id>` table
+    but no longer belong to the matches table, so no query of another
+    tournament ever scans them.  Its players and standings are kept.
+
+    Args:
+      tournament: the id of the tournament to archive.
+    """
+    backend.archive_tournament(tournament)
 
 
-def deleteMatches():
-    """Remove all the match records from the database."""
-    conn = connect()
-    c = conn.cursor()
-    c.execute("DELETE FROM matches;")
-    conn.commit()
-    conn.close()
+def deleteMatches(tournament=DEFAULT_TOURNAMENT):
+    """Remove all the match records of a tournament from the database."""
+    backend.delete_matches(tournament)
+    standings_cache.invalidate(tournament)
 
 
-def deletePlayers():
-    """Remove all the player records from the database."""
-    conn = connect()
-    c = conn.cursor()
-    c.execute("DELETE FROM players;")
-    conn.commit()
-    conn.close()
+def deletePlayers(tournament=DEFAULT_TOURNAMENT):
+    """Remove all the player records of a tournament from the database."""
+    backend.delete_players(tournament)
+    standings_cache.invalidate(tournament)
 
 
-def countPlayers():
-    """Returns the number of players currently registered."""
-    conn = connect()
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM players;")
-    result = c.fetchone()
-    conn.commit()
-    conn.close()
-    count = result[0]
-    return count
+def countPlayers(tournament=DEFAULT_TOURNAMENT):
+    """Returns the number of players currently registered in a tournament."""
+    return backend.count_players(tournament)
 
 
-def registerPlayer(name):
+def registerPlayer(name, tournament=DEFAULT_TOURNAMENT):
     """Adds a player to the tournament database.
 
     The database assigns a unique serial id number for the player.  (This
@@ -50,72 +227,218 @@ def registerPlayer(name):
 
     Args:
       name: the player's full name (need not be unique).
+      tournament: the id of the tournament the player registers in.
+    """
+    backend.register_player(name, tournament)
+    standings_cache.invalidate(tournament)
+
+
+def registerPlayers(names, tournament=DEFAULT_TOURNAMENT):
+    """Adds many players to the tournament database in one transaction.
+
+    With the database backend all names are sent in a single INSERT
+    statement, so registering a whole field costs one round trip instead of
+    one connection per player.
+
+    Args:
+      names: an iterable of the players' full names.
+      tournament: the id of the tournament the players register in.
     """
-    conn = connect()
-    c = conn.cursor()
-    c.execute("INSERT INTO players VALUES (%s);", (name,))
-    conn.commit()
-    conn.close()
+    names = list(names)
+    if not names:
+        return
+    backend.register_players(names, tournament)
+    standings_cache.invalidate(tournament)
 
 
-def playerStandings():
-    """Returns a list of the players and their win records, sorted by wins.
+def playerStandings(tournament=DEFAULT_TOURNAMENT):
+    """Returns a list of the players and their win records, sorted by points.
 
     The first entry in the list should be the player in first place, or a player
-    tied for first place if there is currently a tie.
+    tied for first place if there is currently a tie.  Players score 3 points
+    for a win and 1 for a draw (see tiebreakStandings()); without draws this
+    is the order of wins.  Players with the same points are ordered by the
+    tiebreakers of tiebreakStandings().
+
+    Args:
+      tournament: the id of the tournament.
 
     Returns:
       A list of tuples, each of which contains (id, name, wins, matches):
         id: the player's unique id (assigned by the database)
         name: the player's full name (as registered)
         wins: the number of matches the player has won
-        matches: the number of matches the player has played
+        matches: the number of matches the player has played, including draws
+    """
+    return [row[:4] for row in tiebreakStandings(tournament)]
+
+
+def tiebreakStandings(tournament=DEFAULT_TOURNAMENT):
+    """Returns the standings with draws, points and the tiebreakers.
+
+    Points, draws and the Buchholz and OMW tiebreakers, which rate the
+    strength of the opponents a player has met, are all kept up to date as
+    matches are reported.  With the database backend the standings are a
+    single read of the player_stats table in index order, whose cost does
+    not grow with the match history; after each write statement only the
+    tiebreakers of the players involved and of their opponents are
+    recomputed (the refresh_tiebreaks() SQL function).
+
+    Args:
+      tournament: the id of the tournament.
+
+    Returns:
+      A list of tuples, each of which contains
+      (id, name, wins, matches, draws, points, buchholz, omw):
+        id, name, wins, matches: as returned by playerStandings()
+        draws: the number of matches the player has drawn
+        points: 3 for every win or bye plus 1 for every draw
+        buchholz: the sum of the points of the player's opponents
+        omw: the average match-win rate (points / (3 * matches)) of the
+          player's opponents, rounded to 4 decimals
+      sorted by points, buchholz and omw, highest first, then by id.
+    """
+    return standings_cache.get(tournament, backend.player_standings)
+
+
+def verifyStandings(tournament=DEFAULT_TOURNAMENT):
+    """Checks the stored standings against the standings computed from matches.
+
+    With the database backend playerStandings() reads the player_stats
+    table, which is kept up to date by triggers on players and matches.  This
+    recomputes the standings from the matches table through the
+    v_playerStandings view, and the tiebreakers through the
+    tiebreak_standings() SQL function, and compares them.
+
+    Args:
+      tournament: the id of the tournament.
+
+    Returns:
+      A list of the ids of players whose stored wins, matches, draws, points
+      or tiebreakers differ from the computed ones; empty if the standings
+      are consistent.
     """
-    conn = connect()
-    c = conn.cursor()
-    c.execute("SELECT * FROM v_playerStandings;")
-    results = c.fetchall()
-    conn.commit()
-    conn.close()
-    return results
+    return backend.verify_standings(tournament)
 
 
-def reportMatch(winner, loser):
+def reportMatch(winner, loser, tournament=DEFAULT_TOURNAMENT, draw=False):
     """Records the outcome of a single match between two players.
 
+    A bye is recorded with `loser` set to None.  It counts as a win and a
+    match played, and is stored as a match the player won against itself, so
+    the rematch check keeps a player from getting a second bye.
+
+    A draw is stored in the same single row, with `draw` set; which player
+    is passed as the winner does not matter then.
+
     Args:
       winner:  the id number of the player who won
-      loser:  the id number of the player who lost
+      loser:  the id number of the player who lost, or None for a bye
+      tournament: the id of the tournament both players are registered in
+      draw: True if the match was drawn
+    """
+    if loser is None:
+        loser = winner
+    backend.report_match(winner, loser, bool(draw), tournament)
+    standings_cache.invalidate(tournament)
+
+
+def reportMatches(matches, tournament=DEFAULT_TOURNAMENT):
+    """Records the outcomes of many matches in one transaction.
+
+    With the database backend all results are sent in a single INSERT
+    statement.  If any match is rejected (e.g. a rematch) none of them are
+    recorded.
+
+    Args:
+      matches: an iterable of (winner, loser) id pairs, of
+        (winner, loser, draw) tuples, or of the (id1, name1, id2, name2)
+        tuples returned by swissPairings(), in which case the first player of
+        each pairing is recorded as the winner.  A loser (or id2) of None
+        records a bye, as in reportMatch().
+      tournament: the id of the tournament the players are registered in.
     """
-    conn = connect()
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO matches VALUES (%s, %s);",
-        (winner, loser))
-    conn.commit()
-    conn.close()
+    winners = []
+    losers = []
+    draws = []
+    for match in matches:
+        if len(match) == 4:
+            winner, loser, draw = match[0], match[2], False
+        elif len(match) == 3:
+            winner, loser, draw = match
+        else:
+            winner, loser = match
+            draw = False
+        winners.append(winner)
+        losers.append(winner if loser is None else loser)
+        draws.append(bool(draw))
+    if not winners:
+        return
+    backend.report_matches(winners, losers, draws, tournament)
+    standings_cache.invalidate(tournament)
 
 
-def getMatches():
+def getMatches(tournament=DEFAULT_TOURNAMENT):
     """Returns a list of previous matches between players, sorted by winner.
 
     This list is used to lookup previous matches and avoid rematches between
     players.
 
+    Args:
+      tournament: the id of the tournament.
+
     Returns:
       A list of tuples, each of which contains (winner, loser):
         winner: the winner's id (assigned by the database)
-        loser: the loser's id (assigned by the database)
+        loser: the loser's id (assigned by the database), equal to winner
+          for a bye
+    """
+    return backend.get_matches(tournament)
+
+
+def saveSnapshot(filename, tournament=DEFAULT_TOURNAMENT):
+    """Saves the players and matches of a tournament to a binary file.
+
+    With the database backend both tables are streamed out with
+    COPY ... (FORMAT binary), so even 100k players and their matches are
+    saved in seconds.  The snapshot can be restored with loadSnapshot() into
+    any tournament, with either backend.  Matches of an archived tournament
+    are not saved.
+
+    Args:
+      filename: the file to write.
+      tournament: the id of the tournament.
+    """
+    players, matches = backend.export_snapshot(tournament)
+    with open(filename, 'wb') as f:
+        write_snapshot(f, players, matches)
+
+
+def loadSnapshot(filename, tournament=DEFAULT_TOURNAMENT):
+    """Replaces the players and matches of a tournament with a snapshot.
+
+    Restores a file written by saveSnapshot(), e.g. as a test fixture or to
+    replay an event.  The players get new ids, in the order of their old
+    ones, so the standings come back in the same order.  Nothing changes if
+    the snapshot cannot be loaded.
+
+    Args:
+      filename: the file written by saveSnapshot().
+      tournament: the id of the tournament to replace.
+
+    Raises:
+      ValueError: if the file is not a snapshot or the tournament is
+        archived.
     """
-    conn = connect()
-    c = conn.cursor()
-    c.execute("SELECT * FROM matches ORDER BY winner DESC;")
-    results = c.fetchall()
-    conn.commit
-    conn.close()
-    return results
+    with open(filename, 'rb') as f:
+        players, matches = read_snapshot(f)
+    try:
+        backend.import_snapshot(players, matches, tournament)
+    finally:
+        standings_cache.invalidate(tournament)
+
 
-def swissPairings():
+def swissPairings(tournament=DEFAULT_TOURNAMENT, perfect=False, stats=None):
     """Returns a list of pairs of players for the next round of a match.
 
     Assuming that there are an even number of players registered, each player
@@ -123,42 +446,58 @@ def swissPairings():
     player with an equal or nearly-equal win record, that is, a player adjacent
     to him or her in the standings.
 
+    By default players are only paired within the same number of points and
+    a player with no opponent left in its group is left out.  With `perfect`
+    set, every player is paired and no rematches are made, pairing across
+    point groups where needed (see pairing.pair_perfect).
+
+    With an odd number of players one player gets a bye instead of an
+    opponent: the lowest-ranked player who has not had a bye yet.  The bye
+    is chosen while pairing, as if it were one more player ranked last, so
+    it costs no extra query or pairing pass.
+
+    Args:
+      tournament: the id of the tournament.
+      perfect: pair every player, or raise ValueError if that is impossible.
+      stats: an optional dict which collects the pairing counters ('skipped'
+        rematches, or 'backtracks' with `perfect`).
+
     Returns:
       A list of tuples, each of which contains (id1, name1, id2, name2)
         id1: the first player's unique id
         name1: the first player's name
-        id2: the second player's unique id
-        name2: the second player's name
-    """
-    # ps is a list of (id, name, wins, matches) tuples
-    ps = playerStandings()
-    # a list of all previous matches
-    prev_matches = getMatches()
-
-    pairs = []
-    while len(ps):
-        # grab the first player from the player standings list
-        p1 = ps.pop(0)
-        p1_id = p1[0]
-        p1_name = p1[1]
-        p1_wins = p1[2]
-        # get a list of all players with the same wins or one less
-        same_rank = [row for row in ps if row[2] == p1_wins]
-        # reverse same_rank to reduce the chance of trying to pair already
-        # matched players
-        same_rank.reverse()
-        # pair the next player from the same_rank list who has not been
-        # matched before.
-        for p2 in same_rank:
-            p2_id = p2[0]
-            p2_name = p2[1]
-            if p1_id != p2_id and not(
-                (p1_id, p2_id) in prev_matches or
-                (p2_id, p1_id) in prev_matches):
-                pairs.append((p1_id, p1_name, p2_id, p2_name))
-                ps.remove(p2)
-                break
-            else:
-                logger.warn('skipped: %s', (p1_id, p2_id))
-
-    return pairs
+        id2: the second player's unique id, or None for a bye
+        name2: the second player's name, or None for a bye
+    """
+    # standings is a list of (id, name, points) tuples sorted by points and
+    # tiebreakers, so that pairing within a score group starts with the
+    # players who met the strongest opponents
+    with metrics.timer('swissPairings'):
+        standings = [(row[0], row[1], row[5])
+                     for row in tiebreakStandings(tournament)]
+        # a list of all previous matches
+        prev_matches = getMatches(tournament)
+        if perfect:
+            return pair_perfect(standings, prev_matches, stats)
+        return pair_players(standings, prev_matches, stats)
+
+
+def serverSwissPairings(tournament=DEFAULT_TOURNAMENT):
+    """Returns the pairs for the next round, computed by the storage backend.
+
+    With the database backend the pairing runs inside PostgreSQL (the
+    swiss_pairings() SQL function), so a round costs one query and transfers
+    only the pairs instead of the full standings and match history.  The
+    pairs are the same as swissPairings(perfect=True) returns.
+
+    Args:
+      tournament: the id of the tournament.
+
+    Returns:
+      A list of (id1, name1, id2, name2) tuples covering every player.
+
+    Raises:
+      ValueError: if no pairing without rematches or repeated byes exists.
+    """
+    with metrics.timer('serverSwissPairings'):
+        return backend.swiss_pairings(tournament)
@@ -4,49 +4,588 @@ DROP DATABASE IF EXISTS tournament;
 CREATE DATABASE tournament;
 \c tournament;
 
--- The players table containing a player's name and a unique id
+-- The tournaments table; every player and match belongs to one tournament
+CREATE TABLE tournaments (
+    id serial PRIMARY KEY,
+    name text NOT NULL,
+    archived boolean NOT NULL DEFAULT false
+);
+
+-- The players table containing a player's name, a unique id and the
+-- tournament the player is registered in
 CREATE TABLE players (
     name text NOT NULL,
-    id serial PRIMARY KEY
+    id serial PRIMARY KEY,
+    tournament int NOT NULL REFERENCES tournaments (id),
+    UNIQUE (tournament, id)
 );
 
 -- The matches table contains records of each match and the winner and the
--- loser of each match
+-- loser of each match.  It is partitioned by tournament (one partition per
+-- tournament, created by t_tournament_added), so queries for one tournament
+-- never read another tournament's matches and a finished tournament can be
+-- archived by detaching its partition.  Both players must be registered in
+-- the match's tournament.  A bye is stored as a match the player won against
+-- itself (winner = loser), so matches_uniq_idx allows one bye per player.
+-- A drawn match sets draw; winner and loser are then just its two players.
 CREATE TABLE matches (
-    winner int REFERENCES players (id),
-    loser int REFERENCES players (id),
-    PRIMARY KEY (winner, loser)
-);
+    tournament int NOT NULL,
+    winner int NOT NULL,
+    loser int NOT NULL,
+    draw boolean NOT NULL DEFAULT false,
+    PRIMARY KEY (tournament, winner, loser),
+    CHECK (NOT (draw AND winner = loser)),
+    FOREIGN KEY (tournament, winner) REFERENCES players (tournament, id),
+    FOREIGN KEY (tournament, loser) REFERENCES players (tournament, id)
+) PARTITION BY LIST (tournament);
 
--- To prevent rematch btw players
+-- To prevent rematch btw players of a tournament, and a second bye
 CREATE UNIQUE INDEX matches_uniq_idx ON matches
-   (greatest(winner, loser), least(winner, loser));
+   (tournament, greatest(winner, loser), least(winner, loser));
+
+-- To look up the matches a player lost; lookups by winner use the primary key
+CREATE INDEX matches_loser_idx ON matches (tournament, loser);
+
+-- The player_stats table keeps each player's wins, draws, matches played,
+-- points (3 for a win or a bye, 1 for a draw) and the Buchholz and OMW
+-- tiebreakers (see tiebreak_standings()) up to date as matches are recorded,
+-- so standings never re-aggregate matches
+CREATE TABLE player_stats (
+    id int PRIMARY KEY REFERENCES players (id) ON DELETE CASCADE,
+    tournament int NOT NULL,
+    wins int NOT NULL DEFAULT 0,
+    matches int NOT NULL DEFAULT 0,
+    draws int NOT NULL DEFAULT 0,
+    points int NOT NULL DEFAULT 0,
+    buchholz bigint NOT NULL DEFAULT 0,
+    omw float8 NOT NULL DEFAULT 0
+);
+
+-- The standings order: the player_standings statement of playerStandings()
+-- and swiss_pairings() read a tournament's rows in this order straight from
+-- the index, with no sort (the ORDER BY of v_playerStandings and of
+-- tiebreak_standings() sorts an aggregate, which no index can serve)
+CREATE INDEX player_stats_points_idx ON player_stats
+    (tournament, points DESC, buchholz DESC, omw DESC, id);
+
+/* Create Triggers */
+-- Every new tournament gets its own matches partition
+CREATE FUNCTION f_tournament_added() RETURNS trigger AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF matches FOR VALUES IN (%s)',
+        'matches_' || NEW.id, NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER t_tournament_added AFTER INSERT ON tournaments
+    FOR EACH ROW EXECUTE PROCEDURE f_tournament_added();
+
+-- Every new player starts with an empty player_stats row
+CREATE FUNCTION f_player_added() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO player_stats (id, tournament) VALUES (NEW.id, NEW.tournament);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER t_player_added AFTER INSERT ON players
+    FOR EACH ROW EXECUTE PROCEDURE f_player_added();
+
+-- Apply every change to matches to the player_stats of both players.  A
+-- bulk load (import_snapshot() in backends/postgres.py) instead sets
+-- tournament.bulk_load to 'on' for its transaction with SET LOCAL and
+-- computes player_stats, tiebreakers included, in one pass at the end.
+CREATE FUNCTION f_match_changed() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('tournament.bulk_load', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        IF OLD.draw THEN
+            UPDATE player_stats SET draws = draws - 1, matches = matches - 1,
+                                    points = points - 1
+                WHERE id IN (OLD.winner, OLD.loser);
+        ELSE
+            UPDATE player_stats SET wins = wins - 1, matches = matches - 1,
+                                    points = points - 3
+                WHERE id = OLD.winner;
+            UPDATE player_stats SET matches = matches - 1
+                WHERE id = OLD.loser AND OLD.loser <> OLD.winner;
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.draw THEN
+            UPDATE player_stats SET draws = draws + 1, matches = matches + 1,
+                                    points = points + 1
+                WHERE id IN (NEW.winner, NEW.loser);
+        ELSE
+            UPDATE player_stats SET wins = wins + 1, matches = matches + 1,
+                                    points = points + 3
+                WHERE id = NEW.winner;
+            UPDATE player_stats SET matches = matches + 1
+                WHERE id = NEW.loser AND NEW.loser <> NEW.winner;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER t_match_changed AFTER INSERT OR UPDATE OR DELETE ON matches
+    FOR EACH ROW EXECUTE PROCEDURE f_match_changed();
+
+-- Recompute the tiebreakers of the players of the changed matches and of
+-- their opponents, once per statement after t_match_changed has updated the
+-- points: a player's Buchholz and OMW only change when the player gains or
+-- loses an opponent or an opponent's points change.  Transition tables name
+-- the changed rows; a trigger may only have them for a single event.
+CREATE FUNCTION f_tiebreaks_changed() RETURNS trigger AS $$
+DECLARE
+    tid int;
+    ids int[];
+BEGIN
+    IF current_setting('tournament.bulk_load', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    FOR tid IN SELECT DISTINCT tournament FROM changed LOOP
+        SELECT array_agg(DISTINCT p.id) INTO ids
+            FROM (SELECT winner AS id FROM changed WHERE tournament = tid
+                  UNION ALL
+                  SELECT loser FROM changed WHERE tournament = tid) AS p;
+        SELECT array_agg(DISTINCT o.id) INTO ids
+            FROM (SELECT p.id FROM unnest(ids) AS p (id)
+                  UNION ALL
+                  SELECT m.loser FROM unnest(ids) AS p (id)
+                  JOIN matches AS m
+                      ON m.tournament = tid AND m.winner = p.id
+                  UNION ALL
+                  SELECT m.winner FROM unnest(ids) AS p (id)
+                  JOIN matches AS m
+                      ON m.tournament = tid AND m.loser = p.id) AS o;
+        PERFORM refresh_tiebreaks(tid, ids);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER t_tiebreaks_inserted AFTER INSERT ON matches
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+CREATE TRIGGER t_tiebreaks_deleted AFTER DELETE ON matches
+    REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+CREATE TRIGGER t_tiebreaks_updated_old AFTER UPDATE ON matches
+    REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+CREATE TRIGGER t_tiebreaks_updated_new AFTER UPDATE ON matches
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE PROCEDURE f_tiebreaks_changed();
+
+-- Tell listening processes that a tournament's standings changed (see
+-- startStandingsListener() in tournament.py); PostgreSQL sends a single
+-- notification per tournament and transaction
+CREATE FUNCTION f_standings_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('standings_changed', OLD.tournament::text);
+    ELSE
+        PERFORM pg_notify('standings_changed', NEW.tournament::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER t_standings_changed
+    AFTER INSERT OR UPDATE OR DELETE ON player_stats
+    FOR EACH ROW EXECUTE PROCEDURE f_standings_changed();
+
+/* Create Functions */
+/* Returns the standings of a tournament with two tiebreakers, both computed
+ * in a single aggregate pass over the tournament's matches partition:
+ *   buchholz: the sum of the points of the player's opponents
+ *   omw: the average match-win rate (points / (3 * matches)) of the
+ *        player's opponents, rounded to 4 decimals
+ * Rows are sorted by points, buchholz and omw, highest first, then by id.
+ * The standings are read from player_stats, where the triggers keep both
+ * tiebreakers; this function is kept to verify them (see verifyStandings()
+ * in tournament.py). */
+CREATE FUNCTION tiebreak_standings(tid int)
+    RETURNS TABLE (id int, name text, wins int, matches int, draws int,
+                   points int, buchholz bigint, omw float8) AS $$
+    SELECT p.id, p.name, s.wins, s.matches, s.draws, s.points,
+           coalesce(sum(o.points), 0) AS buchholz,
+           coalesce(round(avg(o.points::numeric / (3 * o.matches)), 4),
+                    0)::float8 AS omw
+    FROM player_stats AS s
+    JOIN players AS p ON p.id = s.id
+    LEFT JOIN (SELECT winner AS player, loser AS opponent
+               FROM matches WHERE tournament = tid AND winner <> loser
+               UNION ALL
+               SELECT loser, winner
+               FROM matches WHERE tournament = tid AND winner <> loser) AS m
+        ON m.player = s.id
+    LEFT JOIN player_stats AS o ON o.id = m.opponent
+    WHERE s.tournament = tid
+    GROUP BY s.id, p.id
+    ORDER BY s.points DESC, buchholz DESC, omw DESC, s.id;
+$$ LANGUAGE sql STABLE;
+
+/* Stores the Buchholz and OMW tiebreakers of the players `ids` of a
+ * tournament in player_stats, computed from their matches as
+ * tiebreak_standings() does.  The matches are looked up by player through
+ * the primary key and matches_loser_idx, so the cost grows with the number
+ * of players and their matches, not with the tournament's match history. */
+CREATE FUNCTION refresh_tiebreaks(tid int, ids int[]) RETURNS void AS $$
+    UPDATE player_stats AS s
+    SET buchholz = t.buchholz, omw = t.omw
+    FROM (SELECT p.id, coalesce(sum(o.points), 0) AS buchholz,
+                 coalesce(round(avg(o.points::numeric / (3 * o.matches)), 4),
+                          0)::float8 AS omw
+          FROM unnest(ids) AS p (id)
+          LEFT JOIN (SELECT q.id AS player, m.loser AS opponent
+                     FROM unnest(ids) AS q (id)
+                     JOIN matches AS m
+                         ON m.tournament = tid AND m.winner = q.id
+                     WHERE m.loser <> m.winner
+                     UNION ALL
+                     SELECT q.id, m.winner
+                     FROM unnest(ids) AS q (id)
+                     JOIN matches AS m
+                         ON m.tournament = tid AND m.loser = q.id
+                     WHERE m.loser <> m.winner) AS m
+              ON m.player = p.id
+          LEFT JOIN player_stats AS o ON o.id = m.opponent
+          GROUP BY p.id) AS t
+    WHERE s.id = t.id
+      AND (s.buchholz, s.omw) IS DISTINCT FROM (t.buchholz, t.omw);
+$$ LANGUAGE sql;
+
+/* Extends a pairing of the players 1..n by one pair with Edmonds' blossom
+ * algorithm, as _augment() in pairing.py does.  mate[k] is the player k is
+ * paired with, or 0; only players with active[k] take part; the players k
+ * has already played are opp[opp_start[k]:opp_start[k + 1] - 1].  Returns
+ * mate with an augmenting path from the unpaired player root flipped, or
+ * NULL if there is none. */
+CREATE FUNCTION augment_pairing(root int, mate int[], active boolean[],
+                                opp_start int[], opp int[])
+    RETURNS int[] AS $$
+DECLARE
+    n int := array_length(mate, 1);
+    base int[];
+    parent int[];
+    used boolean[];
+    seen boolean[];
+    blossom boolean[];
+    queue int[];
+    head int := 1;
+    tail int := 1;
+    v int;
+    a int;
+    b int;
+    cur int;
+    x int;
+    child int;
+    pv int;
+BEGIN
+    base := ARRAY(SELECT generate_series(1, n));
+    parent := array_fill(0, ARRAY[n]);
+    used := array_fill(false, ARRAY[n]);
+    used[root] := true;
+    queue := ARRAY[root];
+    WHILE head <= tail LOOP
+        v := queue[head];
+        head := head + 1;
+        FOR u IN 1..n LOOP
+            CONTINUE WHEN NOT active[u] OR base[v] = base[u] OR mate[v] = u
+                OR u = ANY (opp[opp_start[v]:opp_start[v + 1] - 1]);
+            IF u = root OR (mate[u] <> 0 AND parent[mate[u]] <> 0) THEN
+                -- an odd cycle: contract it into a blossom around cur
+                seen := array_fill(false, ARRAY[n]);
+                a := v;
+                LOOP
+                    a := base[a];
+                    seen[a] := true;
+                    EXIT WHEN mate[a] = 0;
+                    a := parent[mate[a]];
+                END LOOP;
+                b := base[u];
+                WHILE NOT seen[b] LOOP
+                    b := base[parent[mate[b]]];
+                END LOOP;
+                cur := b;
+                blossom := array_fill(false, ARRAY[n]);
+                FOR side IN 1..2 LOOP
+                    IF side = 1 THEN
+                        x := v;
+                        child := u;
+                    ELSE
+                        x := u;
+                        child := v;
+                    END IF;
+                    WHILE base[x] <> cur LOOP
+                        blossom[base[x]] := true;
+                        blossom[base[mate[x]]] := true;
+                        parent[x] := child;
+                        child := mate[x];
+                        x := parent[mate[x]];
+                    END LOOP;
+                END LOOP;
+                FOR k IN 1..n LOOP
+                    IF active[k] AND blossom[base[k]] THEN
+                        base[k] := cur;
+                        IF NOT used[k] THEN
+                            used[k] := true;
+                            tail := tail + 1;
+                            queue[tail] := k;
+                        END IF;
+                    END IF;
+                END LOOP;
+            ELSIF parent[u] = 0 THEN
+                parent[u] := v;
+                IF mate[u] = 0 THEN
+                    -- flip the path from u back to root
+                    x := u;
+                    WHILE x <> 0 LOOP
+                        pv := parent[x];
+                        a := mate[pv];
+                        mate[x] := pv;
+                        mate[pv] := x;
+                        x := a;
+                    END LOOP;
+                    RETURN mate;
+                END IF;
+                used[mate[u]] := true;
+                tail := tail + 1;
+                queue[tail] := mate[u];
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+/* Pairs the next round of a tournament inside the database, returning only
+ * the (id1, name1, id2, name2) rows; id2 and name2 are NULL for the bye of
+ * an odd number of players.  Same algorithm and results as pair_perfect()
+ * in pairing.py: players are taken from the top of the tiebreak standings
+ * down and paired with the nearest unpaired player they have not played and
+ * after which the players left can still all be paired, using
+ * augment_pairing().  The standings are read from player_stats through
+ * player_stats_points_idx, and the players each one has played through
+ * the matches partition of the tournament. */
+CREATE FUNCTION swiss_pairings(tid int)
+    RETURNS TABLE (id1 int, name1 text, id2 int, name2 text) AS $$
+DECLARE
+    ids int[];
+    names text[];
+    n int;
+    bye int;
+    -- player k has played opp[opp_start[k]:opp_start[k + 1] - 1]
+    opp_player int[];
+    opp int[];
+    opp_start int[];
+    mate int[];
+    active boolean[];
+    augmented int[];
+    -- circular list of unpaired players 1..n with a sentinel at 0
+    nxt int[];
+    prv int[];
+    -- pairs made so far; pair_i holds the higher-ranked player
+    pair_i int[] := '{}';
+    pair_j int[] := '{}';
+    top int := 0;
+    i int;
+    j int;
+    a int;
+    b int;
+BEGIN
+    SELECT array_agg(s.id ORDER BY s.points DESC, s.buchholz DESC,
+                                  s.omw DESC, s.id),
+           array_agg(p.name ORDER BY s.points DESC, s.buchholz DESC,
+                                     s.omw DESC, s.id)
+        INTO ids, names
+        FROM player_stats AS s JOIN players AS p ON p.id = s.id
+        WHERE s.tournament = tid;
+    n := coalesce(array_length(ids, 1), 0);
+    -- with an odd number of players the bye pairs like one more player
+    -- ranked last, whose opponents are the players who had a bye
+    IF n % 2 = 1 THEN
+        ids := ids || NULL::int;
+        names := names || NULL::text;
+        n := n + 1;
+        bye := n;
+    END IF;
+    IF n = 0 THEN
+        RETURN;
+    END IF;
+
+    SELECT coalesce(array_agg(e.a ORDER BY e.a, e.b), '{}'),
+           coalesce(array_agg(e.b ORDER BY e.a, e.b), '{}')
+        INTO opp_player, opp
+        FROM (SELECT w.k::int AS a,
+                     CASE WHEN m.winner = m.loser THEN bye
+                          ELSE l.k::int END AS b
+              FROM matches AS m
+              JOIN unnest(ids) WITH ORDINALITY AS w (id, k)
+                  ON w.id = m.winner
+              JOIN unnest(ids) WITH ORDINALITY AS l (id, k)
+                  ON l.id = m.loser
+              WHERE m.tournament = tid
+              UNION ALL
+              SELECT CASE WHEN m.winner = m.loser THEN bye
+                          ELSE l.k::int END,
+                     w.k::int
+              FROM matches AS m
+              JOIN unnest(ids) WITH ORDINALITY AS w (id, k)
+                  ON w.id = m.winner
+              JOIN unnest(ids) WITH ORDINALITY AS l (id, k)
+                  ON l.id = m.loser
+              WHERE m.tournament = tid) AS e
+        WHERE e.a IS NOT NULL AND e.b IS NOT NULL;
+    opp_start := array_fill(0, ARRAY[n + 1]);
+    opp_start[1] := 1;
+    FOREACH a IN ARRAY opp_player LOOP
+        opp_start[a + 1] := opp_start[a + 1] + 1;
+    END LOOP;
+    FOR k IN 2..n + 1 LOOP
+        opp_start[k] := opp_start[k] + opp_start[k - 1];
+    END LOOP;
+
+    nxt := array_fill(0, ARRAY[n + 1], ARRAY[0]);
+    prv := array_fill(0, ARRAY[n + 1], ARRAY[0]);
+    FOR k IN 0..n LOOP
+        nxt[k] := (k + 1) % (n + 1);
+        prv[k] := (k + n) % (n + 1);
+    END LOOP;
+
+    -- pair each player with the nearest remaining player it has not played
+    mate := array_fill(0, ARRAY[n]);
+    WHILE nxt[0] <> 0 LOOP
+        i := nxt[0];
+        nxt[prv[i]] := nxt[i];
+        prv[nxt[i]] := prv[i];
+        j := nxt[0];
+        WHILE j <> 0 AND j = ANY (opp[opp_start[i]:opp_start[i + 1] - 1]) LOOP
+            j := nxt[j];
+        END LOOP;
+        IF j <> 0 THEN
+            nxt[prv[j]] := nxt[j];
+            prv[nxt[j]] := prv[j];
+            mate[i] := j;
+            mate[j] := i;
+            top := top + 1;
+            pair_i[top] := i;
+            pair_j[top] := j;
+        END IF;
+    END LOOP;
+
+    IF 2 * top < n THEN
+        FOR k IN 0..n LOOP
+            nxt[k] := (k + 1) % (n + 1);
+            prv[k] := (k + n) % (n + 1);
+        END LOOP;
+        active := array_fill(true, ARRAY[n]);
+        FOR k IN 1..n LOOP
+            CONTINUE WHEN mate[k] <> 0;
+            augmented := augment_pairing(k, mate, active, opp_start, opp);
+            IF augmented IS NULL THEN
+                RAISE EXCEPTION 'No pairing without rematches exists.';
+            END IF;
+            mate := augmented;
+        END LOOP;
+
+        -- mate now pairs every player; take the nearest opponent of each
+        -- player from the top down for which the rest can be re-paired
+        top := 0;
+        WHILE nxt[0] <> 0 LOOP
+            i := nxt[0];
+            nxt[prv[i]] := nxt[i];
+            prv[nxt[i]] := prv[i];
+            active[i] := false;
+            j := nxt[0];
+            WHILE j <> mate[i] LOOP
+                IF NOT j = ANY (opp[opp_start[i]:opp_start[i + 1] - 1]) THEN
+                    a := mate[i];
+                    b := mate[j];
+                    active[j] := false;
+                    mate[a] := 0;
+                    mate[b] := 0;
+                    augmented := augment_pairing(a, mate, active, opp_start,
+                                                 opp);
+                    IF augmented IS NOT NULL THEN
+                        mate := augmented;
+                        mate[i] := j;
+                        mate[j] := i;
+                        EXIT;
+                    END IF;
+                    active[j] := true;
+                    mate[a] := i;
+                    mate[b] := j;
+                END IF;
+                j := nxt[j];
+            END LOOP;
+            nxt[prv[j]] := nxt[j];
+            prv[nxt[j]] := prv[j];
+            active[j] := false;
+            top := top + 1;
+            pair_i[top] := i;
+            pair_j[top] := j;
+        END LOOP;
+    END IF;
+
+    RETURN QUERY
+        SELECT ids[pair_i[k]], names[pair_i[k]],
+               ids[pair_j[k]], names[pair_j[k]]
+        FROM generate_series(1, top) AS k
+        ORDER BY k;
+END;
+$$ LANGUAGE plpgsql;
 
 /* Create Views */
+/* These views compute the standings from the matches table.  playerStandings()
+ * reads player_stats instead; the views are kept to verify it (see
+ * verifyStandings() in tournament.py). */
 -- The number of matches each player has played
 CREATE VIEW v_numMatches AS
-    SELECT id, COUNT(winner) AS matchesPlayed
+    SELECT players.tournament, players.id, COUNT(winner) AS matchesPlayed
     FROM players LEFT JOIN matches
-    ON (winner = id OR loser = id)
-    GROUP BY players.id
+    ON (matches.tournament = players.tournament AND
+        (winner = players.id OR loser = players.id))
+    GROUP BY players.tournament, players.id
     ORDER BY players.id;
 
 -- The number of wins for each player
 CREATE VIEW v_numWins AS
-    SELECT players.id, COUNT(winner) AS wins
+    SELECT players.tournament, players.id, COUNT(winner) AS wins
     FROM players LEFT JOIN matches
-    ON players.id = matches.winner
-    GROUP BY players.id
+    ON (matches.tournament = players.tournament AND
+        players.id = matches.winner AND NOT matches.draw)
+    GROUP BY players.tournament, players.id
     ORDER BY wins DESC;
 
+-- The number of draws for each player
+CREATE VIEW v_numDraws AS
+    SELECT players.tournament, players.id, COUNT(winner) AS draws
+    FROM players LEFT JOIN matches
+    ON (matches.tournament = players.tournament AND matches.draw AND
+        (winner = players.id OR loser = players.id))
+    GROUP BY players.tournament, players.id
+    ORDER BY draws DESC;
+
 -- The player standings
 /* A view to return a table of the players and their win records, sorted by
- * wins */
+ * points (3 for a win or a bye, 1 for a draw) */
 CREATE VIEW v_playerStandings AS
     SELECT players.id, players.name, v_numWins.wins,
-           v_numMatches.matchesPlayed AS matches
+           v_numMatches.matchesPlayed AS matches, players.tournament,
+           v_numDraws.draws, 3 * v_numWins.wins + v_numDraws.draws AS points
     FROM players
     LEFT JOIN v_numWins ON
     (players.id = v_numWins.id)
     JOIN v_numMatches ON (players.id = v_numMatches.id)
-    ORDER BY wins DESC;
+    JOIN v_numDraws ON (players.id = v_numDraws.id)
+    ORDER BY points DESC;
+
+/* Create the default tournament, used when no tournament id is given */
+INSERT INTO tournaments (name) VALUES ('Default');
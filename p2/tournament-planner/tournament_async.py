@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+#
+# tournament_async.py -- asyncio implementation of a Swiss-system tournament
+#
+# The same operations as tournament.py, as coroutines running over an asyncpg
+# connection pool, for servers that handle many events from one event loop.
+# Requires Python 3.6+ and asyncpg.
+#
+
+import asyncio
+
+import asyncpg
+
+from pairing import pair_perfect, pair_players
+
+# Name of the tournament database
+DATABASE = 'tournament'
+
+# Id of the tournament created with the database, as in tournament.py
+DEFAULT_TOURNAMENT = 1
+
+# Standings with the stored tiebreakers, best first
+STANDINGS_QUERY = (
+    "SELECT s.id, p.name, s.wins, s.matches, s.draws, s.points, "
+    "       s.buchholz, s.omw "
+    "FROM player_stats AS s JOIN players AS p ON p.id = s.id "
+    "WHERE s.tournament = $1 "
+    "ORDER BY s.points DESC, s.buchholz DESC, s.omw DESC, s.id;")
+
+# Match history, as the pairing functions expect it
+MATCHES_QUERY = (
+    "SELECT winner, loser FROM matches WHERE tournament = $1 "
+    "ORDER BY winner DESC;")
+
+_pool = None
+_pool_lock = None
+
+
+async def configurePool(minconn=1, maxconn=10, **connect_kwargs):
+    """Create the connection pool, replacing (and closing) any existing one.
+
+    Calling this is optional; the first query creates a pool of the default
+    size.
+
+    Args:
+      minconn: number of connections opened when the pool is created.
+      maxconn: most connections in use at once; further queries wait.
+      connect_kwargs: extra asyncpg connection arguments (host, user, ...).
+    """
+    global _pool
+    old = _pool
+    connect_kwargs.setdefault('database', DATABASE)
+    _pool = await asyncpg.create_pool(
+        min_size=minconn, max_size=maxconn, **connect_kwargs)
+    if old is not None:
+        await old.close()
+
+
+async def closePool():
+    """Close every connection of the pool."""
+    global _pool
+    if _pool is not None:
+        old, _pool = _pool, None
+        await old.close()
+
+
+async def getPool():
+    """Returns the connection pool, creating it on first use."""
+    global _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                await configurePool()
+    return _pool
+
+
+async def createTournament(name):
+    """Adds a tournament to the database and returns its id."""
+    pool = await getPool()
+    return await pool.fetchval(
+        "INSERT INTO tournaments (name) VALUES ($1) RETURNING id;", name)
+
+
+async def archiveTournament(tournament):
+    """Archives a finished tournament by detaching its matches partition."""
+    pool = await getPool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "UPDATE tournaments SET archived = true WHERE id = $1;",
+                tournament)
+            await conn.execute(
+                "ALTER TABLE matches DETACH PARTITION matches_%d;" %
+                int(tournament))
+
+
+async def deleteMatches(tournament=DEFAULT_TOURNAMENT):
+    """Remove all the match records of a tournament from the database."""
+    pool = await getPool()
+    await pool.execute(
+        "DELETE FROM matches WHERE tournament = $1;", tournament)
+
+
+async def deletePlayers(tournament=DEFAULT_TOURNAMENT):
+    """Remove all the player records of a tournament from the database."""
+    pool = await getPool()
+    await pool.execute(
+        "DELETE FROM players WHERE tournament = $1;", tournament)
+
+
+async def countPlayers(tournament=DEFAULT_TOURNAMENT):
+    """Returns the number of players currently registered in a tournament."""
+    pool = await getPool()
+    return await pool.fetchval(
+        "SELECT COUNT(*) FROM players WHERE tournament = $1;", tournament)
+
+
+async def registerPlayer(name, tournament=DEFAULT_TOURNAMENT):
+    """Adds a player to a tournament."""
+    pool = await getPool()
+    await pool.execute(
+        "INSERT INTO players (name, tournament) VALUES ($1, $2);",
+        name, tournament)
+
+
+async def registerPlayers(names, tournament=DEFAULT_TOURNAMENT):
+    """Adds many players to a tournament in one statement."""
+    names = list(names)
+    if not names:
+        return
+    pool = await getPool()
+    await pool.execute(
+        "INSERT INTO players (name, tournament) "
+        "SELECT unnest($1::text[]), $2;",
+        names, tournament)
+
+
+async def playerStandings(tournament=DEFAULT_TOURNAMENT):
+    """Returns (id, name, wins, matches) tuples sorted by points.
+
+    See tournament.playerStandings().
+    """
+    return [row[:4] for row in await tiebreakStandings(tournament)]
+
+
+async def tiebreakStandings(tournament=DEFAULT_TOURNAMENT):
+    """Returns (id, name, wins, matches, draws, points, buchholz, omw)
+    tuples.
+
+    See tournament.tiebreakStandings().
+    """
+    pool = await getPool()
+    rows = await pool.fetch(STANDINGS_QUERY, tournament)
+    return [tuple(row) for row in rows]
+
+
+async def verifyStandings(tournament=DEFAULT_TOURNAMENT):
+    """Returns the ids of players whose stored standings disagree with the
+    standings computed from the matches table.
+
+    See tournament.verifyStandings().
+    """
+    pool = await getPool()
+    rows = await pool.fetch(
+        "SELECT v.id FROM v_playerStandings AS v "
+        "LEFT JOIN player_stats AS s ON s.id = v.id "
+        "LEFT JOIN tiebreak_standings($1) AS t ON t.id = v.id "
+        "WHERE v.tournament = $1 "
+        "  AND (s.id IS NULL OR s.wins <> v.wins "
+        "       OR s.matches <> v.matches OR s.draws <> v.draws "
+        "       OR s.points <> v.points "
+        "       OR s.buchholz <> t.buchholz OR s.omw <> t.omw) "
+        "ORDER BY v.id;",
+        tournament)
+    return [row[0] for row in rows]
+
+
+async def reportMatch(winner, loser, tournament=DEFAULT_TOURNAMENT,
+                      draw=False):
+    """Records the outcome of a single match; a loser of None is a bye.
+
+    See tournament.reportMatch().
+    """
+    if loser is None:
+        loser = winner
+    pool = await getPool()
+    await pool.execute(
+        "INSERT INTO matches (tournament, winner, loser, draw) "
+        "VALUES ($1, $2, $3, $4);",
+        tournament, winner, loser, bool(draw))
+
+
+async def reportMatches(matches, tournament=DEFAULT_TOURNAMENT):
+    """Records the outcomes of many matches in one statement.
+
+    Accepts (winner, loser) pairs, (winner, loser, draw) tuples or
+    swissPairings() output, like tournament.reportMatches().
+    """
+    winners = []
+    losers = []
+    draws = []
+    for match in matches:
+        if len(match) == 4:
+            winner, loser, draw = match[0], match[2], False
+        elif len(match) == 3:
+            winner, loser, draw = match
+        else:
+            winner, loser = match
+            draw = False
+        winners.append(winner)
+        losers.append(winner if loser is None else loser)
+        draws.append(bool(draw))
+    if not winners:
+        return
+    pool = await getPool()
+    await pool.execute(
+        "INSERT INTO matches (tournament, winner, loser, draw) "
+        "SELECT $1, unnest($2::int[]), unnest($3::int[]), "
+        "       unnest($4::boolean[]);",
+        tournament, winners, losers, draws)
+
+
+async def getMatches(tournament=DEFAULT_TOURNAMENT):
+    """Returns (winner, loser) tuples of previous matches, sorted by winner."""
+    pool = await getPool()
+    rows = await pool.fetch(MATCHES_QUERY, tournament)
+    return [tuple(row) for row in rows]
+
+
+async def swissPairings(tournament=DEFAULT_TOURNAMENT, perfect=False,
+                        stats=None):
+    """Returns a list of (id1, name1, id2, name2) pairs for the next round.
+
+    The standings and the match history are read in one REPEATABLE READ
+    transaction, so a match reported in between cannot show up in one and
+    not the other.  The pairing itself runs in the default executor so that
+    pairing a large event does not stall the event loop.  See
+    tournament.swissPairings() for the arguments.
+    """
+    pool = await getPool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation='repeatable_read',
+                                    readonly=True):
+            rows = await conn.fetch(STANDINGS_QUERY, tournament)
+            prev_matches = [tuple(row) for row in
+                            await conn.fetch(MATCHES_QUERY, tournament)]
+    # pair by points, as tournament.swissPairings() does
+    standings = [(row[0], row[1], row[5]) for row in rows]
+    pair = pair_perfect if perfect else pair_players
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        None, pair, standings, prev_matches, stats)
+
+
+async def serverSwissPairings(tournament=DEFAULT_TOURNAMENT):
+    """Returns the pairs for the next round, computed inside PostgreSQL.
+
+    One query; see tournament.serverSwissPairings().
+    """
+    pool = await getPool()
+    try:
+        rows = await pool.fetch(
+            "SELECT * FROM swiss_pairings($1);", tournament)
+    except asyncpg.RaiseError as e:
+        raise ValueError(str(e))
+    return [tuple(row) for row in rows]
@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 #
 # Test cases for tournament.py
+#
+# Run with --memory to test against the in-memory backend instead of the
+# tournament database.
+
+import os
+import sys
+import tempfile
 
+import tournament
+from backends.memory import MemoryBackend
 from tournament import *
+from util.snapshot import decode_copy, encode_copy
 
 def testDeleteMatches():
     deleteMatches()
@@ -125,7 +135,350 @@ def testPairings():
     print "8. After one match, players with one win are paired."
 
 
+def testRegisterPlayers():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Rarity", "Spike", "Starlight Glimmer"])
+    c = countPlayers()
+    if c != 3:
+        raise ValueError(
+            "After registering three players in bulk, countPlayers() should "
+            "be 3.")
+    registerPlayers([])
+    if countPlayers() != 3:
+        raise ValueError("Registering no players should not change the count.")
+    print "9. Players can be registered in bulk."
+
+
+def testReportMatchesBulk():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Bruno Walton", "Boots O'Neal", "Cathy Burton",
+                     "Diane Grant"])
+    standings = playerStandings()
+    [id1, id2, id3, id4] = [row[0] for row in standings]
+    reportMatches([(id1, id2), (id3, id4)])
+    standings = playerStandings()
+    for (i, n, w, m) in standings:
+        if m != 1:
+            raise ValueError("Each player should have one match recorded.")
+        if i in (id1, id3) and w != 1:
+            raise ValueError("Each match winner should have one win recorded.")
+        elif i in (id2, id4) and w != 0:
+            raise ValueError("Each match loser should have zero wins recorded.")
+    pairings = swissPairings()
+    reportMatches(pairings)
+    standings = playerStandings()
+    for (i, n, w, m) in standings:
+        if m != 2:
+            raise ValueError(
+                "swissPairings() output should be accepted by reportMatches().")
+    print "10. Matches can be reported in bulk, including swissPairings() output."
+
+
+def testPerfectPairings():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Twilight Sparkle", "Fluttershy", "Applejack",
+                     "Pinkie Pie"])
+    standings = playerStandings()
+    [id1, id2, id3, id4] = [row[0] for row in standings]
+    reportMatches([(id1, id2), (id3, id4)])
+    reportMatches(swissPairings(perfect=True))
+    pairings = swissPairings(perfect=True)
+    if len(pairings) != 2:
+        raise ValueError(
+            "For four players, perfect pairings should return two pairs.")
+    played = set(frozenset([w, l]) for (w, l) in getMatches())
+    for (pid1, pname1, pid2, pname2) in pairings:
+        if frozenset([pid1, pid2]) in played:
+            raise ValueError("Perfect pairings should never be rematches.")
+    print "11. Perfect pairings include every player and avoid rematches."
+
+
+def testStandingsMatchViews():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Bruno Walton", "Boots O'Neal", "Cathy Burton",
+                     "Diane Grant"])
+    reportMatches(swissPairings(perfect=True))
+    reportMatches(swissPairings(perfect=True))
+    if verifyStandings():
+        raise ValueError(
+            "Stored standings should match the standings computed from "
+            "the matches table.")
+    deleteMatches()
+    for (i, n, w, m) in playerStandings():
+        if w != 0 or m != 0:
+            raise ValueError(
+                "After deleting matches, standings should be reset.")
+    print "12. Stored standings match the standings computed from matches."
+
+
+def testTournaments():
+    deleteMatches()
+    deletePlayers()
+    t1 = createTournament("Spring Open")
+    t2 = createTournament("Summer Open")
+    registerPlayers(["Bruno Walton", "Boots O'Neal"], t1)
+    registerPlayers(["Cathy Burton", "Diane Grant", "Rarity", "Spike"], t2)
+    if countPlayers(t1) != 2 or countPlayers(t2) != 4 or countPlayers() != 0:
+        raise ValueError("Players should only be counted in their tournament.")
+    reportMatches(swissPairings(t1, perfect=True), t1)
+    standings = playerStandings(t2)
+    if len(standings) != 4 or any(m != 0 for (i, n, w, m) in standings):
+        raise ValueError(
+            "Matches of one tournament should not affect another's standings.")
+    archiveTournament(t1)
+    if getMatches(t1):
+        raise ValueError("An archived tournament should have no live matches.")
+    if [m for (i, n, w, m) in playerStandings(t1)] != [1, 1]:
+        raise ValueError("An archived tournament should keep its standings.")
+    deletePlayers(t2)
+    print "13. Tournaments keep their players and matches apart."
+
+
+def testServerPairings():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Twilight Sparkle", "Fluttershy", "Applejack",
+                     "Pinkie Pie", "Rarity", "Spike"])
+    for game_round in range(3):
+        pairings = serverSwissPairings()
+        if pairings != swissPairings(perfect=True):
+            raise ValueError(
+                "Server-side pairings should equal perfect pairings.")
+        reportMatches(pairings)
+    print "14. Server-side pairings equal perfect pairings."
+
+
+def testStandingsCache():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Bruno Walton", "Boots O'Neal"])
+    before = standingsCacheStats()
+    standings = playerStandings()
+    standings[0] = None
+    if playerStandings()[0] is None:
+        raise ValueError("Cached standings should not be shared.")
+    after = standingsCacheStats()
+    if after['hits'] != before['hits'] + 1:
+        raise ValueError("Repeated standings should come from the cache.")
+    [id1, id2] = [row[0] for row in playerStandings()]
+    reportMatch(id2, id1)
+    if playerStandings()[0][0] != id2:
+        raise ValueError("Reporting a match should invalidate the cache.")
+    print "15. Standings are cached until the tournament changes."
+
+
+def testTiebreakers():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Twilight Sparkle", "Fluttershy", "Applejack",
+                     "Pinkie Pie", "Rarity", "Spike", "Bruno Walton",
+                     "Boots O'Neal"])
+    for game_round in range(2):
+        reportMatches(swissPairings(perfect=True))
+    standings = tiebreakStandings()
+    points = dict((row[0], row[5]) for row in standings)
+    buchholz = dict.fromkeys(points, 0)
+    for (winner, loser) in getMatches():
+        buchholz[winner] += points[loser]
+        buchholz[loser] += points[winner]
+    for (i, n, w, m, d, p, b, omw) in standings:
+        if b != buchholz[i]:
+            raise ValueError(
+                "Buchholz should be the sum of the opponents' points.")
+    keys = [(-p, -b, -omw, i) for (i, n, w, m, d, p, b, omw) in standings]
+    if keys != sorted(keys):
+        raise ValueError("Standings should be sorted by their tiebreakers.")
+    if playerStandings() != [row[:4] for row in standings]:
+        raise ValueError(
+            "playerStandings() should be ordered by the tiebreakers.")
+    print "16. Standings are ordered by the Buchholz and OMW tiebreakers."
+
+
+def testByes():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Twilight Sparkle", "Fluttershy", "Applejack",
+                     "Pinkie Pie", "Rarity"])
+    byes = []
+    for game_round in range(3):
+        pairings = swissPairings(perfect=True)
+        if len(pairings) != 3:
+            raise ValueError(
+                "For five players, swissPairings should return 3 pairs.")
+        byes.extend(id1 for (id1, n1, id2, n2) in pairings if id2 is None)
+        reportMatches(pairings)
+    if len(byes) != 3 or len(set(byes)) != 3:
+        raise ValueError(
+            "Every round should give one bye, never to the same player.")
+    standings = playerStandings()
+    if sum(m for (i, n, w, m) in standings) != 2 * 6 + 3:
+        raise ValueError("A bye should count as a match played.")
+    if sum(w for (i, n, w, m) in standings) != 6 + 3:
+        raise ValueError("A bye should count as a win.")
+    try:
+        reportMatch(byes[0], None)
+    except Exception:
+        pass
+    else:
+        raise ValueError("A player should not get a second bye.")
+    if serverSwissPairings() != swissPairings(perfect=True):
+        raise ValueError(
+            "Server-side pairings should choose the same bye.")
+    print "17. With an odd number of players, each round has one new bye."
+
+
+def testDraws():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Bruno Walton", "Boots O'Neal", "Cathy Burton",
+                     "Diane Grant"])
+    [id1, id2, id3, id4] = [row[0] for row in playerStandings()]
+    reportMatch(id1, id2, draw=True)
+    reportMatches([(id3, id4, False)])
+    standings = dict((row[0], row) for row in tiebreakStandings())
+    for (i, w, m, d, p) in [(id1, 0, 1, 1, 1), (id2, 0, 1, 1, 1),
+                            (id3, 1, 1, 0, 3), (id4, 0, 1, 0, 0)]:
+        if standings[i][2:6] != (w, m, d, p):
+            raise ValueError(
+                "A draw should count as a match and 1 point for both "
+                "players; a win as 3 points.")
+    if [row[0] for row in playerStandings()] != [id3, id1, id2, id4]:
+        raise ValueError("Standings should be sorted by points.")
+    try:
+        reportMatch(id2, id1)
+    except Exception:
+        pass
+    else:
+        raise ValueError("A drawn match should count for rematches.")
+    if verifyStandings():
+        raise ValueError(
+            "Stored standings should match the standings computed from "
+            "the matches table.")
+    print "18. Draws are recorded and scored with points."
+
+
+def testQueryProfiling():
+    deleteMatches()
+    deletePlayers()
+    profiler = enableQueryProfiling(threshold=0, summary=False)
+    profiler.reset()
+    try:
+        registerPlayers(["Bruno Walton", "Boots O'Neal"])
+        countPlayers()
+    finally:
+        disableQueryProfiling()
+    timers = profiler.stats.snapshot()['timers']
+    if isinstance(tournament.backend, MemoryBackend):
+        if timers:
+            raise ValueError(
+                "Profiling should not record calls of the memory backend.")
+    else:
+        for name in ['count_players.connect', 'count_players.execute',
+                     'count_players.fetch', 'count_players.commit']:
+            if timers.get(name, {}).get('count') != 1:
+                raise ValueError("Profiling should time %s." % name)
+    countPlayers()
+    if profiler.stats.snapshot()['timers'] != timers:
+        raise ValueError("Disabled profiling should record nothing.")
+    print "19. Database calls are timed while profiling is enabled."
+
+
+def testSnapshot():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Twilight Sparkle", "Fluttershy", "Applejack",
+                     "Pinkie Pie", "Rarity"])
+    for game_round in range(2):
+        reportMatches(swissPairings(perfect=True))
+    [id1, id2] = [row[0] for row in playerStandings()[:2]]
+    reportMatch(id1, id2, draw=True)
+    fd, filename = tempfile.mkstemp(suffix='.snapshot')
+    os.close(fd)
+    try:
+        saveSnapshot(filename)
+        t2 = createTournament("Replay")
+        registerPlayer("Spike", t2)
+        loadSnapshot(filename, t2)
+    finally:
+        os.remove(filename)
+    original = tiebreakStandings()
+    restored = tiebreakStandings(t2)
+    if [row[1:] for row in restored] != [row[1:] for row in original]:
+        raise ValueError(
+            "A restored snapshot should have the same standings.")
+    if set(row[0] for row in restored) & set(row[0] for row in original):
+        raise ValueError("Restored players should get new ids.")
+    if len(getMatches(t2)) != len(getMatches()):
+        raise ValueError("A restored snapshot should have the same matches.")
+    if verifyStandings(t2):
+        raise ValueError(
+            "Stored standings should match the standings computed from "
+            "the matches table.")
+    deleteMatches(t2)
+    deletePlayers(t2)
+    stream = encode_copy([(1, "Spike")], 'it')
+    for end in (len(stream) - 1, len(stream) - 3, len(stream) - 9):
+        try:
+            decode_copy(stream[:end], 'it')
+        except ValueError:
+            pass
+        else:
+            raise ValueError(
+                "A truncated COPY stream should raise ValueError.")
+    print "20. A snapshot restores a tournament's players and matches."
+
+
+def testPairingLookahead():
+    deleteMatches()
+    deletePlayers()
+    registerPlayers(["Twilight Sparkle", "Fluttershy", "Applejack",
+                     "Pinkie Pie", "Rarity", "Rainbow Dash"])
+    for game_round in range(2):
+        reportMatches(swissPairings(perfect=True))
+    # pairing every player with the nearest player not yet played leaves
+    # the last two players, who have met, for each other in this round
+    stats = {}
+    pairings = swissPairings(perfect=True, stats=stats)
+    if stats.get('backtracks') != 1:
+        raise ValueError(
+            "The third round should turn down one nearest opponent.")
+    paired = [pid for (pid1, _, pid2, _) in pairings for pid in (pid1, pid2)]
+    if sorted(paired) != sorted(row[0] for row in playerStandings()):
+        raise ValueError("Perfect pairings should include every player.")
+    played = set(frozenset([w, l]) for (w, l) in getMatches())
+    for (pid1, pname1, pid2, pname2) in pairings:
+        if frozenset([pid1, pid2]) in played:
+            raise ValueError("Perfect pairings should never be rematches.")
+    if serverSwissPairings() != pairings:
+        raise ValueError(
+            "Server-side pairings should equal perfect pairings.")
+    reportMatches(pairings)
+    for game_round in range(2):
+        reportMatches(swissPairings(perfect=True))
+    # the earlier rounds leave no pairing of six players for a sixth round
+    stats = {}
+    for pair in (lambda: swissPairings(perfect=True, stats=stats),
+                 serverSwissPairings):
+        try:
+            pair()
+        except ValueError:
+            pass
+        else:
+            raise ValueError(
+                "Pairing should fail when no pairing without rematches "
+                "exists.")
+    if 'backtracks' not in stats:
+        raise ValueError("A failed pairing should still count backtracks.")
+    print "21. Perfect pairings look ahead and fail when no pairing exists."
+
+
 if __name__ == '__main__':
+    if '--memory' in sys.argv[1:]:
+        setBackend(MemoryBackend())
     testDeleteMatches()
     testDelete()
     testCount()
@@ -134,4 +487,17 @@ if __name__ == '__main__':
     testStandingsBeforeMatches()
     testReportMatches()
     testPairings()
+    testRegisterPlayers()
+    testReportMatchesBulk()
+    testPerfectPairings()
+    testStandingsMatchViews()
+    testTournaments()
+    testServerPairings()
+    testStandingsCache()
+    testTiebreakers()
+    testByes()
+    testDraws()
+    testQueryProfiling()
+    testSnapshot()
+    testPairingLookahead()
     print "Success!  All tests pass!"
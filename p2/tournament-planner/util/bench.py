@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import random
+import time
+
+import tournament
+
+
+def populate(n_players, n_rounds, perfect=True, analyze=False):
+    """Fills the default tournament with generated players and matches.
+
+    The tournament's players and matches are deleted first.  Then
+    `n_players` players are registered and `n_rounds` rounds are paired with
+    `tournament.swissPairings()` and reported, each match won by either
+    player at random.  With `analyze`, ANALYZE is run at the end so that the
+    planner's statistics describe the generated data.
+    """
+    tournament.deleteMatches()
+    tournament.deletePlayers()
+    tournament.registerPlayers('Player %s' % i for i in xrange(n_players))
+    for _ in xrange(n_rounds):
+        results = []
+        for id1, _, id2, _ in tournament.swissPairings(perfect=perfect):
+            if id2 is not None and random.random() < 0.5:
+                id1, id2 = id2, id1
+            results.append((id1, id2))
+        tournament.reportMatches(results)
+    if analyze:
+        with tournament.connect() as conn:
+            conn.cursor().execute("ANALYZE;")
+
+
+def best_of(repeat, func, *args, **kwargs):
+    """Returns (result, best time in seconds) of calling func repeat times."""
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        result = func(*args, **kwargs)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+from util.logger import logger
+
+
+class StandingsCache(object):
+    """
+    An in-process cache of query results, keyed by tournament id.
+
+    Entries are dropped by `invalidate()` when their tournament changes, and
+    in any case once they are older than `ttl` seconds, which bounds how
+    stale an entry can get if an invalidation is missed (e.g. a write by
+    another process while no listener runs).  At most `maxsize` tournaments
+    are cached; the oldest entry makes room for a new one.
+
+    `hits` and `misses` count the lookups served from the cache and from the
+    loader.
+    """
+
+    def __init__(self, ttl=30.0, maxsize=128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        # bumped by invalidate() (_epoch when everything is dropped), so a
+        # load that raced with a write is not stored
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Returns a copy of the cached value for key, loading it if needed.
+
+        Args:
+          key: the tournament id.
+          loader: called with key to load the value on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self.hits += 1
+                return list(entry[1])
+            self.misses += 1
+            generation = (self._epoch, self._generations.get(key, 0))
+        value = loader(key)
+        with self._lock:
+            if (self._epoch, self._generations.get(key, 0)) == generation:
+                if key not in self._entries and \
+                        len(self._entries) >= self.maxsize:
+                    oldest = min(self._entries,
+                                 key=lambda k: self._entries[k][0])
+                    del self._entries[oldest]
+                self._entries[key] = (now, list(value))
+        return value
+
+    def invalidate(self, key=None):
+        """Drops the entry for key, or every entry if key is None."""
+        with self._lock:
+            if key is None:
+                self._epoch += 1
+                self._entries.clear()
+                self._generations.clear()
+            else:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def stats(self):
+        """Returns the hit and miss counters and the number of entries."""
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'entries': len(self._entries)}
+
+
+class NotifyListener(threading.Thread):
+    """
+    A daemon thread which LISTENs on a PostgreSQL channel.
+
+    `callback` is called with the payload of every notification.  The
+    listener uses its own connection, outside any pool, and reconnects
+    after `retry` seconds if the connection is lost.  `on_connect`, if
+    given, is called every time listening (re)starts, since notifications
+    sent while disconnected are lost.  Call `stop()` to end it.
+    """
+
+    def __init__(self, dsn, channel, callback, on_connect=None, retry=5.0):
+        threading.Thread.__init__(self, name='listen-%s' % channel)
+        self.daemon = True
+        self.dsn = dsn
+        self.channel = channel
+        self.callback = callback
+        self.on_connect = on_connect
+        self.retry = retry
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                logger.error('%s listener: %s', self.channel, e)
+                self._stopped.wait(self.retry)
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.set_isolation_level(
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute('LISTEN "%s";' % self.channel)
+            if self.on_connect is not None:
+                self.on_connect()
+            while not self._stopped.is_set():
+                # wake up regularly to notice stop()
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.callback(notify.payload)
+        finally:
+            conn.close()
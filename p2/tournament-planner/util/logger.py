@@ -1,10 +1,80 @@
 #!/usr/bin/env python
 
+import atexit
 import logging
+import threading
 
-# create logger with 'fsnd_apps'
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+try:
+    from logging.handlers import QueueHandler, QueueListener
+except ImportError:  # Python 2
+    class QueueHandler(logging.Handler):
+        """Puts log records on a queue, for a QueueListener to handle.
+
+        Only the record is queued; its message is formatted by the listener
+        thread, off the caller's path.
+        """
+
+        def __init__(self, queue):
+            logging.Handler.__init__(self)
+            self.queue = queue
+
+        def emit(self, record):
+            try:
+                # format the exception text now: the traceback cannot be
+                # handled later in another thread
+                if record.exc_info:
+                    record.exc_text = logging.Formatter().formatException(
+                        record.exc_info)
+                    record.exc_info = None
+                self.queue.put_nowait(record)
+            except Exception:
+                self.handleError(record)
+
+    class QueueListener(object):
+        """Hands the records of a queue to handlers in a background thread.
+
+        Like the Python 3 class with respect_handler_level=True: each
+        handler only gets the records at or above its own level.
+        """
+        _sentinel = None
+
+        def __init__(self, queue, *handlers, **kwargs):
+            self.queue = queue
+            self.handlers = handlers
+            self._thread = None
+
+        def start(self):
+            self._thread = threading.Thread(target=self._monitor,
+                                            name='log-listener')
+            self._thread.daemon = True
+            self._thread.start()
+
+        def stop(self):
+            """Handles the records still queued, then ends the thread."""
+            if self._thread is not None:
+                self.queue.put_nowait(self._sentinel)
+                self._thread.join()
+                self._thread = None
+
+        def _monitor(self):
+            while True:
+                record = self.queue.get()
+                if record is self._sentinel:
+                    break
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+# create logger with 'fsnd_apps'; debug messages (e.g. every rematch the
+# pairing code skips) are off by default, turn them on with
+# logger.setLevel(logging.DEBUG)
 logger = logging.getLogger('fsnd_apps')
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.INFO)
 # create file handler which logs even debug messages
 fh = logging.FileHandler('tournament.log')
 fh.setLevel(logging.DEBUG)
@@ -15,6 +85,11 @@ ch.setLevel(logging.ERROR)
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 fh.setFormatter(formatter)
 ch.setFormatter(formatter)
-# add the handlers to the logger
-logger.addHandler(fh)
-logger.addHandler(ch)
+# the logger only queues records; a listener thread formats them and writes
+# them to the handlers, so file I/O stays off the callers' path
+log_queue = queue.Queue(-1)
+listener = QueueListener(log_queue, fh, ch, respect_handler_level=True)
+listener.start()
+# write out the records still queued when the process exits
+atexit.register(listener.stop)
+logger.addHandler(QueueHandler(log_queue))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics(object):
+    """
+    Thread-safe counters and timers.
+
+    Counters are integers increased with `incr()`.  Timers keep the count,
+    total and maximum of the durations (in seconds) recorded with
+    `observe()` or measured with the `timer()` context manager.  `snapshot()`
+    returns everything as a dict, e.g. to add to benchmark results, and
+    `render()` as lines of text in the Prometheus exposition format, e.g. to
+    be written to a node_exporter textfile or served over HTTP.
+    """
+
+    def __init__(self, prefix='tournament'):
+        self.prefix = prefix
+        self._counters = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        """Adds n to the counter name."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        """Records a duration of the timer name."""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                self._timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        """Records the duration of a `with` block, even if it raises."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start)
+
+    def reset(self):
+        """Drops every counter and timer."""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def snapshot(self):
+        """Returns the counters and timers as a dict.
+
+        Returns:
+          {'counters': {name: value},
+           'timers': {name: {'count': n, 'total_s': s, 'max_s': s}}}
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'timers': dict(
+                    (name, {'count': t[0], 'total_s': t[1], 'max_s': t[2]})
+                    for name, t in self._timers.items()),
+            }
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = self._metric_name(name) + '_total'
+            lines.append('# TYPE %s counter' % metric)
+            lines.append('%s %d' % (metric, value))
+        for name, t in sorted(snapshot['timers'].items()):
+            metric = self._metric_name(name) + '_seconds'
+            lines.append('# TYPE %s summary' % metric)
+            lines.append('%s_count %d' % (metric, t['count']))
+            lines.append('%s_sum %.6f' % (metric, t['total_s']))
+            # a summary only has _count and _sum; the maximum is its own gauge
+            lines.append('# TYPE %s_max gauge' % metric)
+            lines.append('%s_max %.6f' % (metric, t['max_s']))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, stream=None):
+        """Writes render() to stream (default: sys.stderr)."""
+        (stream or sys.stderr).write(self.render())
+
+    def _metric_name(self, name):
+        return '%s_%s' % (self.prefix,
+                          ''.join(c if c.isalnum() else '_' for c in name))
+
+
+# Metrics of the tournament module: database transactions, pairing skips
+# and backtracks, standings cache lookups
+metrics = Metrics()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from util.metrics import metrics
+
+
+class _KeepAlivePool(ThreadedConnectionPool):
+    """
+    psycopg2's threaded pool, keeping every connection it opens.
+
+    psycopg2 closes a returned connection once `minconn` connections are
+    idle, so with more than `minconn` threads busy the pool keeps opening
+    new connections, and the statements prepared on them are lost.  Here
+    `minconn` only sets how many connections are opened up front; returned
+    connections stay open up to `maxconn`.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        ThreadedConnectionPool.__init__(self, minconn, maxconn, *args,
+                                        **kwargs)
+        # putconn() keeps a connection while fewer than minconn are idle
+        self.minconn = maxconn
+
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of PostgreSQL connections.
+
+    The underlying psycopg2 pool is created lazily on the first checkout, so
+    creating a pool does not require the database to exist yet (`populate.py`
+    imports `tournament` before it creates the database).
+
+    Checkouts block once `maxconn` connections are in use instead of raising
+    `PoolError` the way psycopg2's pool does.  `minconn` connections are
+    opened on the first checkout; more are opened as needed, and every
+    connection stays open once returned, so the statements prepared on it
+    are reused.
+
+    Every checkout adds to the 'db.transactions' counter (and
+    'db.rollbacks' when rolled back), and to the 'db.checkout' (time waiting
+    for a connection) and 'db.transaction' (time until it is returned)
+    timers of `util.metrics.metrics`.
+
+    If `profiler` is set to a `util.profiling.QueryProfiler`, the connections
+    checked out are wrapped so that their calls are timed per operation.
+    Otherwise the psycopg2 connections are handed out as they are.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, profiler=None):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(
+                "Invalid pool size: minconn=%s, maxconn=%s" %
+                (minconn, maxconn))
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.profiler = profiler
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = _KeepAlivePool(
+                        self.minconn, self.maxconn, self.dsn)
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a `with` block.
+
+        The transaction is committed when the block exits normally and rolled
+        back if it raises.  Either way the connection goes back to the pool;
+        broken connections are discarded rather than reused.
+        """
+        start = time.time()
+        self._slots.acquire()
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            checked_out = time.time()
+            metrics.observe('db.checkout', checked_out - start)
+            metrics.incr('db.transactions')
+            profiler = self.profiler
+            if profiler is None:
+                handle = conn
+            else:
+                # frames up: contextlib's __enter__, then the function
+                # running the `with` block, which names the operation
+                handle = profiler.wrap(conn, sys._getframe(2).f_code.co_name,
+                                       checked_out - start)
+            try:
+                yield handle
+                handle.commit()
+            except Exception:
+                metrics.incr('db.rollbacks')
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                pool.putconn(conn, close=bool(conn.closed))
+                metrics.observe('db.transaction', time.time() - checked_out)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        """Close every connection in the pool.  The pool can be reused."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+import sys
+import time
+
+import psycopg2
+
+from util.logger import logger
+from util.metrics import Metrics
+
+# Statements EXPLAIN accepts; others (e.g. ALTER TABLE) are logged without a
+# plan
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'VALUES',
+               'EXECUTE')
+
+
+class QueryProfiler(object):
+    """
+    Times the database calls of each named operation.
+
+    `ConnectionPool` hands out connections wrapped by `wrap()` while a
+    profiler is set on it.  The operation is the name of the function that
+    checked out the connection, e.g. 'player_standings' for
+    `PostgresBackend.player_standings()`.  For each operation the profiler
+    records how long it waited for a connection ('connect'), and how long
+    its statements took to run ('execute'), to return their rows ('fetch')
+    and to commit ('commit').
+
+    A statement running for `threshold` seconds or more is logged as a
+    warning together with its `EXPLAIN` plan, and counted as 'slow'.
+
+    Durations are kept in a `util.metrics.Metrics` of their own, as timers
+    named '<operation>.<phase>'; `summary()` formats them as a table.
+    """
+
+    PHASES = ('connect', 'execute', 'fetch', 'commit')
+
+    def __init__(self, threshold=0.1):
+        self.threshold = threshold
+        self.stats = Metrics(prefix='tournament_query')
+
+    def wrap(self, conn, operation, connect_seconds):
+        """Returns conn wrapped so that its calls are timed.
+
+        Args:
+          conn: a psycopg2 connection.
+          operation: the name its calls are recorded under.
+          connect_seconds: the time it took to check out conn.
+        """
+        self.stats.observe(operation + '.connect', connect_seconds)
+        return ProfiledConnection(conn, operation, self)
+
+    def slow_query(self, cursor, operation, query, seconds):
+        """Logs a slow statement with its plan.
+
+        The plan is read in a savepoint with a separate cursor, so neither
+        the transaction nor the rows of the slow statement are disturbed.
+        """
+        self.stats.incr(operation + '.slow')
+        plan = None
+        conn = cursor.connection
+        if isinstance(query, bytes):
+            # cursor.query is bytes on Python 3
+            query = query.decode(
+                psycopg2.extensions.encodings.get(conn.encoding, 'utf-8'),
+                'replace')
+        if query.lstrip().split(None, 1)[0].upper() in EXPLAINABLE and \
+                not conn.autocommit:
+            c = conn.cursor()
+            try:
+                c.execute("SAVEPOINT explain_slow_query;")
+                try:
+                    c.execute("EXPLAIN " + query)
+                    plan = '\n'.join(row[0] for row in c.fetchall())
+                finally:
+                    c.execute("ROLLBACK TO SAVEPOINT explain_slow_query;")
+            except psycopg2.Error as e:
+                plan = "EXPLAIN failed: %s" % e
+            finally:
+                c.close()
+        logger.warning('slow query in %s (%.1f ms): %s\n%s', operation,
+                       1000 * seconds, query, plan or '(no plan)')
+
+    def reset(self):
+        """Drops every recorded duration."""
+        self.stats.reset()
+
+    def summary(self):
+        """Returns the recorded durations as a table, one operation per line.
+
+        Each phase column shows the total and (in parentheses) the largest
+        duration in milliseconds; 'calls' is the number of checkouts.
+        """
+        snapshot = self.stats.snapshot()
+        timers = snapshot['timers']
+        operations = sorted(set(name.rsplit('.', 1)[0] for name in timers))
+        header = '%-20s %6s' % ('operation', 'calls')
+        for phase in self.PHASES:
+            header += '%16s' % (phase + ' (ms)')
+        lines = [header + '%6s' % 'slow']
+        for operation in operations:
+            connect = timers.get(operation + '.connect', {'count': 0})
+            line = '%-20s %6d' % (operation, connect['count'])
+            for phase in self.PHASES:
+                t = timers.get('%s.%s' % (operation, phase))
+                if t is None:
+                    line += '%16s' % '-'
+                else:
+                    line += '%16s' % ('%.1f (%.1f)' % (1000 * t['total_s'],
+                                                       1000 * t['max_s']))
+            line += '%6d' % snapshot['counters'].get(operation + '.slow', 0)
+            lines.append(line)
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, stream=None):
+        """Writes summary() to stream (default: sys.stderr), if anything was
+        recorded."""
+        if self.stats.snapshot()['timers']:
+            (stream or sys.stderr).write(self.summary())
+
+
+class ProfiledConnection(object):
+    """A psycopg2 connection whose cursors and commits are timed."""
+
+    def __init__(self, conn, operation, profiler):
+        self._conn = conn
+        self._operation = operation
+        self._profiler = profiler
+
+    def cursor(self, *args, **kwargs):
+        return ProfiledCursor(self._conn.cursor(*args, **kwargs),
+                              self._operation, self._profiler)
+
+    def commit(self):
+        start = time.time()
+        self._conn.commit()
+        self._profiler.stats.observe(self._operation + '.commit',
+                                     time.time() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ProfiledCursor(object):
+    """A psycopg2 cursor whose statements and fetches are timed."""
+
+    def __init__(self, cursor, operation, profiler):
+        self._cursor = cursor
+        self._operation = operation
+        self._profiler = profiler
+
+    def execute(self, query, vars=None):
+        start = time.time()
+        self._cursor.execute(query, vars)
+        seconds = time.time() - start
+        self._profiler.stats.observe(self._operation + '.execute', seconds)
+        if seconds >= self._profiler.threshold:
+            # the statement as sent, with its parameters filled in
+            self._profiler.slow_query(self._cursor, self._operation,
+                                      self._cursor.query, seconds)
+
+    def _fetch(self, method, *args):
+        start = time.time()
+        result = method(*args)
+        self._profiler.stats.observe(self._operation + '.fetch',
+                                     time.time() - start)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
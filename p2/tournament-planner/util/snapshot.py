@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import struct
+
+# First bytes of a snapshot file
+MAGIC = b'TOURNAMENT SNAPSHOT 1\n'
+
+# Header and trailer of PostgreSQL's binary COPY format: the signature, the
+# flags field and the header extension length, then a field count of -1
+COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+COPY_TRAILER = struct.pack('!h', -1)
+
+_INT = struct.Struct('!ii')
+_BOOL = struct.Struct('!i?')
+_LENGTH = struct.Struct('!i')
+_FIELDS = struct.Struct('!h')
+
+
+def write_snapshot(f, players, matches):
+    """Writes a snapshot of one tournament to the binary file f.
+
+    The snapshot holds two streams in PostgreSQL's binary COPY format, each
+    preceded by its length: the (id, name) rows of the players and the
+    (winner, loser, draw) rows of the matches.
+
+    Args:
+      f: a file opened for writing in binary mode.
+      players, matches: the two COPY streams, as bytes.
+    """
+    f.write(MAGIC)
+    for data in (players, matches):
+        f.write(struct.pack('!Q', len(data)))
+        f.write(data)
+
+
+def read_snapshot(f):
+    """Reads a snapshot written by write_snapshot().
+
+    Returns:
+      The (players, matches) COPY streams, as bytes.
+
+    Raises:
+      ValueError: if f does not hold a snapshot.
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a tournament snapshot.")
+    streams = []
+    for _ in range(2):
+        header = f.read(8)
+        if len(header) != 8:
+            raise ValueError("Truncated tournament snapshot.")
+        size = struct.unpack('!Q', header)[0]
+        data = f.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated tournament snapshot.")
+        streams.append(data)
+    return tuple(streams)
+
+
+def encode_copy(rows, types):
+    """Returns rows in PostgreSQL's binary COPY format.
+
+    Only what snapshots need is supported: NOT NULL int4 ('i'), text ('t')
+    and boolean ('b') columns.
+
+    Args:
+      rows: an iterable of tuples.
+      types: a string with the type code of each column, e.g. 'it'.
+    """
+    fields = _FIELDS.pack(len(types))
+    parts = [COPY_HEADER]
+    for row in rows:
+        parts.append(fields)
+        for code, value in zip(types, row):
+            if code == 'i':
+                parts.append(_INT.pack(4, value))
+            elif code == 'b':
+                parts.append(_BOOL.pack(1, value))
+            else:
+                if not isinstance(value, bytes):
+                    value = value.encode('utf-8')
+                parts.append(_LENGTH.pack(len(value)))
+                parts.append(value)
+    parts.append(COPY_TRAILER)
+    return b''.join(parts)
+
+
+def decode_copy(data, types):
+    """Returns the rows of a binary COPY stream written by encode_copy() or
+    by PostgreSQL, as a list of tuples.
+
+    Text is returned as str, i.e. UTF-8 bytes under Python 2 like psycopg2
+    returns it.
+
+    Raises:
+      ValueError: if data is not a binary COPY stream of such rows, or is
+        truncated or corrupt.
+    """
+    if data[:len(COPY_HEADER) - 4] != COPY_HEADER[:-4]:
+        raise ValueError("Not a binary COPY stream.")
+    try:
+        return _decode_rows(data, types)
+    except (struct.error, IndexError):
+        raise ValueError("Truncated or corrupt binary COPY stream.")
+
+
+def _decode_rows(data, types):
+    """Returns the rows of a binary COPY stream; see decode_copy()."""
+    sizes = {'i': 4, 'b': 1}
+    # skip the header extension, if any
+    pos = len(COPY_HEADER)
+    pos += _LENGTH.unpack_from(data, pos - 4)[0]
+    decode_text = str is not bytes
+    rows = []
+    while True:
+        count = _FIELDS.unpack_from(data, pos)[0]
+        pos += 2
+        if count == -1:
+            return rows
+        if count != len(types):
+            raise ValueError("Expected %d columns, got %d." %
+                             (len(types), count))
+        row = []
+        for code in types:
+            size = _LENGTH.unpack_from(data, pos)[0]
+            pos += 4
+            if size != sizes.get(code, size) or size < 0 or \
+                    pos + size > len(data):
+                raise ValueError("Truncated or corrupt binary COPY stream.")
+            if code == 'i':
+                row.append(struct.unpack_from('!i', data, pos)[0])
+            elif code == 'b':
+                row.append(data[pos:pos + 1] != b'\x00')
+            else:
+                value = data[pos:pos + size]
+                row.append(value.decode('utf-8') if decode_text else value)
+            pos += size
+        rows.append(tuple(row))